@@ -0,0 +1,357 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, Optional
+
+from lazy_import import lazy_import
+from message_batch import MessageBatch
+from process_logs import (
+    ChatBridgeProcessor,
+    _AGENT_UPSERT_SQL,
+    _DELETE_MESSAGES_FROM_SQL,
+    _DELETE_MESSAGES_SQL,
+    _HASHED_MESSAGE_INSERT_SQL,
+    _MESSAGE_HASHES_SQL,
+    _MESSAGE_INSERT_SQL,
+    _SESSION_UPSERT_SQL,
+    _agent_rows,
+    _batch_statements,
+    _delete_orders_statements,
+    _message_changes,
+    _message_rows,
+    _parse_in_worker,
+    _session_row,
+    _stored_hashes,
+)
+from schema import ADD_HASH_COLUMN_SQL, HASH_COLUMN_CHECK_SQL, add_message_partitions, migrate
+from session_stats import SESSION_STATS_TABLE_SQL, SessionStats, stats_statements
+
+aiomysql = lazy_import('aiomysql')
+
+
+class _BlockingCursor:
+    """
+    Lets the blocking schema functions (which take a mysql.connector cursor)
+    drive an aiomysql cursor. Used from a worker thread while the event loop
+    runs the cursor's coroutines.
+    """
+
+    def __init__(self, cursor, loop: asyncio.AbstractEventLoop):
+        self.cursor = cursor
+        self.loop = loop
+
+    def _call(self, method, *args):
+        async def call():
+            return await method(*args)
+
+        return asyncio.run_coroutine_threadsafe(call(), self.loop).result()
+
+    def execute(self, statement, params=None):
+        return self._call(self.cursor.execute, statement, params)
+
+    def fetchall(self):
+        return self._call(self.cursor.fetchall)
+
+
+class AsyncChatBridgeProcessor:
+    def __init__(self, db_config: Dict[str, str], concurrency: int = 8,
+                 parse_workers: int = 0, max_packet_bytes: int = 1024 * 1024,
+                 pool=None, session_stats: bool = True, message_hashes: bool = True,
+                 manage_schema: bool = True):
+        """
+        Asyncio counterpart of ChatBridgeProcessor, built on aiomysql.
+
+        db_config: Same dict as for ChatBridgeProcessor ('database' is passed
+            to aiomysql as 'db')
+        concurrency: Maximum number of files being read, parsed or written at
+            once; also the size of the connection pool (default: 8)
+        parse_workers: Parse in a process pool of this size; 0 uses the event
+            loop's default thread executor (default: 0)
+        max_packet_bytes: Size budget for one multi-row INSERT statement
+        pool: An already created pool to use instead of aiomysql's. It needs
+            ``async with pool.acquire() as conn``, ``async with conn.cursor()
+            as cursor``, ``await cursor.execute(sql, params)`` and awaitable
+            ``conn.commit()`` / ``conn.rollback()``, so tests can pass a fake.
+        session_stats: Keep the session_stats rollups up to date, as
+            ChatBridgeProcessor does
+        message_hashes: Only rewrite new or changed messages of re-ingested
+            sessions, as ChatBridgeProcessor does
+        manage_schema: On the first connect, apply pending schema migrations
+            and add upcoming monthly partitions of messages (see schema.py)
+        """
+        self.db_config = db_config
+        self.concurrency = concurrency
+        self.parse_workers = parse_workers
+        self.max_packet_bytes = max_packet_bytes
+        self.pool = pool
+        self.session_stats = session_stats
+        self._stats_table_ready = False
+        self.message_hashes = message_hashes
+        self._hash_column_ready = False
+        self.manage_schema = manage_schema
+        self._schema_ready = False
+        self.messages_written = 0
+        self.messages_skipped = 0
+        # Parsing, manifest and duplicate handling are shared with the sync processor
+        self.processor = ChatBridgeProcessor(db_config, mmap_threshold=None)
+        self._owns_pool = pool is None
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def connect(self):
+        """
+        Create the connection pool (no-op if one is already set), then run
+        the same first-connect steps as ChatBridgeProcessor: schema
+        migrations, the session_stats table and the messages.content_hash
+        column.
+        """
+        if self.pool is None:
+            config = dict(self.db_config)
+            if 'database' in config:
+                config['db'] = config.pop('database')
+            self.pool = await aiomysql.create_pool(
+                minsize=1, maxsize=self.concurrency, autocommit=False, **config
+            )
+            self._owns_pool = True
+        if self.manage_schema and not self._schema_ready:
+            await self.ensure_schema()
+        if self.session_stats and not self._stats_table_ready:
+            try:
+                async with self.pool.acquire() as conn:
+                    async with conn.cursor() as cursor:
+                        await cursor.execute(SESSION_STATS_TABLE_SQL)
+                self._stats_table_ready = True
+            except aiomysql.Error as e:
+                print(f"Warning: session stats disabled, cannot create session_stats: {e}")
+                self.session_stats = False
+        if self.message_hashes and not self._hash_column_ready:
+            async with self.pool.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    try:
+                        await cursor.execute(HASH_COLUMN_CHECK_SQL)
+                        await cursor.fetchall()
+                    except aiomysql.Error:
+                        try:
+                            await cursor.execute(ADD_HASH_COLUMN_SQL)
+                        except aiomysql.Error as e:
+                            print(f"Warning: message hashes disabled, cannot add messages.content_hash: {e}")
+                            self.message_hashes = False
+                            return
+            self._hash_column_ready = True
+
+    async def ensure_schema(self):
+        """
+        Apply pending schema migrations and split off upcoming monthly
+        partitions of messages, as ChatBridgeProcessor.ensure_schema does.
+
+        The schema functions are blocking, so they run in a worker thread
+        and hand each statement back to the event loop.
+        """
+        self._schema_ready = True
+        loop = asyncio.get_running_loop()
+
+        def update(cursor):
+            return migrate(cursor), add_message_partitions(cursor)
+
+        try:
+            async with self.pool.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    applied, added = await loop.run_in_executor(
+                        None, update, _BlockingCursor(cursor, loop))
+        except aiomysql.Error as e:
+            print(f"Warning: could not update the database schema: {e}")
+            return
+        if applied:
+            print(f"Applied schema migrations: {', '.join(map(str, applied))}")
+        if added:
+            print(f"Added messages partitions: {', '.join(added)}")
+
+    async def disconnect(self):
+        """Close the connection pool if this processor created it."""
+        if self.pool is not None and self._owns_pool:
+            self.pool.close()
+            await self.pool.wait_closed()
+            self.pool = None
+
+    async def process_file(self, filepath: str) -> bool:
+        """Process a single markdown file and insert into database."""
+        owns_pool = self.pool is None
+        if owns_pool:
+            await self.connect()
+        try:
+            return await self.ingest_file(filepath) is not None
+        finally:
+            if owns_pool:
+                await self.disconnect()
+
+    async def ingest_file(self, filepath: str, first_message: int = 0,
+                          replace_messages: bool = True) -> Optional[Dict]:
+        """
+        Parse a file in the executor and write it in its own transaction.
+
+        Takes the same arguments as ChatBridgeProcessor.ingest_file and
+        returns the parsed data if successful, None otherwise.
+        """
+        semaphore = self._semaphore or asyncio.Semaphore(self.concurrency)
+        async with semaphore:
+            print(f"Processing: {filepath}")
+            try:
+                loop = asyncio.get_running_loop()
+                data = await loop.run_in_executor(self._executor, _parse_in_worker, filepath)
+            except Exception as e:
+                print(f"Error processing file {filepath}: {e}")
+                return None
+
+            for attempt in range(2):
+                try:
+                    await self.store_parsed(data, first_message, replace_messages)
+                    print(f"Successfully processed: {filepath}")
+                    return data
+                except aiomysql.OperationalError as e:
+                    # Server went away: the pool drops the dead connection, retry once
+                    if attempt == 0:
+                        print(f"Connection lost while processing {filepath}, reconnecting")
+                        continue
+                    print(f"Error processing file {filepath}: {e}")
+                except Exception as e:
+                    print(f"Error processing file {filepath}: {e}")
+                    break
+            return None
+
+    async def store_parsed(self, data: Dict, first_message: int = 0,
+                           replace_messages: bool = True):
+        """Write one parsed transcript and commit it; rolls back and raises on error."""
+        session_id = data['session']['session_id']
+        async with self.pool.acquire() as conn:
+            try:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(_SESSION_UPSERT_SQL, _session_row(data['session']))
+                    for statement, params in _batch_statements(
+                            _AGENT_UPSERT_SQL, _agent_rows(session_id, data['agents']),
+                            self.max_packet_bytes):
+                        await cursor.execute(statement, params)
+                    messages = MessageBatch.coerce(data['messages'][first_message:])
+                    skipped = 0
+                    if self.message_hashes:
+                        hashes = messages.hashes()
+                        write = None
+                        if replace_messages:
+                            # Only new or changed messages are written
+                            await cursor.execute(_MESSAGE_HASHES_SQL, (session_id, first_message))
+                            stored = _stored_hashes(await cursor.fetchall())
+                            write, stale = _message_changes(first_message, hashes, stored)
+                            skipped = len(messages) - len(write)
+                            for statement, params in _delete_orders_statements(session_id, stale):
+                                await cursor.execute(statement, params)
+                        query = _HASHED_MESSAGE_INSERT_SQL
+                        rows = messages.hashed_rows(session_id, hashes, write)
+                    else:
+                        if replace_messages and first_message:
+                            await cursor.execute(_DELETE_MESSAGES_FROM_SQL, (session_id, first_message))
+                        elif replace_messages:
+                            await cursor.execute(_DELETE_MESSAGES_SQL, (session_id,))
+                        query = _MESSAGE_INSERT_SQL
+                        rows = _message_rows(session_id, messages)
+                    for statement, params in _batch_statements(query, rows, self.max_packet_bytes):
+                        await cursor.execute(statement, params)
+                    if self.session_stats:
+                        for statement, params in stats_statements(session_id, SessionStats.from_data(data)):
+                            await cursor.execute(statement, params)
+                await conn.commit()
+                self.messages_written += len(messages) - skipped
+                self.messages_skipped += skipped
+            except Exception:
+                try:
+                    await conn.rollback()
+                except Exception:
+                    # A dead connection must not leave the pool for reuse
+                    conn.close()
+                raise
+
+    async def process_directory(self, directory: str, pattern: str = "*.md",
+                                incremental: bool = True):
+        """
+        Process all markdown files in a directory concurrently.
+
+        Uses the same manifest and duplicate detection as the sync processor;
+        up to `concurrency` files are parsed and written at the same time.
+        """
+        processor = self.processor
+        manifest, pending, duplicates = processor.plan_directory(directory, pattern, incremental)
+        index = processor.load_session_index(directory)
+        search = processor.open_search_index(directory)
+
+        async def ingest(filepath, status, state):
+            first_message = 0
+            if status == 'appended':
+                first_message = processor.appended_from(manifest[filepath.name])
+            data = await self.ingest_file(str(filepath), first_message)
+            if data is None:
+                return False
+            size = state['size'] if state else filepath.stat().st_size
+            processor.index_ingested(filepath, size, data, index, search, first_message)
+            if incremental:
+                processor.record_ingest(manifest, filepath, state, data)
+            return True
+
+        success_count = 0
+        self.messages_written = self.messages_skipped = 0
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        if self.parse_workers > 0:
+            self._executor = ProcessPoolExecutor(max_workers=self.parse_workers)
+        try:
+            if pending:
+                await self.connect()
+            results = await asyncio.gather(*(ingest(*item) for item in pending))
+            success_count = sum(results)
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+            self._semaphore = None
+            await self.disconnect()
+            if incremental:
+                processor.save_manifest(directory, manifest)
+            processor.refresh_indexes(directory, pattern, manifest, index, search)
+            if search is not None:
+                search.close()
+
+        print(f"\nProcessed {success_count}/{len(pending)} files successfully")
+        if duplicates:
+            print(f"Skipped {len(duplicates)} duplicate files")
+        if self.message_hashes and pending:
+            print(f"Messages: {self.messages_written} written, {self.messages_skipped} unchanged skipped")
+
+
+# Usage example
+if __name__ == "__main__":
+    import argparse
+    import os
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description='Process Chat Bridge transcripts into the database (asyncio).')
+    parser.add_argument('directory', nargs='?', default='.',
+                        help='Folder containing the transcripts (default: current directory)')
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help='Files in flight at once (default: 8)')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='Parse files in N worker processes (default: 0, threads)')
+    parser.add_argument('--no-migrate', action='store_true',
+                        help='Do not apply schema migrations on connect (see schema.py)')
+    args = parser.parse_args()
+
+    # Load environment variables
+    load_dotenv()
+
+    # Database configuration from .env
+    db_config = {
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'user': os.getenv('DB_USER'),
+        'password': os.getenv('DB_PASSWORD'),
+        'database': os.getenv('DB_NAME'),
+        'port': int(os.getenv('DB_PORT', 3306))
+    }
+
+    processor = AsyncChatBridgeProcessor(db_config, concurrency=args.concurrency,
+                                         parse_workers=args.workers,
+                                         manage_schema=not args.no_migrate)
+    asyncio.run(processor.process_directory(args.directory))
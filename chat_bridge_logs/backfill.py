@@ -0,0 +1,332 @@
+"""
+Bulk backfill: rebuild the database from a whole transcript archive.
+
+Instead of replaying every file through INSERT statements, all transcripts
+are parsed into TSV staging files, loaded into temporary staging tables with
+LOAD DATA LOCAL INFILE and merged into sessions, agents and messages with one
+set-based statement each. Non-unique secondary indexes of the target tables
+are dropped for the merge and rebuilt once at the end. session_stats rollups
+are staged and merged the same way, and messages carry their content hash
+unless the processor has message hashes turned off.
+
+Needs local_infile enabled on the server; the connection is opened with
+allow_local_infile=True.
+
+Usage:
+    python process_logs.py --backfill [directory] [--workers N]
+"""
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import mysql.connector
+
+from message_batch import MessageBatch
+from process_logs import _agent_rows, _message_rows, _parse_in_worker, _session_row
+from schema import migrate
+from session_stats import STATS_COLUMNS, SessionStats
+
+# Target table -> columns, in the order of the process_logs row builders
+_COLUMNS = {
+    'sessions': ('session_id', 'started_at', 'conversation_starter', 'max_rounds',
+                 'memory_rounds', 'stop_word_detection', 'stop_words'),
+    'agents': ('session_id', 'agent_label', 'provider', 'model', 'temperature',
+               'persona', 'system_prompt'),
+    'messages': ('session_id', 'speaker', 'timestamp', 'content', 'message_order'),
+    'session_stats': STATS_COLUMNS,
+}
+_HASHED_MESSAGE_COLUMNS = _COLUMNS['messages'] + ('content_hash',)
+
+# Staging tables copy the column types of their target, but no indexes
+_CREATE_STAGING_SQL = "CREATE TEMPORARY TABLE staging_{table} AS SELECT {columns} FROM {table} LIMIT 0"
+
+_LOAD_SQL = r"""
+LOAD DATA LOCAL INFILE %s INTO TABLE staging_{table}
+CHARACTER SET utf8mb4
+FIELDS TERMINATED BY '\t' ESCAPED BY '\\'
+LINES TERMINATED BY '\n'
+({columns})
+"""
+
+# Same update rules as the per-file upserts in process_logs.py
+_MERGE_SQL = [
+    """
+    INSERT INTO sessions ({sessions})
+    SELECT {sessions} FROM staging_sessions
+    ON DUPLICATE KEY UPDATE
+    started_at = VALUES(started_at),
+    conversation_starter = VALUES(conversation_starter)
+    """,
+    """
+    INSERT INTO agents ({agents})
+    SELECT {agents} FROM staging_agents
+    ON DUPLICATE KEY UPDATE
+    provider = VALUES(provider),
+    model = VALUES(model),
+    temperature = VALUES(temperature),
+    persona = VALUES(persona),
+    system_prompt = VALUES(system_prompt)
+    """,
+    # Reloaded sessions replace their messages, as re-ingesting a file does
+    """
+    DELETE messages FROM messages
+    JOIN staging_sessions USING (session_id)
+    """,
+    """
+    INSERT INTO messages ({messages})
+    SELECT {messages} FROM staging_messages
+    ORDER BY session_id, message_order
+    """,
+]
+
+_STATS_MERGE_SQL = [
+    """
+    DELETE session_stats FROM session_stats
+    JOIN staging_sessions USING (session_id)
+    """,
+    """
+    INSERT INTO session_stats ({session_stats})
+    SELECT {session_stats} FROM staging_session_stats
+    """,
+]
+
+# Indexes on an AUTO_INCREMENT column (schema.py's idx_id) must stay: the column needs one
+_SECONDARY_INDEXES_SQL = """
+SELECT INDEX_NAME, INDEX_TYPE, COLUMN_NAME, SUB_PART
+FROM information_schema.STATISTICS
+WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+AND NON_UNIQUE = 1 AND INDEX_TYPE IN ('BTREE', 'HASH', 'FULLTEXT')
+AND INDEX_NAME NOT IN (
+    SELECT s.INDEX_NAME FROM information_schema.STATISTICS s
+    JOIN information_schema.COLUMNS c USING (TABLE_SCHEMA, TABLE_NAME, COLUMN_NAME)
+    WHERE s.TABLE_SCHEMA = DATABASE() AND s.TABLE_NAME = %s AND c.EXTRA LIKE '%%auto_increment%%'
+)
+ORDER BY INDEX_NAME, SEQ_IN_INDEX
+"""
+
+_TSV_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r', '\0': '\\0'})
+
+
+def _tsv_field(value) -> str:
+    """Format one value the way LOAD DATA reads it back (NULL is \\N)."""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    return str(value).translate(_TSV_ESCAPES)
+
+
+def _write_tsv(f, rows: Iterable[tuple]) -> int:
+    count = 0
+    for row in rows:
+        f.write('\t'.join(map(_tsv_field, row)))
+        f.write('\n')
+        count += 1
+    return count
+
+
+def _parse_files(processor, paths: List[Path], workers: int) -> Iterator[Tuple[Path, Optional[Dict]]]:
+    """Yield (path, parsed data or None) in order, parsing in a process pool if workers > 1."""
+    if workers <= 1:
+        for filepath in paths:
+            try:
+                yield filepath, processor.parse_markdown_file(str(filepath))
+            except Exception as e:
+                print(f"Error processing file {filepath}: {e}")
+                yield filepath, None
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # A bounded window of futures keeps memory flat on large archives
+        window = []
+        for filepath in paths:
+            window.append((filepath, executor.submit(_parse_in_worker, str(filepath))))
+            if len(window) >= workers * 2:
+                yield _result(*window.pop(0))
+        for filepath, future in window:
+            yield _result(filepath, future)
+
+
+def _result(filepath: Path, future) -> Tuple[Path, Optional[Dict]]:
+    try:
+        return filepath, future.result()
+    except Exception as e:
+        print(f"Error processing file {filepath}: {e}")
+        return filepath, None
+
+
+def _defer_indexes(cursor, table: str) -> List[str]:
+    """
+    Drop the non-unique secondary indexes of a table.
+
+    Returns the ADD INDEX clauses that recreate them. Indexes that cannot be
+    dropped (e.g. ones a foreign key needs) are left in place.
+    """
+    cursor.execute(_SECONDARY_INDEXES_SQL, (table, table))
+    indexes = {}
+    for name, index_type, column, sub_part in cursor.fetchall():
+        column_sql = f"`{column}`" + (f"({sub_part})" if sub_part else '')
+        indexes.setdefault((name, index_type), []).append(column_sql)
+
+    clauses = []
+    for (name, index_type), columns in indexes.items():
+        try:
+            cursor.execute(f"ALTER TABLE `{table}` DROP INDEX `{name}`")
+        except mysql.connector.Error as e:
+            print(f"Keeping index {table}.{name}: {e}")
+            continue
+        kind = 'FULLTEXT INDEX' if index_type == 'FULLTEXT' else 'INDEX'
+        clauses.append(f"ADD {kind} `{name}` ({', '.join(columns)})")
+    return clauses
+
+
+def backfill_directory(processor, directory: str, pattern: str = "*.md", workers: int = 1) -> bool:
+    """
+    Rebuild the database from every transcript in a directory in bulk.
+
+    Duplicates are skipped as in process_directory. On success the manifest
+    is rewritten and the session and search indexes are updated, so later
+    incremental runs start from the backfilled state; if the merge fails,
+    all three stay as they were.
+
+    Args:
+        processor: A ChatBridgeProcessor (a connection with local infile
+            allowed is opened from its db_config)
+        directory: Folder containing the transcripts
+        pattern: Transcript file pattern
+        workers: Parse files in this many worker processes
+
+    Returns:
+        True if the merge was committed
+    """
+    start = time.perf_counter()
+    manifest, pending, duplicates = processor.plan_directory(directory, pattern, incremental=False)
+    index = processor.load_session_index(directory)
+    search = processor.open_search_index(directory)
+    # Manifest entries and index updates of the staged files, applied only once
+    # the merge is committed
+    staged = {}
+    staged_index = {}
+    if search is not None:
+        search.begin()
+    tables = {table: columns for table, columns in _COLUMNS.items()
+              if table != 'session_stats' or processor.session_stats}
+    if processor.message_hashes:
+        tables['messages'] = _HASHED_MESSAGE_COLUMNS
+    merge = _MERGE_SQL + (_STATS_MERGE_SQL if processor.session_stats else [])
+
+    with tempfile.TemporaryDirectory(prefix='chat_bridge_backfill_') as staging_dir:
+        staging = {table: Path(staging_dir) / f"{table}.tsv" for table in tables}
+        counts = dict.fromkeys(tables, 0)
+        files = {table: open(path, 'w', encoding='utf-8', newline='') for table, path in staging.items()}
+        try:
+            paths = [filepath for filepath, status, state in pending]
+            for filepath, data in _parse_files(processor, paths, workers):
+                if data is None:
+                    continue
+                session_id = data['session']['session_id']
+                if not session_id:
+                    print(f"Error processing file {filepath}: no Session ID")
+                    continue
+                counts['sessions'] += _write_tsv(files['sessions'], [_session_row(data['session'])])
+                counts['agents'] += _write_tsv(files['agents'], _agent_rows(session_id, data['agents']))
+                if processor.message_hashes:
+                    messages = MessageBatch.coerce(data['messages'])
+                    rows = messages.hashed_rows(session_id, messages.hashes())
+                else:
+                    rows = _message_rows(session_id, data['messages'])
+                counts['messages'] += _write_tsv(files['messages'], rows)
+                if processor.session_stats:
+                    counts['session_stats'] += _write_tsv(files['session_stats'],
+                                                          SessionStats.from_data(data).rows(session_id))
+                status, state = processor.check_manifest(None, filepath)
+                processor.record_ingest(staged, filepath, state, data)
+                processor.index_ingested(filepath, state['size'], data, staged_index, search)
+        finally:
+            for f in files.values():
+                f.close()
+        parsed = time.perf_counter()
+        print(f"Staged {counts['sessions']} sessions, {counts['agents']} agents and "
+              f"{counts['messages']} messages in {parsed - start:.1f}s")
+
+        committed = False
+        try:
+            conn = mysql.connector.connect(**dict(processor.db_config, allow_local_infile=True))
+        except mysql.connector.Error as e:
+            print(f"Error connecting to database: {e}")
+            conn = None
+        if conn is not None:
+            cursor = conn.cursor()
+            deferred = {}
+            try:
+                cursor.execute("SET SESSION foreign_key_checks = 0, unique_checks = 0")
+                # The staging tables copy their target's columns, so the schema must be current
+                if processor.manage_schema:
+                    migrate(cursor)
+                for table, columns in tables.items():
+                    column_list = ', '.join(columns)
+                    cursor.execute(_CREATE_STAGING_SQL.format(table=table, columns=column_list))
+                    cursor.execute(_LOAD_SQL.format(table=table, columns=column_list),
+                                   (str(staging[table]),))
+                loaded = time.perf_counter()
+                print(f"Loaded staging tables in {loaded - parsed:.1f}s")
+
+                # ALTER TABLE commits implicitly, so indexes are dropped before the merge starts
+                for table in ('messages', 'agents'):
+                    deferred[table] = _defer_indexes(cursor, table)
+
+                names = {table: ', '.join(columns) for table, columns in tables.items()}
+                for statement in merge:
+                    cursor.execute(statement.format(**names))
+                conn.commit()
+                committed = True
+                merged = time.perf_counter()
+                print(f"Merged into sessions, agents and messages in {merged - loaded:.1f}s")
+            except mysql.connector.Error as e:
+                print(f"Error during backfill: {e}")
+                try:
+                    conn.rollback()
+                except mysql.connector.Error:
+                    pass
+            finally:
+                rebuild = time.perf_counter()
+                for table, clauses in deferred.items():
+                    if clauses:
+                        try:
+                            cursor.execute(f"ALTER TABLE `{table}` {', '.join(clauses)}")
+                        except mysql.connector.Error as e:
+                            print(f"Error rebuilding indexes of {table}: {e}")
+                if any(deferred.values()):
+                    print(f"Rebuilt secondary indexes in {time.perf_counter() - rebuild:.1f}s")
+                try:
+                    for table in tables:
+                        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS staging_{table}")
+                    cursor.close()
+                    conn.close()
+                except mysql.connector.Error:
+                    pass
+
+    if committed:
+        manifest.update(staged)
+        for filepath, state, session_id, original in duplicates:
+            status, state = processor.check_manifest(None, filepath)
+            state.update(session_id=session_id, messages=None, duplicate_of=original)
+            manifest[filepath.name] = state
+        processor.save_manifest(directory, manifest)
+        index.update(staged_index)
+        if search is not None:
+            search.commit()
+        processor.refresh_indexes(directory, pattern, manifest, index, search)
+    elif search is not None:
+        # Nothing was written: the indexes stay as they were
+        search.rollback()
+    if search is not None:
+        search.close()
+
+    print(f"\nBackfilled {len(staged) if committed else 0}/{len(pending)} files "
+          f"in {time.perf_counter() - start:.1f}s")
+    if duplicates:
+        print(f"Skipped {len(duplicates)} duplicate files")
+    return committed
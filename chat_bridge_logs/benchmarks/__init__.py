@@ -0,0 +1,6 @@
+"""
+Performance benchmarks for the Chat Bridge log processor.
+
+Run from the chat_bridge_logs folder, e.g.:
+    python -m benchmarks.bench_inserts
+"""
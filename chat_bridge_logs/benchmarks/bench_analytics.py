@@ -0,0 +1,139 @@
+"""
+Benchmark corpus analytics at 100k+ messages.
+
+Answers the corpus_analytics questions (reply length by model, temperature
+vs reply length, rounds reached vs max_rounds, stop-word endings) twice:
+with Python loops over parse_markdown_file dicts, as ad-hoc scripts do, and
+with the vectorized Corpus. Also compares parsing the corpus with loading
+its .npz cache, and checks that both ways give the same answers.
+
+Usage:
+    python -m benchmarks.bench_analytics [--files 500] [--messages 220] [--message-bytes 300]
+"""
+import argparse
+import math
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.transcripts import write_corpus
+from corpus_analytics import ANALYTICS_CACHE_FILENAME, Corpus, _stop_word_hit
+from process_logs import ChatBridgeProcessor
+
+
+def _percentile(values: list, fraction: float) -> int:
+    return values[max(math.ceil(fraction * len(values)), 1) - 1]
+
+
+def loop_reply_lengths(parsed: list) -> dict:
+    """Reply characters per model, by looping over every message dict."""
+    lengths = {}
+    for data in parsed:
+        models = {f"Agent {agent['label']}": agent['model'] or '(none)' for agent in data['agents']}
+        for message in data['messages']:
+            if message['speaker'] != 'Human':
+                lengths.setdefault(models[message['speaker']], []).append(len(message['content']))
+    result = {}
+    for model, values in lengths.items():
+        values.sort()
+        result[model] = (len(values), sum(values) / len(values), _percentile(values, 0.5),
+                         _percentile(values, 0.9))
+    return result
+
+
+def loop_temperature(parsed: list) -> dict:
+    by_temperature = {}
+    for data in parsed:
+        temperatures = {f"Agent {agent['label']}": agent['temperature'] for agent in data['agents']}
+        for message in data['messages']:
+            temperature = temperatures.get(message['speaker'])
+            if temperature is not None:
+                by_temperature.setdefault(temperature, []).append(len(message['content']))
+    return {temperature: sum(values) / len(values) for temperature, values in by_temperature.items()}
+
+
+def loop_rounds_and_stops(parsed: list) -> tuple:
+    reached = stopped = limited = 0
+    for data in parsed:
+        session = data['session']
+        messages = list(data['messages'])
+        replies = sum(1 for message in messages if message['speaker'] != 'Human')
+        hit = bool(session['stop_word_detection'] and messages
+                   and _stop_word_hit(session['stop_words'], messages[-1]['content']))
+        stopped += hit
+        if session['max_rounds']:
+            limited += 1
+            reached += (replies + 1) // 2 >= session['max_rounds']
+    return limited, reached, stopped
+
+
+def timed(function, *args, repeat: int = 3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--files', type=int, default=500)
+    parser.add_argument('--messages', type=int, default=220)
+    parser.add_argument('--message-bytes', type=int, default=300)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        size = write_corpus(directory, args.files, args.messages, args.message_bytes)
+        files = sorted(directory.glob('*.md'))
+        processor = ChatBridgeProcessor({}, mmap_threshold=None, full_text_search=False)
+
+        start = time.perf_counter()
+        parsed = [processor.parse_markdown_file(str(filepath)) for filepath in files]
+        parse_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        Corpus.load(str(directory))
+        build_seconds = time.perf_counter() - start
+        corpus, load_seconds = timed(Corpus.load, str(directory))
+        cache_bytes = (directory / ANALYTICS_CACHE_FILENAME).stat().st_size
+
+        loop_lengths, loop_lengths_seconds = timed(loop_reply_lengths, parsed)
+        loop_temperatures, loop_temperature_seconds = timed(loop_temperature, parsed)
+        loop_rounds, loop_rounds_seconds = timed(loop_rounds_and_stops, parsed)
+        lengths, lengths_seconds = timed(corpus.reply_lengths, 'model')
+        temperatures, temperature_seconds = timed(corpus.temperature_verbosity)
+        rounds, rounds_seconds = timed(corpus.rounds_vs_max)
+        stops, stops_seconds = timed(corpus.stop_word_endings, 'model')
+
+    # Both ways must agree
+    for row in lengths:
+        count, mean, p50, p90 = loop_lengths[row['key']]
+        assert (row['replies'], row['p50_characters'], row['p90_characters']) == (count, p50, p90)
+        assert np.isclose(row['mean_characters'], mean)
+    for row in temperatures['by_temperature']:
+        assert np.isclose(row['mean_characters'], loop_temperatures[row['temperature']])
+    assert (rounds['sessions'], rounds['reached_max'], stops['ended_by_stop_word']) == loop_rounds
+
+    messages = len(corpus.messages['speaker'])
+    loops = loop_lengths_seconds + loop_temperature_seconds + loop_rounds_seconds
+    vectorized = lengths_seconds + temperature_seconds + rounds_seconds + stops_seconds
+    print(f"Corpus: {len(corpus)} sessions, {messages:,} messages, {size / 1e6:.1f} MB")
+    print(f"Parse all transcripts:        {parse_seconds * 1000:9,.0f} ms")
+    print(f"Build Corpus + write cache:   {build_seconds * 1000:9,.0f} ms")
+    print(f"Load Corpus from cache:       {load_seconds * 1000:9,.1f} ms "
+          f"({parse_seconds / load_seconds:,.0f}x faster than parsing; cache {cache_bytes / 1e6:.1f} MB)")
+    print(f"{'':30} {'loops':>9} {'numpy':>9}")
+    for name, before, after in (('reply lengths by model', loop_lengths_seconds, lengths_seconds),
+                                ('temperature vs length', loop_temperature_seconds, temperature_seconds),
+                                ('rounds + stop words', loop_rounds_seconds, rounds_seconds + stops_seconds)):
+        print(f"{name:<30} {before * 1000:7.1f}ms {after * 1000:7.2f}ms  {before / after:5.0f}x")
+    print(f"{'all aggregations':<30} {loops * 1000:7.1f}ms {vectorized * 1000:7.2f}ms  {loops / vectorized:5.0f}x")
+
+
+if __name__ == "__main__":
+    main()
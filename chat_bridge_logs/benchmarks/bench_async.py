@@ -0,0 +1,119 @@
+"""
+Benchmark directory ingest: sync ChatBridgeProcessor vs AsyncChatBridgeProcessor.
+
+Both processors write to an in-process fake database that sleeps for a fixed
+round-trip time on every statement, so the comparison shows how much network
+latency each engine hides without needing a server (or touching real data).
+Transcripts are generated into a temporary folder.
+
+Usage:
+    python -m benchmarks.bench_async [--files 200] [--messages 40] [--latency-ms 2] [--concurrency 16]
+"""
+import argparse
+import asyncio
+import contextlib
+import tempfile
+import time
+from pathlib import Path
+
+from async_process_logs import AsyncChatBridgeProcessor
+from benchmarks.fake_db import FakePool
+from benchmarks.transcripts import write_transcripts
+from process_logs import ChatBridgeProcessor
+
+
+class FakeAsyncCursor:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def execute(self, statement, params=None):
+        await asyncio.sleep(self.latency)
+
+    async def fetchall(self):
+        # No rows stored: every message counts as new
+        return []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeAsyncConnection:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def cursor(self):
+        return FakeAsyncCursor(self.latency)
+
+    async def commit(self):
+        await asyncio.sleep(self.latency)
+
+    async def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeAsyncPool:
+    """Stands in for an aiomysql pool of `size` connections."""
+
+    def __init__(self, latency: float, size: int):
+        self.latency = latency
+        self.slots = asyncio.Semaphore(size)
+
+    @contextlib.asynccontextmanager
+    async def acquire(self):
+        async with self.slots:
+            yield FakeAsyncConnection(self.latency)
+
+
+def run_sync(directory: Path, latency: float, workers: int) -> float:
+    processor = ChatBridgeProcessor({})
+    processor.pool = FakePool(latency)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(None):
+        processor.process_directory(str(directory), incremental=False, workers=workers)
+    return time.perf_counter() - start
+
+
+async def run_async(directory: Path, latency: float, concurrency: int) -> float:
+    processor = AsyncChatBridgeProcessor({}, concurrency=concurrency,
+                                         pool=FakeAsyncPool(latency, concurrency))
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(None):
+        await processor.process_directory(str(directory), incremental=False)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--files', type=int, default=200)
+    parser.add_argument('--messages', type=int, default=40)
+    parser.add_argument('--latency-ms', type=float, default=2.0)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=4,
+                        help='Worker processes for the sync --workers run')
+    args = parser.parse_args()
+    latency = args.latency_ms / 1000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        write_transcripts(directory, args.files, args.messages)
+
+        sequential = run_sync(directory, latency, workers=1)
+        parallel = run_sync(directory, latency, workers=args.workers)
+        concurrent = asyncio.run(run_async(directory, latency, args.concurrency))
+
+    print(f"Files: {args.files} x {args.messages} messages, "
+          f"{args.latency_ms:g} ms per round trip")
+    print(f"Sync:                 {args.files / sequential:,.1f} files/sec")
+    print(f"Sync, {args.workers} workers:      {args.files / parallel:,.1f} files/sec")
+    print(f"Async, concurrency {args.concurrency}: {args.files / concurrent:,.1f} files/sec "
+          f"({sequential / concurrent:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
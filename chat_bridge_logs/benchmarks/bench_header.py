@@ -0,0 +1,76 @@
+"""
+Micro-benchmark for header extraction on the largest transcript in a folder.
+
+Compares the former approach (one freshly built regex per field, each
+searching the whole document) with the precompiled one-pass scan of the
+metadata block used by parse_markdown_file_regex.
+
+Usage:
+    python -m benchmarks.bench_header [directory] [--repeat 200]
+"""
+import argparse
+import re
+import timeit
+from pathlib import Path
+
+from process_logs import ChatBridgeProcessor, _CONVERSATION_RE
+
+SINGLE_LINE_FIELDS = [
+    'Agent A Provider', 'Agent A Model', 'Agent A Persona',
+    'Agent B Provider', 'Agent B Model', 'Agent B Persona',
+]
+
+
+def extract_per_field(content: str) -> dict:
+    """Header extraction as it was done before: one whole-document search per field."""
+    fields = {
+        'Session ID': re.search(r'\*\*Session ID:\*\* (conv_\d+_\d+)', content),
+        'Started': re.search(r'\*\*Started:\*\* ([\d-]+ [\d:]+)', content),
+        'Conversation Starter': re.search(r'\*\*Conversation Starter:\*\* (.+?)(?=\n\n|\n###)',
+                                          content, re.DOTALL),
+        'Max Rounds': re.search(r'\*\*Max Rounds:\*\* (\d+)', content),
+        'Memory Rounds': re.search(r'\*\*Memory Rounds:\*\* (\d+)', content),
+        'Stop Word Detection': re.search(r'\*\*Stop Word Detection:\*\* (\w+)', content),
+        'Stop Words': re.search(r'\*\*Stop Words:\*\* (.+)', content),
+    }
+    for name in SINGLE_LINE_FIELDS:
+        fields[name] = re.search(rf'\*\*{name}:\*\* (.+)', content)
+    for label in ('A', 'B'):
+        fields[f'Agent {label} Temperature'] = re.search(
+            rf'\*\*Agent {label} Temperature:\*\* ([\d.]+)', content)
+        fields[f'Agent {label} System Prompt'] = re.search(
+            rf'\*\*Agent {label} System Prompt:\*\* (.+?)(?=\n\n\*\*|\n###)', content, re.DOTALL)
+    return {name: match.group(1) for name, match in fields.items() if match}
+
+
+def extract_one_pass(processor: ChatBridgeProcessor, content: str) -> dict:
+    """Current header extraction: cut the metadata block, then scan it once."""
+    conversation = _CONVERSATION_RE.search(content)
+    metadata = content[:conversation.start()] if conversation else content
+    return processor._scan_metadata(metadata)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('directory', nargs='?', default='.')
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    files = [f for f in Path(args.directory).glob('*.md') if f.name not in ['logging.md', 'index.md']]
+    if not files:
+        print(f"No transcripts found in {args.directory}")
+        return
+    largest = max(files, key=lambda f: f.stat().st_size)
+    content = largest.read_text(encoding='utf-8')
+    processor = ChatBridgeProcessor({})
+
+    before = timeit.timeit(lambda: extract_per_field(content), number=args.repeat) / args.repeat
+    after = timeit.timeit(lambda: extract_one_pass(processor, content), number=args.repeat) / args.repeat
+
+    print(f"File: {largest.name} ({largest.stat().st_size / 1024:.1f} KB)")
+    print(f"Per-field regex searches: {before * 1e6:,.1f} us")
+    print(f"One-pass metadata scan:   {after * 1e6:,.1f} us ({before / after:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
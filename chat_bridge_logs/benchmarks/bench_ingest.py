@@ -0,0 +1,242 @@
+"""
+Parser and ingest benchmark suite on synthetic transcripts, with baselines.
+
+Generates realistic transcripts for each tier of transcripts.TIERS (from
+~1 KB with a single message to ~20 MB with 10k messages) and measures:
+
+    parse/<tier>/<parser>   MB/s and messages/s of the streaming, mmap and
+                            regex parsers
+    memory/<tier>/<parser>  peak Python heap while parsing the tier's largest
+                            file, as a multiple of its size
+    ingest/<tier>/<target>  end-to-end process_directory throughput against
+                            an in-process fake database, or with --database
+                            the server configured in .env (TEMPORARY tables
+                            shadow the real ones, so no data is touched)
+
+Results are compared with a stored baseline and every metric that got more
+than --tolerance worse is flagged; the exit status is then 1. Without a
+baseline nothing is compared and the exit status is 2. benchmarks/baseline.json
+holds one recorded on the synthetic corpus with the fake database; record
+your own with --save-baseline on the machine that runs the comparison, as
+throughput numbers do not carry over between machines.
+
+Usage:
+    python -m benchmarks.bench_ingest [--tiers tiny,small,medium,large,huge] [--repeat 3]
+        [--database] [--baseline benchmarks/baseline.json] [--save-baseline] [--tolerance 0.15]
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List
+
+from benchmarks.bench_inserts import TEMP_TABLES
+from benchmarks.fake_db import FakePool
+from benchmarks.transcripts import TIERS, write_corpus
+from process_logs import ChatBridgeProcessor
+
+DEFAULT_BASELINE = Path(__file__).with_name('baseline.json')
+
+
+def parse_stream(processor: ChatBridgeProcessor, path: str) -> Dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return processor.parse_lines(f)
+
+
+PARSERS = {
+    'stream': parse_stream,
+    'mmap': lambda processor, path: processor.parse_markdown_file_mmap(path),
+    'regex': lambda processor, path: processor.parse_markdown_file_regex(path),
+}
+
+# Metrics where a smaller value is better; all others are throughputs
+LOWER_IS_BETTER = {'peak_ratio'}
+
+
+def best_of(repeat: int, run) -> float:
+    """Run `run` repeat times and return the fastest time in seconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def bench_parse(processor: ChatBridgeProcessor, paths: List[str], size: int,
+                messages: int, repeat: int) -> Dict[str, Dict]:
+    results = {}
+    for name, parse in PARSERS.items():
+        seconds = best_of(repeat, lambda: [parse(processor, path) for path in paths])
+        results[name] = {
+            'mb_per_sec': size / 1e6 / seconds,
+            'messages_per_sec': messages / seconds,
+        }
+    return results
+
+
+def bench_memory(processor: ChatBridgeProcessor, path: str) -> Dict[str, Dict]:
+    """Peak traced allocations of one parse per parser, relative to the file size."""
+    size = os.path.getsize(path)
+    results = {}
+    tracemalloc.start()
+    try:
+        for name, parse in PARSERS.items():
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            data = parse(processor, path)
+            peak = tracemalloc.get_traced_memory()[1] - baseline
+            del data
+            results[name] = {'peak_ratio': peak / size}
+    finally:
+        tracemalloc.stop()
+    return results
+
+
+def bench_ingest(directory: Path, files: int, size: int, messages: int, repeat: int,
+                 db_config: Dict = None) -> Dict:
+    """End-to-end process_directory throughput (fake database unless db_config is given)."""
+    # The TEMPORARY tables stand in for the schema, so no migrations run; against a
+    # real server, stats and hashes stay off too, as their setup would alter the real
+    # messages table and write to the real session_stats
+    real = db_config is not None
+    processor = ChatBridgeProcessor(db_config or {}, full_text_search=False, manage_schema=False,
+                                    session_stats=not real, message_hashes=not real)
+    if db_config is None:
+        processor.pool = FakePool()
+
+    def run():
+        if db_config is not None:
+            processor.connect()
+            for table in ('sessions', 'agents', 'messages'):
+                processor.cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {table}")
+            for statement in TEMP_TABLES:
+                processor.cursor.execute(statement)
+        with contextlib.redirect_stdout(None):
+            processor.process_directory(str(directory), incremental=False)
+
+    seconds = best_of(repeat, run)
+    return {
+        'files_per_sec': files / seconds,
+        'mb_per_sec': size / 1e6 / seconds,
+        'messages_per_sec': messages / seconds,
+    }
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> List[str]:
+    """Return a description of every metric that regressed by more than tolerance."""
+    regressions = []
+    for case, metrics in results.items():
+        for metric, value in metrics.items():
+            base = baseline.get(case, {}).get(metric)
+            if not base:
+                continue
+            if metric in LOWER_IS_BETTER:
+                regressed = value > base * (1 + tolerance)
+            else:
+                regressed = value < base * (1 - tolerance)
+            if regressed:
+                regressions.append(f"{case} {metric}: {value:,.2f} vs baseline {base:,.2f} "
+                                   f"({100 * (value / base - 1):+.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tiers', default=','.join(TIERS),
+                        help=f"Comma-separated tiers to run (default: {','.join(TIERS)})")
+    parser.add_argument('--repeat', type=int, default=3, help='Best of N runs (default: 3)')
+    parser.add_argument('--database', action='store_true',
+                        help='Ingest into the server from .env instead of a fake database')
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE,
+                        help='Baseline file (default: benchmarks/baseline.json)')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Store these results as the baseline instead of comparing')
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help='Flag metrics more than this fraction worse than the baseline (default: 0.15)')
+    args = parser.parse_args()
+
+    tiers = [tier.strip() for tier in args.tiers.split(',') if tier.strip()]
+    unknown = [tier for tier in tiers if tier not in TIERS]
+    if unknown:
+        parser.error(f"unknown tiers: {', '.join(unknown)}")
+
+    db_config = None
+    if args.database:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        db_config = {
+            'host': os.getenv('DB_HOST', 'localhost'),
+            'user': os.getenv('DB_USER'),
+            'password': os.getenv('DB_PASSWORD'),
+            'database': os.getenv('DB_NAME'),
+            'port': int(os.getenv('DB_PORT', 3306))
+        }
+    target = 'database' if args.database else 'fake'
+
+    processor = ChatBridgeProcessor({}, mmap_threshold=None, full_text_search=False)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        first_index = 0
+        for tier in tiers:
+            files, messages, message_bytes = TIERS[tier]
+            directory = Path(tmp) / tier
+            directory.mkdir()
+            size = write_corpus(directory, files, messages, message_bytes, first_index)
+            first_index += files
+            paths = sorted(str(path) for path in directory.glob('*.md'))
+            total_messages = files * messages
+            print(f"{tier}: {files} files x {messages} messages, {size / 1e6:.2f} MB")
+
+            for name, metrics in bench_parse(processor, paths, size, total_messages, args.repeat).items():
+                results[f"parse/{tier}/{name}"] = metrics
+            largest = max(paths, key=os.path.getsize)
+            for name, metrics in bench_memory(processor, largest).items():
+                results[f"memory/{tier}/{name}"] = metrics
+            results[f"ingest/{tier}/{target}"] = bench_ingest(
+                directory, files, size, total_messages, args.repeat, db_config)
+
+    print()
+    for case, metrics in results.items():
+        values = '  '.join(f"{metric} {value:,.2f}" for metric, value in metrics.items())
+        print(f"{case:<24} {values}")
+
+    if args.save_baseline:
+        stored = {'machine': platform.node(), 'python': platform.python_version(), 'results': results}
+        if args.baseline.exists():
+            # Keep the cases this run did not cover (e.g. other tiers or --database)
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                stored['results'] = dict(json.load(f)['results'], **results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(stored, f, indent=1, sort_keys=True)
+        print(f"\nSaved baseline to {args.baseline}")
+        return
+
+    if not args.baseline.exists():
+        print(f"\nNot compared: no baseline at {args.baseline}; run with --save-baseline to record one")
+        sys.exit(2)
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('machine') != platform.node():
+        print(f"\nWarning: baseline was recorded on {baseline.get('machine')}, not {platform.node()}")
+    uncovered = [case for case in results if case not in baseline['results']]
+    if uncovered:
+        print(f"\nNot compared, missing from the baseline: {', '.join(uncovered)}")
+    regressions = compare(results, baseline['results'], args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regressions beyond {args.tolerance:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print(f"\nNo regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
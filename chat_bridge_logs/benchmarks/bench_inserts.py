@@ -0,0 +1,174 @@
+"""
+Benchmark message/agent inserts: one statement per row vs batched multi-row INSERTs.
+
+Needs a reachable MySQL or MariaDB server configured through the same .env
+variables as process_logs.py. The benchmark writes to TEMPORARY tables that
+shadow sessions/agents/messages for its own connection only, so existing
+data is never touched.
+
+Usage:
+    python -m benchmarks.bench_inserts [--sessions 20] [--messages 125] [--content-bytes 2000]
+"""
+import argparse
+import os
+import random
+import string
+import time
+
+from process_logs import ChatBridgeProcessor
+
+TEMP_TABLES = [
+    """
+    CREATE TEMPORARY TABLE sessions (
+        session_id VARCHAR(32) PRIMARY KEY,
+        started_at DATETIME,
+        conversation_starter TEXT,
+        max_rounds INT,
+        memory_rounds INT,
+        stop_word_detection BOOLEAN,
+        stop_words TEXT
+    )
+    """,
+    """
+    CREATE TEMPORARY TABLE agents (
+        session_id VARCHAR(32) NOT NULL,
+        agent_label CHAR(1) NOT NULL,
+        provider VARCHAR(64),
+        model VARCHAR(128),
+        temperature FLOAT,
+        persona VARCHAR(128),
+        system_prompt TEXT,
+        PRIMARY KEY (session_id, agent_label)
+    )
+    """,
+    """
+    CREATE TEMPORARY TABLE messages (
+        id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        session_id VARCHAR(32) NOT NULL,
+        speaker VARCHAR(16) NOT NULL,
+        timestamp DATETIME,
+        content MEDIUMTEXT,
+        message_order INT NOT NULL,
+        content_hash CHAR(32)
+    )
+    """,
+]
+
+
+def make_session(index: int, message_count: int, content_bytes: int):
+    """Build a synthetic parsed session in the shape parse_markdown_file returns."""
+    session_id = f"conv_20250101_{index:06d}"
+    alphabet = string.ascii_letters + string.digits + "  \n'\"\\"
+    agents = [{
+        'label': label,
+        'provider': 'openai',
+        'model': 'gpt-4o',
+        'temperature': 0.7,
+        'persona': 'scientist',
+        'system_prompt': 'You are a careful scientist.' * 10
+    } for label in ('A', 'B')]
+    messages = [{
+        'speaker': ('Human', 'Agent A', 'Agent B')[min(i, 1 + i % 2)],
+        'timestamp': '2025-01-01 12:00:00',
+        'content': ''.join(random.choices(alphabet, k=content_bytes)),
+        'order': i
+    } for i in range(message_count)]
+    return session_id, agents, messages
+
+
+def insert_row_by_row(processor: ChatBridgeProcessor, session_id: str, agents, messages):
+    """The pre-batching insert path: one cursor.execute per row."""
+    agent_query = """
+    INSERT INTO agents
+    (session_id, agent_label, provider, model, temperature, persona, system_prompt)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+    provider = VALUES(provider),
+    model = VALUES(model),
+    temperature = VALUES(temperature),
+    persona = VALUES(persona),
+    system_prompt = VALUES(system_prompt)
+    """
+    message_query = """
+    INSERT INTO messages
+    (session_id, speaker, timestamp, content, message_order)
+    VALUES (%s, %s, %s, %s, %s)
+    """
+    for agent in agents:
+        processor.cursor.execute(agent_query, (
+            session_id, agent['label'], agent['provider'], agent['model'],
+            agent['temperature'], agent['persona'], agent['system_prompt']
+        ))
+    for msg in messages:
+        processor.cursor.execute(message_query, (
+            session_id, msg['speaker'], msg['timestamp'], msg['content'], msg['order']
+        ))
+
+
+def insert_batched(processor: ChatBridgeProcessor, session_id: str, agents, messages):
+    """The current insert path."""
+    if not processor.insert_agents(session_id, agents):
+        raise RuntimeError("insert_agents failed")
+    if not processor.insert_messages(session_id, messages):
+        raise RuntimeError("insert_messages failed")
+
+
+def run(processor: ChatBridgeProcessor, sessions, insert) -> float:
+    """Insert every session (one commit each) and return rows per second."""
+    processor.cursor.execute("TRUNCATE TABLE messages")
+    processor.cursor.execute("TRUNCATE TABLE agents")
+    rows = 0
+    start = time.perf_counter()
+    for session_id, agents, messages in sessions:
+        insert(processor, session_id, agents, messages)
+        processor.conn.commit()
+        rows += len(agents) + len(messages)
+    elapsed = time.perf_counter() - start
+    return rows / elapsed if elapsed else float('inf')
+
+
+def main():
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sessions', type=int, default=20)
+    parser.add_argument('--messages', type=int, default=125)
+    parser.add_argument('--content-bytes', type=int, default=2000)
+    parser.add_argument('--max-packet-bytes', type=int, default=1024 * 1024)
+    args = parser.parse_args()
+
+    load_dotenv()
+    db_config = {
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'user': os.getenv('DB_USER'),
+        'password': os.getenv('DB_PASSWORD'),
+        'database': os.getenv('DB_NAME'),
+        'port': int(os.getenv('DB_PORT', 3306))
+    }
+
+    random.seed(0)
+    sessions = [make_session(i, args.messages, args.content_bytes) for i in range(args.sessions)]
+
+    # connect() would otherwise alter messages and create session_stats before the
+    # TEMPORARY tables exist to shadow them
+    processor = ChatBridgeProcessor(db_config, max_packet_bytes=args.max_packet_bytes,
+                                    manage_schema=False, session_stats=False,
+                                    message_hashes=False)
+    processor.connect()
+    try:
+        for statement in TEMP_TABLES:
+            processor.cursor.execute(statement)
+
+        before = run(processor, sessions, insert_row_by_row)
+        after = run(processor, sessions, insert_batched)
+    finally:
+        processor.disconnect()
+
+    print(f"Sessions: {args.sessions} x {args.messages} messages "
+          f"({args.content_bytes} bytes each)")
+    print(f"Row by row: {before:,.0f} rows/sec")
+    print(f"Batched:    {after:,.0f} rows/sec ({after / before:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
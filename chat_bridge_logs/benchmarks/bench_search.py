@@ -0,0 +1,90 @@
+"""
+Benchmark full-text search latency over the SQLite FTS5 search index.
+
+Indexes synthetic sessions with a Zipf-like vocabulary (so some words are
+in most messages and others in a handful) and times typical searches:
+common and rare words, phrases, speaker/model filters and deep pages.
+The target is under 50 ms per query; queries over SearchIndex.rank_limit
+matches only rank that many of their most recently indexed matches.
+
+Usage:
+    python -m benchmarks.bench_search [--sessions 2000] [--messages 50]
+"""
+import argparse
+import itertools
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from search_index import SearchIndex
+
+VOCABULARY = [f"word{i}" for i in range(20000)]
+CUM_WEIGHTS = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(VOCABULARY))))
+
+
+def make_session(index: int, message_count: int) -> dict:
+    """Build a parsed session in the shape parse_markdown_file returns."""
+    agents = [
+        {'label': 'A', 'provider': 'openai', 'model': 'gpt-4o'},
+        {'label': 'B', 'provider': 'anthropic', 'model': 'claude'},
+    ]
+    messages = [{
+        'speaker': ('Human', 'Agent A', 'Agent B')[min(order, 1 + order % 2)],
+        'timestamp': '2025-01-01 12:00:00',
+        'content': ' '.join(random.choices(VOCABULARY, cum_weights=CUM_WEIGHTS, k=120)),
+        'order': order
+    } for order in range(message_count)]
+    session = {'session_id': f"conv_20250101_{index:06d}", 'started_at': '2025-01-01 12:00:00'}
+    return {'session': session, 'agents': agents, 'messages': messages}
+
+
+def timed(search, repeat: int = 5) -> tuple:
+    """Run a search a few times; return (best ms, total matches, matches ranked)."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        page = search()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, page['total'], page['ranked_matches']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sessions', type=int, default=2000)
+    parser.add_argument('--messages', type=int, default=50)
+    args = parser.parse_args()
+
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        index = SearchIndex(Path(tmp) / 'search.sqlite')
+        sessions = [make_session(i, args.messages) for i in range(args.sessions)]
+        start = time.perf_counter()
+        for i, data in enumerate(sessions):
+            index.add_session(f"chat_{i:06d}.md", 0, data)
+        build = time.perf_counter() - start
+
+        # A phrase that really occurs, taken from an indexed message
+        phrase = ' '.join(sessions[0]['messages'][0]['content'].split()[40:43])
+        del sessions
+        queries = [
+            ('common word', lambda: index.search('word1')),
+            ('rare word', lambda: index.search('word15000')),
+            ('two words', lambda: index.search('word3 word7')),
+            ('mid-frequency word', lambda: index.search('word300')),
+            ('phrase', lambda: index.search(f'"{phrase}"')),
+            ('common word, speaker filter', lambda: index.search('word2', speaker='Agent B')),
+            ('common word, model filter', lambda: index.search('word5', model='gpt-4o')),
+            ('common word, page 50', lambda: index.search('word9', page=50)),
+        ]
+        results = [(name, *timed(search)) for name, search in queries]
+        index.close()
+
+    print(f"Indexed {args.sessions * args.messages:,} messages in {build:.1f} s")
+    for name, ms, total, ranked in results:
+        order = 'all ranked' if ranked == total else f"latest {ranked:,} ranked"
+        print(f"{name:30} {ms:8.1f} ms  ({total:,} matches, {order})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark building the archive page index at 10k sessions.
+
+Compares what index.php does on every page load without a session index
+(read logging.md, check every transcript in the folder against the indexed
+filenames with a linear in_array, parse the table rows with the 10-group
+row regex, sort by date) with loading the pre-sorted session_index.jsonl
+written by process_logs.py. The PHP steps are mirrored in Python, so the
+ratio matters more than the absolute times. Also reports how long a full
+rebuild of the session index takes.
+
+Usage:
+    python -m benchmarks.bench_session_index [--sessions 10000] [--messages 10]
+"""
+import argparse
+import json
+import os
+import re
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks.transcripts import write_transcripts
+from process_logs import SESSION_INDEX_FILENAME, ChatBridgeProcessor
+
+ROW_RE = re.compile(r'^\| `([^`]+)` \| ([^|]+) \| ([^|]+) \| ([^|]+) \| ([^(]+)\(([^)]+)\) '
+                    r'\| ([^(]+)\(([^)]+)\) \| (\d+) \| ([^|]+) \|')
+FILENAME_RE = re.compile(r'^\| `([^`]+)` \|')
+
+
+def write_logging_md(directory: Path, index: dict):
+    """Write logging.md the way index.php appends to it."""
+    with open(directory / 'logging.md', 'w', encoding='utf-8') as f:
+        f.write("# Chat Bridge Archive Index\n\n")
+        f.write("| Filename | Session ID | Started | Topic | Agent A | Agent B | Messages | Size |\n")
+        f.write("|----------|------------|---------|-------|---------|---------|----------|------|\n")
+        for record in index.values():
+            f.write(f"| `{record['filename']}` | {record['session_id']} | {record['started']} | "
+                    f"{record['topic'][:50]} | {record['agent_a_persona']} ({record['agent_a_provider']}) | "
+                    f"{record['agent_b_persona']} ({record['agent_b_provider']}) | "
+                    f"{record['messages']} | {record['size'] / 1024:.2f} KB |\n")
+
+
+def load_from_logging_md(directory: Path) -> list:
+    """index.php without a session index: scan, dedupe against logging.md, regex rows, sort."""
+    lines = (directory / 'logging.md').read_text(encoding='utf-8').split('\n')
+    indexed = [m.group(1) for m in map(FILENAME_RE.match, lines) if m]
+    new_files = [name for name in os.listdir(directory)
+                 if name.endswith('.md') and name not in ('index.md', 'logging.md')
+                 and name not in indexed]  # list membership, like in_array
+    assert not new_files
+    transcripts = []
+    for line in lines:
+        match = ROW_RE.match(line)
+        if match:
+            transcripts.append({'filename': match.group(1).strip(), 'started': match.group(3).strip(),
+                                'messageCount': int(match.group(9))})
+    transcripts.sort(key=lambda t: datetime.strptime(t['started'], '%Y-%m-%d %H:%M:%S'), reverse=True)
+    return transcripts
+
+
+def load_from_session_index(directory: Path) -> list:
+    """index.php with a session index: one read, one decode per line, no sort."""
+    with open(directory / SESSION_INDEX_FILENAME, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sessions', type=int, default=10000)
+    parser.add_argument('--messages', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        write_transcripts(directory, args.sessions, args.messages)
+        processor = ChatBridgeProcessor({}, full_text_search=False)
+
+        start = time.perf_counter()
+        index = {}
+        processor.refresh_indexes(str(directory), '*.md', {}, index)
+        rebuild = time.perf_counter() - start
+        write_logging_md(directory, index)
+
+        start = time.perf_counter()
+        old = load_from_logging_md(directory)
+        before = time.perf_counter() - start
+
+        start = time.perf_counter()
+        new = load_from_session_index(directory)
+        after = time.perf_counter() - start
+        assert [t['filename'] for t in old] == [r['filename'] for r in new]
+
+    print(f"Sessions: {args.sessions} x {args.messages} messages")
+    print(f"Full session index rebuild:      {rebuild * 1000:,.0f} ms")
+    print(f"Page index from logging.md scan: {before * 1000:,.1f} ms")
+    print(f"Page index from {SESSION_INDEX_FILENAME}: {after * 1000:,.1f} ms ({before / after:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark "sessions similar to X" over the MinHash LSH index.
+
+Indexes synthetic sessions, a tenth of them reruns of an earlier session
+that follow it for most of their messages and then diverge, and times
+similar_sessions() against comparing X with every session: by signature
+(a linear scan) and by the exact Jaccard similarity of the shingle sets of
+their message bodies (what a pairwise comparison costs). Also reports how
+many of the planted reruns the LSH lookup finds.
+
+Usage:
+    python -m benchmarks.bench_similarity [--sessions 5000] [--messages 20]
+"""
+import argparse
+import random
+import re
+import tempfile
+import time
+from pathlib import Path
+
+from search_index import SearchIndex
+from similarity_index import SHINGLE_WORDS, _signature, similarity
+
+VOCABULARY = [f"word{i}" for i in range(5000)]
+RERUN_EVERY = 10
+
+
+def make_message(rng: random.Random) -> str:
+    return ' '.join(rng.choices(VOCABULARY, k=rng.randint(40, 200)))
+
+
+def make_session(index: int, bodies: list) -> dict:
+    """Build a parsed session in the shape parse_markdown_file returns."""
+    agents = [
+        {'label': 'A', 'provider': 'openai', 'model': 'gpt-4o'},
+        {'label': 'B', 'provider': 'anthropic', 'model': 'claude'},
+    ]
+    messages = [{
+        'speaker': ('Human', 'Agent A', 'Agent B')[min(order, 1 + order % 2)],
+        'timestamp': '2025-01-01 12:00:00',
+        'content': content,
+        'order': order
+    } for order, content in enumerate(bodies)]
+    session = {'session_id': f"conv_20250101_{index:06d}", 'started_at': '2025-01-01 12:00:00'}
+    return {'session': session, 'agents': agents, 'messages': messages}
+
+
+def shingles(bodies: list) -> set:
+    result = set()
+    for body in bodies:
+        words = re.findall(r'\w+', body.lower())
+        result.update(zip(*(words[i:] for i in range(SHINGLE_WORDS))))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sessions', type=int, default=5000)
+    parser.add_argument('--messages', type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    corpus = {}
+    reruns = {}
+    for index in range(args.sessions):
+        if index % RERUN_EVERY == RERUN_EVERY - 1:
+            original = rng.randrange(index)
+            keep = rng.randint(args.messages * 3 // 4, args.messages)
+            bodies = corpus[original][:keep] + [make_message(rng) for _ in range(args.messages - keep)]
+            reruns[index] = original
+        else:
+            bodies = [make_message(rng) for _ in range(args.messages)]
+        corpus[index] = bodies
+    session_id = {index: f"conv_20250101_{index:06d}" for index in corpus}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = SearchIndex(Path(tmp) / 'search.sqlite')
+        start = time.perf_counter()
+        for number, bodies in corpus.items():
+            index.add_session(f"{number}.md", 0, make_session(number, bodies))
+        index_seconds = time.perf_counter() - start
+        similar = index.similarity
+
+        queries = list(reruns.items())[:50]
+        start = time.perf_counter()
+        found = 0
+        for rerun, original in queries:
+            hits = {hit['session_id'] for hit in similar.similar_sessions(session_id[rerun], 0.5, None)}
+            found += session_id[original] in hits
+        lsh_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        start = time.perf_counter()
+        for rerun, _ in queries[:10]:
+            signature = similar.session_signature(session_id[rerun])
+            [similarity(signature, _signature(blob))
+             for blob, in index.conn.execute("SELECT signature FROM session_minhash")]
+        scan_ms = (time.perf_counter() - start) * 1000 / 10
+        index.close()
+
+    sets = {number: shingles(bodies) for number, bodies in corpus.items()}
+    start = time.perf_counter()
+    for rerun, _ in queries[:3]:
+        target = sets[rerun]
+        [len(target & other) / len(target | other) for other in sets.values()]
+    exact_ms = (time.perf_counter() - start) * 1000 / 3
+
+    messages = args.sessions * args.messages
+    print(f"Corpus: {args.sessions} sessions, {messages:,} messages, {len(reruns)} planted reruns")
+    print(f"Index (full-text + MinHash):  {index_seconds:8.2f} s ({index_seconds / messages * 1e6:.0f} us/message)")
+    print(f"Similar to X, LSH buckets:    {lsh_ms:8.2f} ms  (found {found}/{len(queries)} reruns)")
+    print(f"Similar to X, scan signatures:{scan_ms:8.2f} ms")
+    print(f"Similar to X, exact Jaccard:  {exact_ms:8.2f} ms  (shingle sets already built)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark the cold start of process_logs.py and check its budget.
+
+Budget: `process_logs.py FILE --parse-only` on a small transcript finishes
+within BUDGET_MS of a bare `python -c pass`, best of --runs fresh
+processes. The run must not import the database driver or python-dotenv,
+which only the modes that write to the database load (see lazy_import.py),
+nor the modules of the other modes (DEFERRED_MODULES).
+
+Every run is a new interpreter, with bytecode caches written by a warm-up
+run first, as on an installed system. Exits with status 1 if the budget
+is exceeded or one of those modules was imported.
+
+Usage:
+    python -m benchmarks.bench_startup [--runs 20]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.transcripts import generate_transcript
+
+BUDGET_MS = 100
+# Modules that must stay unloaded in --parse-only runs
+DB_MODULES = ('mysql.connector.', 'dotenv')
+# Modules imported where the search index, database and profiling modes begin
+DEFERRED_MODULES = ('sqlite3', 'search_index', 'similarity_index', 'schema', 'session_stats',
+                    'bundle_archive', 'tracemalloc', 'cProfile')
+
+SCRIPT = Path(__file__).resolve().parent.parent / 'process_logs.py'
+
+
+def best_ms(command: list, runs: int, env: dict) -> float:
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                       check=True)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def imported_modules(command: list, env: dict) -> list:
+    """Names of the modules a command imports, from -X importtime."""
+    result = subprocess.run([command[0], '-X', 'importtime'] + command[1:], env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+    return [line.rsplit('|', 1)[1].strip() for line in result.stderr.splitlines()
+            if line.startswith('import time:') and line.count('|') == 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    with tempfile.TemporaryDirectory() as tmp:
+        transcript = Path(tmp) / 'chat_000000.md'
+        transcript.write_text(generate_transcript(0, 20, 1000), encoding='utf-8')
+        parse_only = [sys.executable, str(SCRIPT), str(transcript), '--parse-only']
+        subprocess.run(parse_only, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                       check=True)
+
+        floor = best_ms([sys.executable, '-c', 'pass'], args.runs, env)
+        timings = [
+            ('import process_logs', best_ms([sys.executable, '-c', 'import process_logs'], args.runs,
+                                            dict(env, PYTHONPATH=str(SCRIPT.parent)))),
+            ('process_logs.py --help', best_ms([sys.executable, str(SCRIPT), '--help'], args.runs, env)),
+            ('process_logs.py FILE --parse-only', best_ms(parse_only, args.runs, env)),
+        ]
+        modules = imported_modules(parse_only, env)
+        loaded = [name for name in modules
+                  if name.startswith(DB_MODULES) or name in ('mysql.connector', 'dotenv')]
+        deferred = [name for name in modules if name in DEFERRED_MODULES]
+
+    print(f"Best of {args.runs} runs; bare interpreter (python -c pass): {floor:.0f} ms")
+    for name, ms in timings:
+        print(f"{name:<36} {ms:6.0f} ms  (+{ms - floor:.0f} ms)")
+    over = timings[-1][1] - floor
+    print(f"Budget: --parse-only within {BUDGET_MS} ms of the bare interpreter: "
+          f"{'ok' if over <= BUDGET_MS else 'EXCEEDED'} (+{over:.0f} ms)")
+    print(f"Database modules imported by --parse-only: {', '.join(loaded) if loaded else 'none'}")
+    print(f"Deferred modules imported by --parse-only: {', '.join(deferred) if deferred else 'none'}")
+    if over > BUDGET_MS or loaded or deferred:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+In-process stand-in for a mysql.connector pool.
+
+Every statement and commit sleeps for a fixed round-trip time (none by
+default), so benchmarks can measure the processor's own cost, or how it
+copes with network latency, without a server.
+"""
+import time
+
+
+class FakeCursor:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    def execute(self, statement, params=None):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def fetchall(self):
+        # No rows stored: every message counts as new
+        return []
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    def cursor(self):
+        return FakeCursor(self.latency)
+
+    def commit(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def rollback(self):
+        pass
+
+    def ping(self, **kwargs):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakePool:
+    """Stands in for pooling.MySQLConnectionPool."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    def get_connection(self):
+        return FakeConnection(self.latency)
@@ -0,0 +1,135 @@
+"""Synthetic transcripts for the benchmarks."""
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Corpus tiers for bench_ingest: name -> (files, messages per file, average message bytes).
+# Together they cover transcripts from ~1 KB / 1 message up to ~20 MB / 10k messages.
+TIERS: Dict[str, tuple] = {
+    'tiny': (200, 1, 150),
+    'small': (50, 20, 1000),
+    'medium': (10, 200, 2000),
+    'large': (2, 2000, 2000),
+    'huge': (1, 10000, 1800),
+}
+
+_PROVIDERS = [('openai', 'gpt-4o'), ('anthropic', 'claude-3-5-sonnet'),
+              ('gemini', 'gemini-1.5-pro'), ('ollama', 'llama3.1:8b')]
+_PERSONAS = ['scientist', 'philosopher', 'skeptic', 'poet', 'engineer', 'historian']
+_WORDS = ("the of and to in is that it for as with was on be by this are or from at an "
+          "not but which have has can will would could should intelligence consciousness "
+          "emergence system model language memory reasoning evidence argument perspective "
+          "question experience structure pattern meaning context information complexity "
+          "**important** *subtle* `state` learning agents network theory data process").split()
+_CODE_BLOCKS = [
+    "```python\ndef step(state, action):\n    # advance the simulation by one tick\n"
+    "    return {**state, 'tick': state['tick'] + 1, 'last': action}\n```",
+    "```sql\nSELECT speaker, COUNT(*) AS turns\nFROM messages\nGROUP BY speaker;\n```",
+    "```\n$ python process_logs.py --workers 4\nProcessed 120/120 files successfully\n```",
+]
+
+
+def _paragraph(rng: random.Random, words: int) -> str:
+    text = ' '.join(rng.choices(_WORDS, k=words))
+    return text[0].upper() + text[1:] + '.'
+
+
+def _message_body(rng: random.Random, target_bytes: int) -> str:
+    """Paragraphs (with the odd list or code block) of roughly target_bytes."""
+    parts = []
+    size = 0
+    while size < target_bytes:
+        roll = rng.random()
+        if roll < 0.08:
+            part = rng.choice(_CODE_BLOCKS)
+        elif roll < 0.15:
+            part = '\n'.join(f"- {_paragraph(rng, rng.randint(4, 12))}" for _ in range(rng.randint(2, 5)))
+        else:
+            part = _paragraph(rng, rng.randint(15, 80))
+        parts.append(part)
+        size += len(part) + 2
+    return '\n\n'.join(parts)
+
+
+def generate_transcript(index: int, messages: int, message_bytes: int = 1000,
+                        seed: Optional[int] = None) -> str:
+    """
+    Build a realistic Chat Bridge transcript.
+
+    Has the session header, agent configuration and session settings blocks
+    and `messages` messages alternating between the agents (the first one
+    from the Human), about a third of them with a provider <sub> tag. Message
+    sizes vary around message_bytes. The same arguments always give the
+    same text.
+    """
+    rng = random.Random(index if seed is None else seed)
+    started = datetime(2025, 1, 1) + timedelta(minutes=index)
+    agents = rng.sample(_PROVIDERS, 2)
+    out: List[str] = [
+        "# Chat Bridge Session\n",
+        f"**Session ID:** conv_{started:%Y%m%d}_{index:06d}",
+        f"**Started:** {started:%Y-%m-%d %H:%M:%S}",
+        f"**Conversation Starter:** {_paragraph(rng, rng.randint(8, 30))}\n",
+        "## Agent Configuration\n",
+    ]
+    for label, (provider, model) in zip('AB', agents):
+        out += [
+            f"**Agent {label} Provider:** {provider}",
+            f"**Agent {label} Model:** {model}",
+            f"**Agent {label} Temperature:** {rng.choice(['0.6', '0.7', '1.0'])}",
+            f"**Agent {label} Persona:** {rng.choice(_PERSONAS)}",
+            f"**Agent {label} System Prompt:** {_paragraph(rng, 25)}\n{_paragraph(rng, 15)}\n",
+        ]
+    out += [
+        "## Session Settings\n",
+        f"**Max Rounds:** {max(messages // 2, 1)}",
+        "**Memory Rounds:** 8",
+        "**Stop Word Detection:** Enabled",
+        "**Stop Words:** goodbye, farewell, end conversation\n",
+        "## Conversation\n",
+    ]
+    clock = started
+    for order in range(messages):
+        speaker = 'Human' if order == 0 else ('Agent A', 'Agent B')[(order - 1) % 2]
+        clock += timedelta(seconds=rng.randint(3, 90))
+        out.append(f"### {speaker} ({clock:%Y-%m-%d %H:%M:%S})")
+        if speaker != 'Human' and rng.random() < 0.35:
+            provider, model = agents[0 if speaker == 'Agent A' else 1]
+            out.append(f"<sub>{provider} · {model}</sub>")
+        out.append("")
+        out.append(_message_body(rng, int(message_bytes * rng.uniform(0.3, 1.7))) + "\n")
+    return '\n'.join(out) + '\n'
+
+
+def write_corpus(directory: Path, files: int, messages: int, message_bytes: int,
+                 first_index: int = 0) -> int:
+    """Write `files` realistic transcripts to directory; returns their total size in bytes."""
+    total = 0
+    for index in range(first_index, first_index + files):
+        text = generate_transcript(index, messages, message_bytes).encode('utf-8')
+        (directory / f"chat_{index:06d}.md").write_bytes(text)
+        total += len(text)
+    return total
+
+
+def write_transcripts(directory: Path, count: int, messages: int):
+    """Write `count` small transcripts with distinct session IDs and start times."""
+    for index in range(count):
+        started = datetime(2025, 1, 1) + timedelta(minutes=index)
+        lines = [
+            "# Chat Bridge Transcript\n",
+            f"**Session ID:** conv_20250101_{index:06d}",
+            f"**Started:** {started:%Y-%m-%d %H:%M:%S}",
+            f"**Conversation Starter:** Benchmark topic {index}\n",
+            "**Agent A Provider:** openai",
+            "**Agent A Model:** gpt-4o",
+            "**Agent B Provider:** anthropic",
+            "**Agent B Model:** claude\n",
+            "## Conversation\n",
+        ]
+        for order in range(messages):
+            speaker = ('Human', 'Agent A', 'Agent B')[min(order, 1 + order % 2)]
+            lines.append(f"### {speaker} (2025-01-01 12:{order % 60:02d}:00)\n")
+            lines.append(f"Message {order} of session {index}. " * 20 + "\n")
+        (directory / f"chat_{index:06d}.md").write_text("\n".join(lines), encoding='utf-8')
@@ -0,0 +1,303 @@
+"""
+Rolling, seekable archive of processed transcripts.
+
+archive_log zips each transcript on its own, which compresses the highly
+repetitive Chat Bridge markdown poorly and leaves one small file per
+transcript. A BundleArchive instead appends transcripts to one bundle per
+month in the archive folder:
+
+    2025-10.bundle        compressed frames, one per archived transcript
+    2025-10.dict          the bundle's shared compression dictionary
+    2025-10.index.jsonl   one line per frame: name, offset, length, size,
+                          codec, sha256, session_id, archived_at
+
+Every frame is compressed on its own but against the shared dictionary (the
+first 32 KB of the bundle's first transcript: header, agent configuration,
+personas and system prompts, which later transcripts largely repeat), so a
+single transcript is extracted by seeking to its offset and decompressing
+just its frame. zstd is used when the zstandard package is installed, zlib
+otherwise; the codec is recorded per frame.
+
+Compression and writing run in a background thread: submit() only reads
+the file and queues it. A transcript archived again (e.g. after it grew)
+gets a new frame; the index resolves a name to its latest frame.
+
+    archive = BundleArchive('archive')
+    archive.submit('2025-10-06_09-57-49__if-every-observation.md')
+    archive.close()                      # waits for the queue to drain
+    archive.extract('2025-10-06_09-57-49__if-every-observation.md', '/tmp')
+
+Usage:
+    python bundle_archive.py list [--archive archive]
+    python bundle_archive.py extract NAME [--archive archive] [--output DIR]
+    python bundle_archive.py add FILE... [--archive archive]
+"""
+import argparse
+import hashlib
+import json
+import os
+import queue
+import sys
+import threading
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import zstandard
+except ImportError:  # optional; bundles fall back to zlib
+    zstandard = None
+
+DICTIONARY_BYTES = 32 * 1024
+_ZSTD_LEVEL = 19
+_ZLIB_LEVEL = 9
+
+
+def _compress(codec: str, dictionary: bytes, data: bytes) -> bytes:
+    if codec == 'zstd':
+        dict_data = zstandard.ZstdCompressionDict(dictionary, dict_type=zstandard.DICT_TYPE_RAWCONTENT)
+        return zstandard.ZstdCompressor(level=_ZSTD_LEVEL, dict_data=dict_data).compress(data)
+    compressor = zlib.compressobj(_ZLIB_LEVEL, zdict=dictionary)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _decompress(codec: str, dictionary: bytes, frame: bytes) -> bytes:
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("this frame is zstd compressed; install zstandard to read it")
+        dict_data = zstandard.ZstdCompressionDict(dictionary, dict_type=zstandard.DICT_TYPE_RAWCONTENT)
+        return zstandard.ZstdDecompressor(dict_data=dict_data).decompress(frame)
+    decompressor = zlib.decompressobj(zdict=dictionary)
+    return decompressor.decompress(frame) + decompressor.flush()
+
+
+class BundleArchive:
+    def __init__(self, directory: str = 'archive', codec: Optional[str] = None):
+        """
+        Open the bundle archive in directory (created on first write).
+
+        codec: 'zstd' or 'zlib' (default: zstd if zstandard is installed)
+        """
+        if codec is None:
+            codec = 'zstd' if zstandard is not None else 'zlib'
+        if codec not in ('zstd', 'zlib'):
+            raise ValueError(f"Unknown codec: {codec}")
+        if codec == 'zstd' and zstandard is None:
+            raise RuntimeError("codec 'zstd' needs the zstandard package")
+        self.directory = Path(directory)
+        self.codec = codec
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, Dict]] = None
+        self._dictionaries: Dict[str, bytes] = {}
+        # Bundle -> end of its last indexed frame, where the next frame goes
+        self._ends: Dict[str, int] = {}
+        self._queue: 'queue.Queue' = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self.errors = 0
+
+    # Writing
+
+    def submit(self, filepath: str, session_id: Optional[str] = None) -> bool:
+        """
+        Queue a transcript for archiving; it is compressed and appended in
+        the background. Returns False if the file cannot be read.
+        """
+        filepath = Path(filepath)
+        try:
+            data = filepath.read_bytes()
+        except OSError as e:
+            print(f"Error archiving file {filepath}: {e}")
+            return False
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name='bundle-archive', daemon=True)
+            self._worker.start()
+        self._queue.put((filepath.name, data, session_id, datetime.now()))
+        return True
+
+    def flush(self):
+        """Wait until every submitted transcript is written."""
+        self._queue.join()
+
+    def close(self):
+        """Write everything still queued and stop the background thread."""
+        if self._worker is not None and self._worker.is_alive():
+            self._queue.put(None)
+            self._worker.join()
+        self._worker = None
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                try:
+                    self.add(*item)
+                except (OSError, RuntimeError, zlib.error) as e:
+                    self.errors += 1
+                    print(f"Error archiving file {item[0]}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def add(self, name: str, data: bytes, session_id: Optional[str] = None,
+            archived_at: Optional[datetime] = None) -> Dict:
+        """Compress a transcript and append it to the current month's bundle (synchronously)."""
+        archived_at = archived_at or datetime.now()
+        bundle = archived_at.strftime('%Y-%m')
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            dictionary = self._dictionary(bundle, data)
+        frame = _compress(self.codec, dictionary, data)
+
+        with self._lock:
+            bundle_path = self._path(bundle, '.bundle')
+            index_path = self._path(bundle, '.index.jsonl')
+            if bundle not in self._ends:
+                self._ends[bundle] = self._recover(bundle, bundle_path)
+            offset = self._ends[bundle]
+            with open(bundle_path, 'ab') as f:
+                f.write(frame)
+                f.flush()
+                os.fsync(f.fileno())
+            entry = {
+                'name': name,
+                'bundle': bundle,
+                'offset': offset,
+                'length': len(frame),
+                'size': len(data),
+                'codec': self.codec,
+                'sha256': hashlib.sha256(data).hexdigest(),
+                'session_id': session_id,
+                'archived_at': archived_at.isoformat(timespec='seconds'),
+            }
+            # The index line is written last, so a frame only counts once it is complete
+            with open(index_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self._ends[bundle] = offset + len(frame)
+            if self._entries is not None:
+                self._entries[name] = entry
+        return entry
+
+    def _dictionary(self, bundle: str, data: bytes) -> bytes:
+        """The bundle's dictionary, created from this transcript if the bundle is new."""
+        dictionary = self._load_dictionary(bundle)
+        if dictionary is None:
+            dictionary = data[:DICTIONARY_BYTES]
+            path = self._path(bundle, '.dict')
+            tmp_path = path.with_name(path.name + '.tmp')
+            tmp_path.write_bytes(dictionary)
+            os.replace(tmp_path, path)
+            self._dictionaries[bundle] = dictionary
+        return dictionary
+
+    def _recover(self, bundle: str, bundle_path: Path) -> int:
+        """
+        End of the last indexed frame. What an interrupted append left
+        behind (bytes past it, a partial index line) is cut off.
+        """
+        index_path = self._path(bundle, '.index.jsonl')
+        if index_path.exists():
+            with open(index_path, 'r+b') as f:
+                text = f.read()
+                if text and not text.endswith(b'\n'):
+                    f.truncate(text.rfind(b'\n') + 1)
+        end = 0
+        for entry in self._read_index(bundle):
+            end = max(end, entry['offset'] + entry['length'])
+        if bundle_path.exists() and bundle_path.stat().st_size != end:
+            with open(bundle_path, 'r+b') as f:
+                f.truncate(end)
+        return end
+
+    # Reading
+
+    def _path(self, bundle: str, suffix: str) -> Path:
+        return self.directory / f"{bundle}{suffix}"
+
+    def _load_dictionary(self, bundle: str) -> Optional[bytes]:
+        if bundle not in self._dictionaries:
+            path = self._path(bundle, '.dict')
+            if not path.exists():
+                return None
+            self._dictionaries[bundle] = path.read_bytes()
+        return self._dictionaries[bundle]
+
+    def _read_index(self, bundle: str) -> List[Dict]:
+        path = self._path(bundle, '.index.jsonl')
+        if not path.exists():
+            return []
+        entries = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A line cut short by a crash; its frame is discarded on the next append
+                    break
+        return entries
+
+    def bundles(self) -> List[str]:
+        """Months with a bundle, oldest first."""
+        return sorted(path.name[:-len('.index.jsonl')] for path in self.directory.glob('*.index.jsonl'))
+
+    def entries(self) -> Dict[str, Dict]:
+        """Name -> index entry of its latest frame, across all bundles."""
+        with self._lock:
+            if self._entries is None:
+                entries = {}
+                for bundle in self.bundles():
+                    for entry in self._read_index(bundle):
+                        entries[entry['name']] = entry
+                self._entries = entries
+            return dict(self._entries)
+
+    def read(self, name: str) -> bytes:
+        """The archived bytes of a transcript, decompressing only its own frame."""
+        entry = self.entries().get(name)
+        if entry is None:
+            raise KeyError(f"{name} is not in the archive")
+        with open(self._path(entry['bundle'], '.bundle'), 'rb') as f:
+            f.seek(entry['offset'])
+            frame = f.read(entry['length'])
+        data = _decompress(entry['codec'], self._load_dictionary(entry['bundle']), frame)
+        if hashlib.sha256(data).hexdigest() != entry['sha256']:
+            raise RuntimeError(f"{name} is corrupt in bundle {entry['bundle']}")
+        return data
+
+    def extract(self, name: str, directory: str = '.') -> Path:
+        """Write a transcript back out as directory/name (readable by parse_markdown_file)."""
+        path = Path(directory) / Path(name).name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(self.read(name))
+        return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect, extend or extract a transcript bundle archive.')
+    parser.add_argument('command', choices=('list', 'extract', 'add'))
+    parser.add_argument('names', nargs='*', help='Transcript names (extract) or files (add)')
+    parser.add_argument('--archive', default='archive', help='Archive folder (default: archive)')
+    parser.add_argument('--output', default='.', help='Folder to extract to (default: .)')
+    args = parser.parse_args()
+
+    archive = BundleArchive(args.archive)
+    if args.command == 'list':
+        for name, entry in sorted(archive.entries().items()):
+            print(f"{entry['bundle']}  {entry['size']:>10,} -> {entry['length']:>9,}  {name}")
+    elif args.command == 'add':
+        for name in args.names:
+            archive.submit(name)
+        archive.close()
+        sys.exit(1 if archive.errors else 0)
+    else:
+        for name in args.names:
+            try:
+                print(archive.extract(name, args.output))
+            except (KeyError, RuntimeError) as e:
+                print(f"Error: {e}")
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
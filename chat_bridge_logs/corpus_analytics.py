@@ -0,0 +1,476 @@
+"""
+Corpus-wide analytics over parsed transcripts, with NumPy.
+
+Comparing providers and personas across all sessions used to mean per-row
+SQL or Python loops over parse_markdown_file dicts. A Corpus parses the
+transcripts of a folder once into columnar arrays:
+
+    sessions   session_id, file, started_at, max_rounds, memory_rounds,
+               stop_word_detection, stopped_by_stop_word, and per agent
+               (A, B) provider, model, persona (codes into a shared
+               vocabulary) and temperature
+    messages   session (row in sessions), speaker (0 Human, 1 Agent A,
+               2 Agent B), characters, words, timestamp
+
+and answers the usual questions with vectorized grouping (bincount over
+sorted keys) instead of loops:
+
+    reply_lengths(by)          agent reply length per model, provider or persona
+    temperature_verbosity()    reply length per temperature, and their correlation
+    rounds_vs_max()            rounds reached against max_rounds
+    stop_word_endings(by)      how often stop-word detection ended a session
+
+The arrays are cached in the folder as .analytics_cache.npz (no pickles),
+keyed by the name, size and mtime of every transcript, so later runs load
+them in milliseconds instead of parsing again.
+
+A round is one reply from each agent, so a session's rounds reached is its
+agent reply count divided by two, rounded up. A session counts as ended by
+a stop word when detection was enabled and its last message contains one of
+its stop words.
+
+    corpus = Corpus.load('.')
+    for row in corpus.reply_lengths(by='model'):
+        print(row['key'], row['replies'], row['mean_characters'])
+
+Usage:
+    python corpus_analytics.py [directory] [--by model|provider|persona] [--workers N]
+                               [--no-cache] [--json]
+"""
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from message_batch import SPEAKERS, MessageBatch
+from process_logs import _SKIPPED_FILENAMES, ChatBridgeProcessor, _parse_in_worker
+
+ANALYTICS_CACHE_FILENAME = '.analytics_cache.npz'
+# Bump when the cached arrays change shape or meaning
+_CACHE_VERSION = 1
+GROUP_BY = ('model', 'provider', 'persona')
+
+_HUMAN = SPEAKERS.index('Human')
+_MISSING = 0
+_RATIO_BINS = 10
+
+
+def corpus_fingerprint(files: Sequence[Path]) -> str:
+    """Hash of the name, size and mtime of every file (the cache key)."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"v{_CACHE_VERSION}\n".encode())
+    for filepath in sorted(files):
+        stat = filepath.stat()
+        digest.update(f"{filepath.name}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _datetimes(values: List[Optional[str]]) -> np.ndarray:
+    """'YYYY-MM-DD HH:MM:SS' strings as datetime64[s] (NaT where missing or invalid)."""
+    try:
+        return np.array([value or 'NaT' for value in values], dtype='datetime64[s]')
+    except ValueError:
+        result = np.full(len(values), np.datetime64('NaT'), dtype='datetime64[s]')
+        for index, value in enumerate(values):
+            try:
+                result[index] = np.datetime64(value, 's')
+            except (TypeError, ValueError):
+                pass
+        return result
+
+
+def _stop_word_hit(stop_words: Optional[str], last_message: str) -> bool:
+    words = [word.strip().lower() for word in (stop_words or '').split(',')]
+    text = last_message.lower()
+    return any(word and word in text for word in words)
+
+
+def _grouped(keys: np.ndarray, values: np.ndarray, groups: int) -> Dict[str, np.ndarray]:
+    """
+    count, mean, p50, p90 and max of non-negative integer values per key
+    (0 <= key < groups).
+
+    Percentiles are nearest-rank, read off the values sorted within each key:
+    key and value are packed into one int64 so a single np.sort orders both.
+    """
+    counts = np.bincount(keys, minlength=groups)
+    stats = {'count': counts}
+    if not len(values):
+        for name in ('mean', 'p50', 'p90', 'max'):
+            stats[name] = np.zeros(groups)
+        return stats
+    packed = np.sort((keys.astype(np.int64) << 32) | values.astype(np.int64))
+    ordered = packed & 0xFFFFFFFF
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    present = counts > 0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        stats['mean'] = np.where(present, np.bincount(keys, weights=values, minlength=groups) / counts, 0)
+    for name, fraction in (('p50', 0.5), ('p90', 0.9)):
+        rank = np.maximum(np.ceil(fraction * counts).astype(np.int64), 1)
+        stats[name] = np.where(present, ordered[np.minimum(starts + rank - 1, len(ordered) - 1)], 0)
+    stats['max'] = np.where(present, ordered[np.minimum(starts + counts - 1, len(ordered) - 1)], 0)
+    return stats
+
+
+class Corpus:
+    """Columnar arrays of a parsed transcript folder (see the module docstring)."""
+
+    def __init__(self, sessions: Dict[str, np.ndarray], messages: Dict[str, np.ndarray],
+                 vocabulary: np.ndarray, fingerprint: str = ''):
+        self.sessions = sessions
+        self.messages = messages
+        # Strings of the provider/model/persona codes; code 0 is "missing"
+        self.vocabulary = vocabulary
+        self.fingerprint = fingerprint
+
+    # Building and caching
+
+    @classmethod
+    def load(cls, directory: str, pattern: str = '*.md', cache: bool = True,
+             workers: int = 1) -> 'Corpus':
+        """
+        The corpus of a folder, from its cache if no transcript changed since
+        it was written; otherwise parsed (and the cache rewritten).
+        """
+        files = sorted(filepath for filepath in Path(directory).glob(pattern)
+                       if filepath.name not in _SKIPPED_FILENAMES)
+        fingerprint = corpus_fingerprint(files)
+        cache_path = Path(directory) / ANALYTICS_CACHE_FILENAME
+        if cache:
+            corpus = cls.read(cache_path)
+            if corpus is not None and corpus.fingerprint == fingerprint:
+                return corpus
+        corpus = cls.from_transcripts(files, workers=workers)
+        corpus.fingerprint = fingerprint
+        if cache:
+            try:
+                corpus.save(cache_path)
+            except OSError as e:
+                print(f"Warning: could not write analytics cache: {e}")
+        return corpus
+
+    @classmethod
+    def from_transcripts(cls, files: Sequence[Path], workers: int = 1) -> 'Corpus':
+        """
+        Parse transcripts into a corpus. Of several files of the same session
+        the one with the most messages is kept.
+        """
+        if workers > 1 and len(files) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                parsed = list(executor.map(_parse_in_worker, map(str, files), chunksize=16))
+        else:
+            processor = ChatBridgeProcessor({}, mmap_threshold=None, full_text_search=False)
+            parsed = [processor.parse_markdown_file(str(filepath)) for filepath in files]
+        return cls.from_parsed(zip(files, parsed))
+
+    @classmethod
+    def from_parsed(cls, items) -> 'Corpus':
+        """Build a corpus from (filepath, parse_markdown_file result) pairs."""
+        kept: Dict[str, tuple] = {}
+        for filepath, data in items:
+            session_id = data['session']['session_id'] if data else None
+            if session_id is None:
+                continue
+            if session_id not in kept or len(data['messages']) > len(kept[session_id][1]['messages']):
+                kept[session_id] = (Path(filepath), data)
+
+        vocabulary = {'': _MISSING}
+
+        def code(value: Optional[str]) -> int:
+            return vocabulary.setdefault(value or '', len(vocabulary))
+
+        session_columns = {name: [] for name in (
+            'session_id', 'file', 'started_at', 'max_rounds', 'memory_rounds',
+            'stop_word_detection', 'stopped_by_stop_word', 'agent_provider', 'agent_model',
+            'agent_persona', 'agent_temperature')}
+        session_index, speakers, characters, words, timestamps = [], [], [], [], []
+        for index, (session_id, (filepath, data)) in enumerate(sorted(kept.items())):
+            session = data['session']
+            batch = MessageBatch.coerce(data['messages'])
+            agents = {agent['label']: agent for agent in data['agents']}
+            a, b = agents.get('A', {}), agents.get('B', {})
+            contents = list(batch.contents())
+
+            session_columns['session_id'].append(session_id)
+            session_columns['file'].append(filepath.name)
+            session_columns['started_at'].append(session['started_at'])
+            session_columns['max_rounds'].append(-1 if session['max_rounds'] is None else session['max_rounds'])
+            session_columns['memory_rounds'].append(
+                -1 if session['memory_rounds'] is None else session['memory_rounds'])
+            session_columns['stop_word_detection'].append(bool(session['stop_word_detection']))
+            session_columns['stopped_by_stop_word'].append(
+                bool(session['stop_word_detection']) and bool(contents)
+                and _stop_word_hit(session['stop_words'], contents[-1]))
+            session_columns['agent_provider'].append((code(a.get('provider')), code(b.get('provider'))))
+            session_columns['agent_model'].append((code(a.get('model')), code(b.get('model'))))
+            session_columns['agent_persona'].append((code(a.get('persona')), code(b.get('persona'))))
+            session_columns['agent_temperature'].append(
+                tuple(np.nan if agent.get('temperature') is None else agent['temperature'] for agent in (a, b)))
+
+            session_index.append(np.full(len(batch), index, dtype=np.int32))
+            speakers.append(np.frombuffer(batch.speaker_codes, dtype=np.uint8))
+            characters.append(np.fromiter(map(len, contents), dtype=np.int32, count=len(contents)))
+            words.append(np.fromiter((len(content.split()) for content in contents),
+                                     dtype=np.int32, count=len(contents)))
+            timestamps.extend(batch.timestamps)
+
+        def joined(parts: List[np.ndarray], dtype) -> np.ndarray:
+            return np.concatenate(parts).astype(dtype, copy=False) if parts else np.zeros(0, dtype=dtype)
+
+        sessions = {
+            'session_id': np.array(session_columns['session_id'], dtype=str),
+            'file': np.array(session_columns['file'], dtype=str),
+            'started_at': _datetimes(session_columns['started_at']),
+            'max_rounds': np.array(session_columns['max_rounds'], dtype=np.int32),
+            'memory_rounds': np.array(session_columns['memory_rounds'], dtype=np.int32),
+            'stop_word_detection': np.array(session_columns['stop_word_detection'], dtype=bool),
+            'stopped_by_stop_word': np.array(session_columns['stopped_by_stop_word'], dtype=bool),
+        }
+        for name in ('agent_provider', 'agent_model', 'agent_persona'):
+            sessions[name] = np.array(session_columns[name], dtype=np.int32).reshape(-1, 2)
+        sessions['agent_temperature'] = np.array(session_columns['agent_temperature'],
+                                                 dtype=np.float32).reshape(-1, 2)
+        messages = {
+            'session': joined(session_index, np.int32),
+            'speaker': joined(speakers, np.uint8),
+            'characters': joined(characters, np.int32),
+            'words': joined(words, np.int32),
+            'timestamp': _datetimes(timestamps),
+        }
+        strings = np.array(sorted(vocabulary, key=vocabulary.get), dtype=str)
+        return cls(sessions, messages, strings)
+
+    def save(self, path: str):
+        """Write the arrays to an .npz file (through a .tmp sibling and a rename)."""
+        arrays = {f"session_{name}": array for name, array in self.sessions.items()}
+        arrays.update({f"message_{name}": array for name, array in self.messages.items()})
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, vocabulary=self.vocabulary, fingerprint=np.array(self.fingerprint),
+                     version=np.array(_CACHE_VERSION), **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def read(cls, path: str) -> Optional['Corpus']:
+        """The corpus saved at path, or None if it is missing, unreadable or outdated."""
+        try:
+            with np.load(path, allow_pickle=False) as cached:
+                if int(cached['version']) != _CACHE_VERSION:
+                    return None
+                sessions = {name[len('session_'):]: cached[name] for name in cached.files
+                            if name.startswith('session_')}
+                messages = {name[len('message_'):]: cached[name] for name in cached.files
+                            if name.startswith('message_')}
+                return cls(sessions, messages, cached['vocabulary'], str(cached['fingerprint']))
+        except (OSError, KeyError, ValueError):
+            return None
+
+    # Derived columns
+
+    def __len__(self) -> int:
+        return len(self.sessions['session_id'])
+
+    def _agent_replies(self) -> np.ndarray:
+        """Indexes of the messages written by Agent A or Agent B."""
+        return np.flatnonzero(self.messages['speaker'] != _HUMAN)
+
+    def _agent_column(self, name: str, replies: np.ndarray) -> np.ndarray:
+        """agent_<name> of the agent that wrote each of the given messages."""
+        return self.sessions[f'agent_{name}'][self.messages['session'][replies],
+                                              self.messages['speaker'][replies].astype(np.intp) - 1]
+
+    def rounds_reached(self) -> np.ndarray:
+        """Rounds per session: agent replies divided by two, rounded up."""
+        replies = np.bincount(self.messages['session'][self._agent_replies()], minlength=len(self))
+        return (replies + 1) // 2
+
+    def _label(self, code: int) -> str:
+        return str(self.vocabulary[code]) or '(none)'
+
+    # Aggregations
+
+    def reply_lengths(self, by: str = 'model') -> List[Dict]:
+        """Agent reply length (characters and words) per model, provider or persona, most replies first."""
+        if by not in GROUP_BY:
+            raise ValueError(f"Cannot group by {by}")
+        replies = self._agent_replies()
+        keys = self._agent_column(by, replies)
+        characters = _grouped(keys, self.messages['characters'][replies], len(self.vocabulary))
+        words = np.bincount(keys, weights=self.messages['words'][replies], minlength=len(self.vocabulary))
+        rows = []
+        for code in np.flatnonzero(characters['count']):
+            rows.append({
+                'key': self._label(code),
+                'replies': int(characters['count'][code]),
+                'mean_characters': float(characters['mean'][code]),
+                'p50_characters': int(characters['p50'][code]),
+                'p90_characters': int(characters['p90'][code]),
+                'max_characters': int(characters['max'][code]),
+                'mean_words': float(words[code] / characters['count'][code]),
+            })
+        rows.sort(key=lambda row: (-row['replies'], row['key']))
+        return rows
+
+    def temperature_verbosity(self) -> Dict:
+        """
+        Agent reply length per temperature setting, plus the correlation of
+        temperature and length and the fitted characters per 1.0 of temperature.
+        """
+        replies = self._agent_replies()
+        temperatures = self._agent_column('temperature', replies)
+        known = np.isfinite(temperatures)
+        temperatures = temperatures[known]
+        characters = self.messages['characters'][replies][known]
+        values, keys = np.unique(temperatures, return_inverse=True)
+        stats = _grouped(keys.ravel(), characters, len(values))
+        correlation = slope = None
+        if len(values) > 1:
+            x = temperatures.astype(np.float64)
+            y = characters.astype(np.float64)
+            x -= x.mean()
+            y -= y.mean()
+            # Pearson r and the least-squares slope from the centered sums
+            correlation = float((x @ y) / np.sqrt((x @ x) * (y @ y)))
+            slope = float((x @ y) / (x @ x))
+        return {
+            'replies': int(len(characters)),
+            'correlation': correlation,
+            'characters_per_degree': slope,
+            'by_temperature': [{
+                'temperature': round(float(value), 3),
+                'replies': int(stats['count'][index]),
+                'mean_characters': float(stats['mean'][index]),
+                'p50_characters': int(stats['p50'][index]),
+                'p90_characters': int(stats['p90'][index]),
+            } for index, value in enumerate(values)],
+        }
+
+    def rounds_vs_max(self) -> Dict:
+        """
+        Rounds reached against max_rounds for the sessions that have one:
+        how many reached it, the mean and median fraction reached, a
+        histogram of that fraction in tenths, and why the others ended early.
+        """
+        limited = np.flatnonzero(self.sessions['max_rounds'] > 0)
+        rounds = self.rounds_reached()[limited]
+        limits = self.sessions['max_rounds'][limited]
+        ratio = np.minimum(rounds / limits, 1.0) if len(limited) else np.zeros(0)
+        reached = rounds >= limits
+        stopped = self.sessions['stopped_by_stop_word'][limited] & ~reached
+        histogram, _ = np.histogram(ratio, bins=_RATIO_BINS, range=(0.0, 1.0))
+        return {
+            'sessions': int(len(limited)),
+            'reached_max': int(reached.sum()),
+            'ended_by_stop_word': int(stopped.sum()),
+            'ended_otherwise': int((~reached & ~stopped).sum()),
+            'mean_fraction': float(ratio.mean()) if len(ratio) else None,
+            'median_fraction': float(np.median(ratio)) if len(ratio) else None,
+            'fraction_histogram': histogram.tolist(),
+        }
+
+    def stop_word_endings(self, by: str = 'model') -> Dict:
+        """
+        How often stop-word detection ended a session, overall and per
+        model, provider or persona of the agent that spoke last.
+        """
+        if by not in GROUP_BY:
+            raise ValueError(f"Cannot group by {by}")
+        enabled = self.sessions['stop_word_detection']
+        stopped = self.sessions['stopped_by_stop_word']
+        # Last message of every session that has messages
+        message_sessions = self.messages['session']
+        last = np.flatnonzero(np.append(message_sessions[1:] != message_sessions[:-1], True)) \
+            if len(message_sessions) else np.zeros(0, dtype=np.intp)
+        last = last[(self.messages['speaker'][last] != _HUMAN) & enabled[message_sessions[last]]]
+        keys = self._agent_column(by, last)
+        sessions = np.bincount(keys, minlength=len(self.vocabulary))
+        ended = np.bincount(keys, weights=stopped[message_sessions[last]], minlength=len(self.vocabulary))
+        rows = [{
+            'key': self._label(code),
+            'sessions': int(sessions[code]),
+            'ended_by_stop_word': int(ended[code]),
+            'rate': float(ended[code] / sessions[code]),
+        } for code in np.flatnonzero(sessions)]
+        rows.sort(key=lambda row: (-row['sessions'], row['key']))
+        total = int(enabled.sum())
+        return {
+            'sessions_with_detection': total,
+            'ended_by_stop_word': int(stopped.sum()),
+            'rate': float(stopped.sum() / total) if total else None,
+            f'by_{by}': rows,
+        }
+
+    def report(self, by: str = 'model') -> Dict:
+        """Every aggregation, as a JSON-serializable dict."""
+        return {
+            'sessions': len(self),
+            'messages': int(len(self.messages['speaker'])),
+            f'reply_lengths_by_{by}': self.reply_lengths(by),
+            'temperature_verbosity': self.temperature_verbosity(),
+            'rounds_vs_max': self.rounds_vs_max(),
+            'stop_word_endings': self.stop_word_endings(by),
+        }
+
+
+def _print_report(report: Dict, by: str):
+    print(f"{report['sessions']} sessions, {report['messages']} messages\n")
+    print(f"Agent reply length by {by}:")
+    print(f"  {by:<32} {'replies':>8} {'mean':>8} {'p50':>7} {'p90':>7} {'words':>7}")
+    for row in report[f'reply_lengths_by_{by}']:
+        print(f"  {row['key'][:32]:<32} {row['replies']:>8} {row['mean_characters']:>8.0f} "
+              f"{row['p50_characters']:>7} {row['p90_characters']:>7} {row['mean_words']:>7.0f}")
+
+    temperature = report['temperature_verbosity']
+    print("\nTemperature vs reply length:")
+    for row in temperature['by_temperature']:
+        print(f"  {row['temperature']:<6} {row['replies']:>8} replies, mean {row['mean_characters']:.0f} chars")
+    if temperature['correlation'] is not None:
+        print(f"  correlation {temperature['correlation']:+.3f}, "
+              f"{temperature['characters_per_degree']:+.0f} chars per 1.0 temperature")
+
+    rounds = report['rounds_vs_max']
+    print("\nRounds reached vs max_rounds:")
+    if rounds['sessions']:
+        print(f"  {rounds['reached_max']}/{rounds['sessions']} reached max_rounds, "
+              f"{rounds['ended_by_stop_word']} ended early by a stop word, "
+              f"{rounds['ended_otherwise']} ended early otherwise")
+        print(f"  mean fraction reached {rounds['mean_fraction']:.2f}, median {rounds['median_fraction']:.2f}")
+
+    stops = report['stop_word_endings']
+    print("\nStop-word endings:")
+    if stops['sessions_with_detection']:
+        print(f"  {stops['ended_by_stop_word']}/{stops['sessions_with_detection']} sessions with detection "
+              f"({100 * stops['rate']:.1f}%)")
+        for row in stops[f'by_{by}']:
+            print(f"  {row['key'][:32]:<32} {row['ended_by_stop_word']:>6}/{row['sessions']:<6} "
+                  f"{100 * row['rate']:5.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare providers, models and personas across all transcripts.')
+    parser.add_argument('directory', nargs='?', default='.',
+                        help='Folder containing the transcripts (default: current directory)')
+    parser.add_argument('--by', choices=GROUP_BY, default='model',
+                        help='Group agent statistics by (default: model)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Parse in N worker processes when the cache is stale (default: 1)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help=f'Always parse, and do not write {ANALYTICS_CACHE_FILENAME}')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args()
+
+    corpus = Corpus.load(args.directory, cache=not args.no_cache, workers=args.workers)
+    report = corpus.report(args.by)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report, args.by)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@
 
 $directory = __DIR__;
 $loggingFile = $directory . '/logging.md';
+$sessionIndexFile = $directory . '/session_index.jsonl';
 $transcripts = [];
 
 // Function to parse a transcript file
@@ -58,101 +59,155 @@ function parseTranscript($content, $filename) {
     return $data;
 }
 
-// Load existing index from logging.md
-$indexedFiles = [];
-if (file_exists($loggingFile)) {
-    $loggingContent = file_get_contents($loggingFile);
-    $loggingLines = explode("\n", $loggingContent);
-    
-    foreach ($loggingLines as $line) {
-        if (preg_match('/^\| `([^`]+)` \|/', $line, $matches)) {
-            $indexedFiles[] = $matches[1];
+// Prefer the session index written by process_logs.py: one read, already
+// sorted newest first, no transcript parsing. Only transcripts written since
+// the last ingest are parsed here; index entries whose file is gone are dropped.
+if (file_exists($sessionIndexFile)) {
+    $onDisk = [];
+    if ($handle = opendir($directory)) {
+        while (false !== ($file = readdir($handle))) {
+            if (pathinfo($file, PATHINFO_EXTENSION) === 'md' &&
+                $file !== 'index.md' &&
+                $file !== 'logging.md') {
+                $onDisk[$file] = true;
+            }
         }
+        closedir($handle);
     }
-}
 
-// Scan directory for .md files
-$newEntries = [];
-if ($handle = opendir($directory)) {
-    while (false !== ($file = readdir($handle))) {
-        if (pathinfo($file, PATHINFO_EXTENSION) === 'md' && 
-            $file !== 'index.md' && 
-            $file !== 'logging.md' &&
-            !in_array($file, $indexedFiles)) {
-            
-            $filePath = $directory . '/' . $file;
-            $content = file_get_contents($filePath);
-            $parsed = parseTranscript($content, $file);
-            
-            // Add to new entries for appending to logging.md
-            $newEntries[] = $parsed;
+    foreach (file($sessionIndexFile, FILE_IGNORE_NEW_LINES | FILE_SKIP_EMPTY_LINES) as $line) {
+        $entry = json_decode($line, true);
+        if (!is_array($entry) || !isset($onDisk[$entry['filename']])) {
+            continue;
+        }
+        unset($onDisk[$entry['filename']]);
+        $transcripts[] = [
+            'filename' => $entry['filename'],
+            'sessionId' => (string)$entry['session_id'],
+            'started' => (string)$entry['started'],
+            'starter' => (string)$entry['topic'],
+            'agentA' => [
+                'persona' => (string)$entry['agent_a_persona'],
+                'provider' => (string)$entry['agent_a_provider']
+            ],
+            'agentB' => [
+                'persona' => (string)$entry['agent_b_persona'],
+                'provider' => (string)$entry['agent_b_provider']
+            ],
+            'messageCount' => intval($entry['messages']),
+            'size' => formatSize($entry['size'])
+        ];
+    }
+
+    // Transcripts not ingested yet
+    if (!empty($onDisk)) {
+        foreach (array_keys($onDisk) as $file) {
+            $parsed = parseTranscript(file_get_contents($directory . '/' . $file), $file);
+            $parsed['starter'] = substr($parsed['starter'], 0, 50) . (strlen($parsed['starter']) > 50 ? '...' : '');
+            $parsed['size'] = formatSize($parsed['size']);
+            $transcripts[] = $parsed;
+        }
+        usort($transcripts, function($a, $b) {
+            return strtotime($b['started']) - strtotime($a['started']);
+        });
+    }
+} else {
+    // Load existing index from logging.md
+    $indexedFiles = [];
+    if (file_exists($loggingFile)) {
+        $loggingContent = file_get_contents($loggingFile);
+        $loggingLines = explode("\n", $loggingContent);
+
+        foreach ($loggingLines as $line) {
+            if (preg_match('/^\| `([^`]+)` \|/', $line, $matches)) {
+                $indexedFiles[] = $matches[1];
+            }
         }
     }
-    closedir($handle);
-}
 
-// Append new entries to logging.md
-if (!empty($newEntries)) {
-    $needsHeader = !file_exists($loggingFile);
-    $fp = fopen($loggingFile, 'a');
-    
-    if ($needsHeader) {
-        fwrite($fp, "# Chat Bridge Archive Index\n\n");
-        fwrite($fp, "| Filename | Session ID | Started | Topic | Agent A | Agent B | Messages | Size |\n");
-        fwrite($fp, "|----------|------------|---------|-------|---------|---------|----------|------|\n");
+    // Scan directory for .md files
+    $newEntries = [];
+    if ($handle = opendir($directory)) {
+        while (false !== ($file = readdir($handle))) {
+            if (pathinfo($file, PATHINFO_EXTENSION) === 'md' && 
+                $file !== 'index.md' && 
+                $file !== 'logging.md' &&
+                !in_array($file, $indexedFiles)) {
+
+                $filePath = $directory . '/' . $file;
+                $content = file_get_contents($filePath);
+                $parsed = parseTranscript($content, $file);
+
+                // Add to new entries for appending to logging.md
+                $newEntries[] = $parsed;
+            }
+        }
+        closedir($handle);
     }
-    
-    foreach ($newEntries as $entry) {
-        $line = sprintf(
-            "| `%s` | %s | %s | %s | %s (%s) | %s (%s) | %d | %s |\n",
-            $entry['filename'],
-            $entry['sessionId'],
-            $entry['started'],
-            substr($entry['starter'], 0, 50) . (strlen($entry['starter']) > 50 ? '...' : ''),
-            $entry['agentA']['persona'],
-            $entry['agentA']['provider'],
-            $entry['agentB']['persona'],
-            $entry['agentB']['provider'],
-            $entry['messageCount'],
-            formatSize($entry['size'])
-        );
-        fwrite($fp, $line);
+
+    // Append new entries to logging.md
+    if (!empty($newEntries)) {
+        $needsHeader = !file_exists($loggingFile);
+        $fp = fopen($loggingFile, 'a');
+
+        if ($needsHeader) {
+            fwrite($fp, "# Chat Bridge Archive Index\n\n");
+            fwrite($fp, "| Filename | Session ID | Started | Topic | Agent A | Agent B | Messages | Size |\n");
+            fwrite($fp, "|----------|------------|---------|-------|---------|---------|----------|------|\n");
+        }
+
+        foreach ($newEntries as $entry) {
+            $line = sprintf(
+                "| `%s` | %s | %s | %s | %s (%s) | %s (%s) | %d | %s |\n",
+                $entry['filename'],
+                $entry['sessionId'],
+                $entry['started'],
+                substr($entry['starter'], 0, 50) . (strlen($entry['starter']) > 50 ? '...' : ''),
+                $entry['agentA']['persona'],
+                $entry['agentA']['provider'],
+                $entry['agentB']['persona'],
+                $entry['agentB']['provider'],
+                $entry['messageCount'],
+                formatSize($entry['size'])
+            );
+            fwrite($fp, $line);
+        }
+
+        fclose($fp);
     }
-    
-    fclose($fp);
-}
 
-// Now load ALL entries from logging.md for display
-if (file_exists($loggingFile)) {
-    $loggingContent = file_get_contents($loggingFile);
-    $loggingLines = explode("\n", $loggingContent);
-    
-    foreach ($loggingLines as $line) {
-        if (preg_match('/^\| `([^`]+)` \| ([^|]+) \| ([^|]+) \| ([^|]+) \| ([^(]+)\(([^)]+)\) \| ([^(]+)\(([^)]+)\) \| (\d+) \| ([^|]+) \|/', $line, $matches)) {
-            $transcripts[] = [
-                'filename' => trim($matches[1]),
-                'sessionId' => trim($matches[2]),
-                'started' => trim($matches[3]),
-                'starter' => trim($matches[4]),
-                'agentA' => [
-                    'persona' => trim($matches[5]),
-                    'provider' => trim($matches[6])
-                ],
-                'agentB' => [
-                    'persona' => trim($matches[7]),
-                    'provider' => trim($matches[8])
-                ],
-                'messageCount' => intval($matches[9]),
-                'size' => trim($matches[10])
-            ];
+    // Now load ALL entries from logging.md for display
+    if (file_exists($loggingFile)) {
+        $loggingContent = file_get_contents($loggingFile);
+        $loggingLines = explode("\n", $loggingContent);
+
+        foreach ($loggingLines as $line) {
+            if (preg_match('/^\| `([^`]+)` \| ([^|]+) \| ([^|]+) \| ([^|]+) \| ([^(]+)\(([^)]+)\) \| ([^(]+)\(([^)]+)\) \| (\d+) \| ([^|]+) \|/', $line, $matches)) {
+                $transcripts[] = [
+                    'filename' => trim($matches[1]),
+                    'sessionId' => trim($matches[2]),
+                    'started' => trim($matches[3]),
+                    'starter' => trim($matches[4]),
+                    'agentA' => [
+                        'persona' => trim($matches[5]),
+                        'provider' => trim($matches[6])
+                    ],
+                    'agentB' => [
+                        'persona' => trim($matches[7]),
+                        'provider' => trim($matches[8])
+                    ],
+                    'messageCount' => intval($matches[9]),
+                    'size' => trim($matches[10])
+                ];
+            }
         }
     }
-}
 
-// Sort by started date (newest first)
-usort($transcripts, function($a, $b) {
-    return strtotime($b['started']) - strtotime($a['started']);
-});
+    // Sort by started date (newest first)
+    usort($transcripts, function($a, $b) {
+        return strtotime($b['started']) - strtotime($a['started']);
+    });
+}
 
 $totalFiles = count($transcripts);
 $totalMessages = array_sum(array_column($transcripts, 'messageCount'));
@@ -798,29 +853,66 @@ function formatDate($dateString) {
             // Show processing status
             showStatus('Processing logs to database...', 'processing');
             
-            // Call the processing endpoint
+            // Start the processing job, then poll its status
             fetch('process_trigger.php')
                 .then(response => response.json())
                 .then(data => {
                     if (data.success) {
-                        showStatus('✅ Successfully processed to database!', 'success');
-                        btnText.textContent = '✅ Processed';
-                        
-                        setTimeout(() => {
-                            btnText.textContent = '📊 Process to Database';
-                            btn.disabled = false;
-                        }, 3000);
+                        pollJob(data.job_id);
+                    } else {
+                        finishProcessing('❌ Error: ' + data.error, 'error');
+                    }
+                })
+                .catch(error => {
+                    finishProcessing('❌ Error: ' + error.message, 'error');
+                });
+        }
+
+        function pollJob(jobId) {
+            fetch('process_trigger.php?job=' + encodeURIComponent(jobId))
+                .then(response => response.json())
+                .then(data => {
+                    if (!data.success) {
+                        finishProcessing('❌ Error: ' + data.error, 'error');
+                        return;
+                    }
+                    const job = data.job;
+                    if (job.state === 'succeeded') {
+                        const failed = job.files_failed ? ` (${job.files_failed} failed)` : '';
+                        finishProcessing(`✅ Processed ${job.files_done} files to database${failed}`,
+                                         job.files_failed ? 'error' : 'success');
+                    } else if (job.state === 'failed') {
+                        finishProcessing('❌ Error: ' + job.error, 'error');
                     } else {
-                        showStatus('❌ Error: ' + data.error, 'error');
-                        btnText.textContent = '📊 Process to Database';
-                        btn.disabled = false;
+                        const btnText = document.getElementById('processBtnText');
+                        if (job.state === 'queued') {
+                            btnText.textContent = '⏳ Waiting for running job...';
+                        } else if (job.files_total !== null) {
+                            const done = job.files_done + job.files_failed;
+                            btnText.textContent = `⏳ Processing ${done}/${job.files_total}...`;
+                        }
+                        setTimeout(() => pollJob(jobId), 1000);
                     }
                 })
                 .catch(error => {
-                    showStatus('❌ Error: ' + error.message, 'error');
+                    finishProcessing('❌ Error: ' + error.message, 'error');
+                });
+        }
+
+        function finishProcessing(message, type) {
+            const btn = document.getElementById('processBtn');
+            const btnText = document.getElementById('processBtnText');
+            showStatus(message, type);
+            if (type === 'success') {
+                btnText.textContent = '✅ Processed';
+                setTimeout(() => {
                     btnText.textContent = '📊 Process to Database';
                     btn.disabled = false;
-                });
+                }, 3000);
+            } else {
+                btnText.textContent = '📊 Process to Database';
+                btn.disabled = false;
+            }
         }
         
         function showStatus(message, type) {
@@ -0,0 +1,328 @@
+"""
+Background ingest jobs with a pollable status file.
+
+process_trigger.php used to run process_logs.py synchronously, holding the
+HTTP request open for the whole run. In job mode the run is started in the
+background instead and the caller gets a job ID straight away:
+
+    $ python process_logs.py /var/www/logs --job
+    {"job_id": "20251006-095749-3f9a1c", "state": "queued", ...}
+
+Every job has these files in the jobs folder (default: ingest_jobs):
+
+    <job_id>.json           status, rewritten atomically as the run
+                            progresses: state (queued, running, succeeded,
+                            failed), files done/failed/total, current file,
+                            recent errors, bytes done, files and bytes per
+                            second
+    <job_id>.log            the run's console output
+    <job_id>.metrics.json   the run's IngestMetrics report, once finished
+
+Runs hold an exclusive lock on ingest.lock in the jobs folder, so a second
+job waits in state 'queued' until the first one has finished instead of
+ingesting the same files concurrently.
+
+The status file records the job's process ID from the start. A job that
+is still queued or running when its process is gone (it crashed before
+taking the lock, or was killed) is marked failed the next time its status
+is read.
+
+Usage:
+    python ingest_jobs.py status [JOB_ID] [--jobs-dir ingest_jobs]
+    python ingest_jobs.py list [--jobs-dir ingest_jobs]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; runs are then not serialized
+    fcntl = None
+
+JOBS_DIR = 'ingest_jobs'
+LOCK_FILENAME = 'ingest.lock'
+# Failed files kept in the status file (the log has all of them)
+_RECENT_ERRORS = 20
+# Options start_job() sets itself, dropped from the command line it is given
+_JOB_FLAGS = ('--job',)
+_JOB_OPTIONS = ('--job-id', '--jobs-dir')
+_JOB_OPTION_PREFIXES = tuple(f"{option}=" for option in _JOB_OPTIONS)
+
+
+def new_job_id() -> str:
+    """A sortable, unique job ID: start time plus a random suffix."""
+    # secrets and subprocess are imported where used: process_logs.py imports
+    # this module on every start, but only --job needs them
+    import secrets
+    return f"{datetime.now():%Y%m%d-%H%M%S}-{secrets.token_hex(3)}"
+
+
+def job_file(job_id: str, jobs_dir: str = JOBS_DIR, suffix: str = '.json') -> Path:
+    """Path of one of a job's files."""
+    return Path(jobs_dir) / f"{job_id}{suffix}"
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec='seconds')
+
+
+class JobStatus:
+    def __init__(self, job_id: str, jobs_dir: str = JOBS_DIR, interval: float = 0.5):
+        """
+        Progress of one ingest job, written to jobs_dir/<job_id>.json.
+
+        Pass it to ChatBridgeProcessor as `progress`; process_directory then
+        reports every file to it.
+
+        interval: Minimum seconds between status file writes while files are
+            being ingested (state changes are always written)
+        """
+        self.job_id = job_id
+        self.jobs_dir = Path(jobs_dir)
+        self.path = job_file(job_id, jobs_dir)
+        self.interval = interval
+        self.status: Dict = {
+            'job_id': job_id,
+            'state': 'queued',
+            'pid': None,
+            'directory': None,
+            'created_at': _now(),
+            'started_at': None,
+            'finished_at': None,
+            'updated_at': None,
+            'files_total': None,
+            'files_done': 0,
+            'files_failed': 0,
+            'current_file': None,
+            'bytes_done': 0,
+            'elapsed_seconds': 0.0,
+            'files_per_second': None,
+            'bytes_per_second': None,
+            'errors': [],
+            'error': None,
+            'log_file': str(job_file(job_id, jobs_dir, '.log')),
+            'metrics_file': str(job_file(job_id, jobs_dir, '.metrics.json')),
+        }
+        self._started: Optional[float] = None
+        self._written = 0.0
+
+    @classmethod
+    def load(cls, job_id: str, jobs_dir: str = JOBS_DIR) -> 'JobStatus':
+        """Continue the status of a job created by start_job()."""
+        job = cls(job_id, jobs_dir)
+        stored = read_status(job_id, jobs_dir)
+        if stored is not None:
+            job.status.update(stored)
+        return job
+
+    def write(self, force: bool = True):
+        """Write the status file (at most every `interval` seconds unless forced)."""
+        now = time.monotonic()
+        if not force and now - self._written < self.interval:
+            return
+        self._written = now
+        if self._started is not None:
+            elapsed = time.perf_counter() - self._started
+            self.status['elapsed_seconds'] = round(elapsed, 3)
+            if elapsed:
+                done = self.status['files_done'] + self.status['files_failed']
+                self.status['files_per_second'] = round(done / elapsed, 3)
+                self.status['bytes_per_second'] = round(self.status['bytes_done'] / elapsed)
+        self.status['updated_at'] = _now()
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        # Pollers may read at any time, so never expose a partial file
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        tmp_path.write_text(json.dumps(self.status, indent=2), encoding='utf-8')
+        os.replace(tmp_path, self.path)
+
+    # Called by the runner
+
+    def running(self):
+        self.status.update(state='running', pid=os.getpid(), started_at=_now())
+        self._started = time.perf_counter()
+        self.write()
+
+    def finish(self, error: Optional[str] = None):
+        self.status.update(state='failed' if error else 'succeeded', error=error,
+                           current_file=None, finished_at=_now())
+        self.write()
+
+    # Called by ChatBridgeProcessor.process_directory
+
+    def start(self, directory: str, total: int):
+        """The run found `total` files that need ingesting."""
+        self.status.update(directory=str(directory), files_total=total)
+        self.write()
+
+    def file_started(self, filepath: Path):
+        self.status['current_file'] = Path(filepath).name
+        self.write(force=False)
+
+    def file_finished(self, filepath: Path, success: bool, size: int = 0):
+        if success:
+            self.status['files_done'] += 1
+            self.status['bytes_done'] += size
+        else:
+            self.status['files_failed'] += 1
+            errors = self.status['errors']
+            errors.append({'file': Path(filepath).name, 'at': _now()})
+            del errors[:-_RECENT_ERRORS]
+        self.write(force=False)
+
+
+def _pid_alive(pid: int) -> bool:
+    """Whether a process exists (always True where that cannot be checked)."""
+    if os.name != 'posix':
+        # os.kill(pid, 0) would send CTRL_C_EVENT on Windows
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    try:
+        # A zombie (exited, not yet reaped by the process that started it) is gone too
+        with open(f"/proc/{pid}/stat", 'rb') as f:
+            return f.read().rpartition(b')')[2].split()[0] != b'Z'
+    except (OSError, IndexError):
+        return True
+
+
+def read_status(job_id: str, jobs_dir: str = JOBS_DIR) -> Optional[Dict]:
+    """
+    A job's status, or None if there is no such job.
+
+    A queued or running job whose process is gone is marked failed (in the
+    status file too) before it is returned.
+    """
+    if Path(job_id).name != job_id:
+        return None
+    try:
+        with open(job_file(job_id, jobs_dir), 'r', encoding='utf-8') as f:
+            status = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    pid = status.get('pid')
+    if status.get('state') in ('queued', 'running') and pid and not _pid_alive(pid):
+        job = JobStatus(job_id, jobs_dir)
+        job.status.update(status)
+        job.finish(f"Job process {pid} exited before the job finished (see its log)")
+        status = job.status
+    return status
+
+
+def list_jobs(jobs_dir: str = JOBS_DIR) -> List[str]:
+    """Job IDs, oldest first."""
+    return sorted(path.stem for path in Path(jobs_dir).glob('*.json')
+                  if not path.name.endswith('.metrics.json'))
+
+
+@contextmanager
+def job_lock(jobs_dir: str = JOBS_DIR):
+    """Hold the jobs folder's run lock, waiting for a running job to finish."""
+    path = Path(jobs_dir) / LOCK_FILENAME
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _run_argv(argv: List[str]) -> List[str]:
+    """argv without --job, --job-id and --jobs-dir (with their values)."""
+    run_argv = []
+    args = iter(argv)
+    for arg in args:
+        if arg in _JOB_OPTIONS:
+            next(args, None)
+        elif arg not in _JOB_FLAGS and not arg.startswith(_JOB_OPTION_PREFIXES):
+            run_argv.append(arg)
+    return run_argv
+
+
+def start_job(argv: List[str], jobs_dir: str = JOBS_DIR) -> Dict:
+    """
+    Start `process_logs.py <argv>` as a background job and return its status.
+
+    argv may be the command line that asked for the job (with --job and
+    --jobs-dir): the job options are replaced by this job's. The job runs
+    detached from the caller (its output goes to the job's log file), so
+    this returns as soon as the process has been started.
+    """
+    import subprocess
+
+    job = JobStatus(new_job_id(), jobs_dir)
+    job.write()
+    script = Path(__file__).resolve().parent / 'process_logs.py'
+    # Unbuffered, so the log follows the run
+    command = [sys.executable, '-u', str(script)] + _run_argv(argv) + [
+        '--job-id', job.job_id, '--jobs-dir', str(jobs_dir)]
+    with open(job.status['log_file'], 'ab') as log:
+        process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=log,
+                                   stderr=subprocess.STDOUT, start_new_session=True)
+    # Written before the run can start (Python takes far longer to get to
+    # run_job), so a process that dies before then is still detected
+    job.status['pid'] = process.pid
+    job.write()
+    return job.status
+
+
+def run_job(job_id: str, run: Callable[[JobStatus], None], jobs_dir: str = JOBS_DIR):
+    """
+    Run `run(status)` as job `job_id` once no other job is running.
+
+    An exception is recorded in the status file as the job's error and
+    re-raised.
+    """
+    job = JobStatus.load(job_id, jobs_dir)
+    if job.status['pid'] != os.getpid():
+        # Started some other way than by start_job()
+        job.status['pid'] = os.getpid()
+        job.write()
+    with job_lock(jobs_dir):
+        job.running()
+        try:
+            run(job)
+        except Exception as e:
+            job.finish(f"{type(e).__name__}: {e}")
+            raise
+        job.finish()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show the status of background ingest jobs.')
+    parser.add_argument('command', choices=('status', 'list'))
+    parser.add_argument('job_id', nargs='?', help='Job to show (default: the latest)')
+    parser.add_argument('--jobs-dir', default=JOBS_DIR, help=f'Jobs folder (default: {JOBS_DIR})')
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        for job_id in list_jobs(args.jobs_dir):
+            status = read_status(job_id, args.jobs_dir) or {}
+            total = status.get('files_total')
+            print(f"{job_id}  {status.get('state', '?'):<10} "
+                  f"{status.get('files_done', 0)}/{'?' if total is None else total} files")
+        return
+
+    job_ids = [args.job_id] if args.job_id else list_jobs(args.jobs_dir)[-1:]
+    status = read_status(job_ids[0], args.jobs_dir) if job_ids else None
+    if status is None:
+        print("Error: no such job")
+        sys.exit(1)
+    print(json.dumps(status, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""
+Per-stage timing instrumentation for ChatBridgeProcessor ingest runs.
+
+Pass an IngestMetrics to the processor and every ingested file records how
+long it spent in each stage (read, parse, insert_session, insert_agents,
+compare_messages, delete_messages, insert_messages, session_stats, commit)
+together with its size, the rows it wrote and the unchanged message rows it
+skipped. The totals and the per-file records can be written as JSON
+and as a Prometheus textfile-collector file:
+
+    metrics = IngestMetrics(json_path='ingest_metrics.json',
+                            prometheus_path='/var/lib/node_exporter/chat_bridge.prom')
+    processor = ChatBridgeProcessor(db_config, metrics=metrics)
+    processor.process_directory('.')   # writes both files when done
+
+With profile='cprofile' or profile='tracemalloc' each file is also profiled
+(or its allocations traced) and the `profile_top` slowest files are dumped
+to `profile_dir`.
+
+With process_directory(workers=N) files are parsed in worker processes, so
+their 'parse' stage is the time the writer waited for the parse result and
+'read' is not measured separately.
+"""
+import heapq
+import io
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from lazy_import import lazy_import
+
+# Only loaded when profiling (tracemalloc alone takes ~5 ms to import)
+cProfile = lazy_import('cProfile')
+tracemalloc = lazy_import('tracemalloc')
+
+STAGES = ('read', 'parse', 'insert_session', 'insert_agents', 'compare_messages',
+          'delete_messages', 'insert_messages', 'session_stats', 'commit')
+ROW_TABLES = ('sessions', 'agents', 'messages', 'session_stats')
+PROFILERS = ('cprofile', 'tracemalloc')
+
+_PROMETHEUS_PREFIX = 'chat_bridge_ingest'
+_TRACEMALLOC_FRAMES = 10
+_TRACEMALLOC_TOP = 25
+
+
+class IngestMetrics:
+    def __init__(self, json_path: Optional[str] = None, prometheus_path: Optional[str] = None,
+                 profile: Optional[str] = None, profile_top: int = 5,
+                 profile_dir: str = 'ingest_profiles'):
+        """
+        Collect ingest timings.
+
+        json_path: Write the report as JSON here on write() (optional)
+        prometheus_path: Write the totals in Prometheus text format here on
+            write(), for node_exporter's textfile collector (optional)
+        profile: None, 'cprofile' or 'tracemalloc'
+        profile_top: Number of slowest files whose profile is kept
+        profile_dir: Folder the profiles of the slowest files are dumped to
+        """
+        if profile not in (None,) + PROFILERS:
+            raise ValueError(f"Unknown profiler: {profile}")
+        self.json_path = json_path
+        self.prometheus_path = prometheus_path
+        self.profile = profile
+        self.profile_top = profile_top
+        self.profile_dir = Path(profile_dir)
+        self.started_at = datetime.now()
+        self.files: List[Dict] = []
+        self.totals = dict.fromkeys(STAGES, 0.0)
+        self.rows = dict.fromkeys(ROW_TABLES, 0)
+        self.skipped = dict.fromkeys(ROW_TABLES, 0)
+        self.bytes = 0
+        self.succeeded = 0
+        self.failed = 0
+        self._current: Optional[Dict] = None
+        self._profiler: Optional[cProfile.Profile] = None
+        # Min-heap of (seconds, sequence, filename, dump) for the slowest files
+        self._slowest: List[tuple] = []
+
+    def begin_file(self, filepath: str, size: Optional[int] = None):
+        """Start recording a file; stages and rows are charged to it until end_file()."""
+        if size is None:
+            try:
+                size = os.path.getsize(filepath)
+            except OSError:
+                size = 0
+        self._current = {
+            'file': Path(filepath).name,
+            'bytes': size,
+            'stages': dict.fromkeys(STAGES, 0.0),
+            'rows': dict.fromkeys(ROW_TABLES, 0),
+            'skipped': dict.fromkeys(ROW_TABLES, 0),
+            'started': time.perf_counter(),
+        }
+        if self.profile == 'cprofile':
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif self.profile == 'tracemalloc':
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(_TRACEMALLOC_FRAMES)
+            tracemalloc.reset_peak()
+
+    def end_file(self, success: bool):
+        """Finish the current file and add it to the totals."""
+        record = self._current
+        if record is None:
+            return
+        self._current = None
+        record['seconds'] = time.perf_counter() - record.pop('started')
+        record['success'] = success
+
+        if self.profile == 'cprofile':
+            self._profiler.disable()
+            self._keep_profile(record, self._profiler)
+            self._profiler = None
+        elif self.profile == 'tracemalloc':
+            record['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            if self._is_slowest(record['seconds']):
+                self._keep_profile(record, tracemalloc.take_snapshot())
+
+        self.files.append(record)
+        self.bytes += record['bytes']
+        for stage, seconds in record['stages'].items():
+            self.totals[stage] += seconds
+        for table, count in record['rows'].items():
+            self.rows[table] += count
+        for table, count in record['skipped'].items():
+            self.skipped[table] += count
+        if success:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+
+    def cancel_file(self):
+        """Drop the current file without recording it (e.g. a skipped duplicate)."""
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler = None
+        self._current = None
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a block as stage `name` of the current file (a no-op outside a file)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self._current is not None:
+                self._current['stages'][name] += time.perf_counter() - start
+
+    def timed(self, items: Iterable, name: str, within: str) -> Iterator:
+        """
+        Iterate over items, charging the time spent fetching each one to
+        stage `name` instead of stage `within`, which times the loop around
+        it. Used to split a streaming parse into 'read' and 'parse'.
+        """
+        iterator = iter(items)
+        clock = time.perf_counter
+        while True:
+            start = clock()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                if self._current is not None:
+                    elapsed = clock() - start
+                    stages = self._current['stages']
+                    stages[name] += elapsed
+                    stages[within] -= elapsed
+            yield item
+
+    @property
+    def recording(self) -> bool:
+        """True between begin_file() and end_file()."""
+        return self._current is not None
+
+    def add_rows(self, table: str, count: int):
+        """Count rows written to `table` for the current file."""
+        if self._current is not None:
+            self._current['rows'][table] += count
+
+    def add_skipped(self, table: str, count: int):
+        """Count rows of `table` left alone as unchanged for the current file."""
+        if self._current is not None:
+            self._current['skipped'][table] += count
+
+    def _is_slowest(self, seconds: float) -> bool:
+        return self.profile_top > 0 and (len(self._slowest) < self.profile_top
+                                         or seconds > self._slowest[0][0])
+
+    def _keep_profile(self, record: Dict, profile):
+        if not self._is_slowest(record['seconds']):
+            return
+        entry = (record['seconds'], len(self.files), record['file'], profile)
+        if len(self._slowest) < self.profile_top:
+            heapq.heappush(self._slowest, entry)
+        else:
+            heapq.heapreplace(self._slowest, entry)
+
+    def report(self) -> Dict:
+        """Return the run as a JSON-serializable dict."""
+        elapsed = sum(record['seconds'] for record in self.files)
+        return {
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'files': len(self.files),
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'bytes': self.bytes,
+            'rows': dict(self.rows),
+            'skipped': dict(self.skipped),
+            'seconds': elapsed,
+            'stages': dict(self.totals),
+            'files_per_second': len(self.files) / elapsed if elapsed else None,
+            'bytes_per_second': self.bytes / elapsed if elapsed else None,
+            'slowest': [{'file': record['file'], 'seconds': record['seconds']} for record in
+                        sorted(self.files, key=lambda r: r['seconds'], reverse=True)[:self.profile_top]],
+            'per_file': self.files,
+        }
+
+    def summary(self) -> str:
+        """One line per stage, slowest stage first."""
+        elapsed = sum(self.totals.values()) or 1.0
+        lines = [f"Ingest metrics: {len(self.files)} files, {self.bytes / 1e6:.1f} MB, "
+                 f"{self.rows['messages']} messages written, "
+                 f"{self.skipped['messages']} unchanged skipped"]
+        for stage, seconds in sorted(self.totals.items(), key=lambda item: item[1], reverse=True):
+            if seconds:
+                lines.append(f"  {stage:<16} {seconds:8.3f}s  {100 * seconds / elapsed:5.1f}%")
+        return '\n'.join(lines)
+
+    def prometheus_text(self) -> str:
+        """Render the totals in the Prometheus text exposition format."""
+        p = _PROMETHEUS_PREFIX
+        lines = [
+            f"# HELP {p}_stage_seconds Time spent in each ingest stage.",
+            f"# TYPE {p}_stage_seconds gauge",
+        ]
+        lines += [f'{p}_stage_seconds{{stage="{stage}"}} {seconds:.6f}'
+                  for stage, seconds in self.totals.items()]
+        lines += [
+            f"# HELP {p}_rows Rows written per table.",
+            f"# TYPE {p}_rows gauge",
+        ]
+        lines += [f'{p}_rows{{table="{table}"}} {count}' for table, count in self.rows.items()]
+        lines += [
+            f"# HELP {p}_skipped_rows Unchanged rows left alone per table.",
+            f"# TYPE {p}_skipped_rows gauge",
+        ]
+        lines += [f'{p}_skipped_rows{{table="{table}"}} {count}'
+                  for table, count in self.skipped.items()]
+        lines += [
+            f"# HELP {p}_files Files ingested, by result.",
+            f"# TYPE {p}_files gauge",
+            f'{p}_files{{result="success"}} {self.succeeded}',
+            f'{p}_files{{result="error"}} {self.failed}',
+            f"# HELP {p}_bytes Bytes of transcript ingested.",
+            f"# TYPE {p}_bytes gauge",
+            f"{p}_bytes {self.bytes}",
+            f"# HELP {p}_last_run_timestamp_seconds When the last report was written.",
+            f"# TYPE {p}_last_run_timestamp_seconds gauge",
+            f"{p}_last_run_timestamp_seconds {time.time():.0f}",
+        ]
+        return '\n'.join(lines) + '\n'
+
+    def write(self):
+        """Write the configured JSON and Prometheus files and the kept profiles."""
+        if self.json_path:
+            _write_atomic(self.json_path, json.dumps(self.report(), indent=2))
+        if self.prometheus_path:
+            # The textfile collector may read at any time, so never expose a partial file
+            _write_atomic(self.prometheus_path, self.prometheus_text())
+        if self._slowest:
+            self.dump_profiles()
+
+    def dump_profiles(self) -> List[Path]:
+        """
+        Dump the profiles of the slowest files to profile_dir.
+
+        cProfile results are saved as <file>.prof (readable with pstats or
+        snakeviz) plus a text listing by cumulative time; tracemalloc results
+        as a text listing of the top allocation sites.
+        """
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        written = []
+        for rank, (seconds, _, filename, profile) in enumerate(
+                sorted(self._slowest, reverse=True), 1):
+            stem = self.profile_dir / f"{rank:02d}_{Path(filename).stem}"
+            if isinstance(profile, cProfile.Profile):
+                profile.dump_stats(f"{stem}.prof")
+                # Only needed here, and slow to import (dataclasses, inspect)
+                import pstats
+                text = io.StringIO()
+                pstats.Stats(profile, stream=text).sort_stats('cumulative').print_stats(30)
+                path = Path(f"{stem}.txt")
+                path.write_text(f"{filename}: {seconds:.3f}s\n{text.getvalue()}", encoding='utf-8')
+            else:
+                top = profile.statistics('traceback')[:_TRACEMALLOC_TOP]
+                lines = [f"{filename}: {seconds:.3f}s"]
+                for stat in top:
+                    lines.append(f"\n{stat.size / 1024:.1f} KiB in {stat.count} blocks")
+                    lines.extend(stat.traceback.format())
+                path = Path(f"{stem}.tracemalloc.txt")
+                path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+            written.append(path)
+        return written
+
+
+def _write_atomic(path: str, text: str):
+    """Write a file through a .tmp sibling and a rename."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
@@ -0,0 +1,62 @@
+"""
+Deferred imports of the database driver.
+
+Importing mysql.connector takes about 100 ms, which every run of
+process_logs.py used to pay, including the ones that never touch the
+database (--parse-only, --help, --job). Modules bind the driver with
+
+    mysql = lazy_import('mysql.connector')
+
+instead of `import mysql.connector`. The name is used the same way, but
+the driver is only imported the first time one of its attributes is
+looked up: on connecting, or when an `except mysql.connector.Error`
+clause is evaluated because something raised.
+
+If the driver is not installed, that first lookup raises
+ModuleNotFoundError instead of the import, so modes that do not need it
+still work.
+
+The same goes for other slow imports only some modes need, such as
+sqlite3 in process_logs.py and the profilers in ingest_metrics.py.
+"""
+import importlib.util
+import sys
+import types
+
+
+class _MissingModule(types.ModuleType):
+    """Stands in for a module that is not installed until something uses it."""
+
+    def __init__(self, name: str, missing: str):
+        super().__init__(name)
+        self._missing = missing
+
+    def __getattr__(self, attribute: str):
+        raise ModuleNotFoundError(f"No module named {self._missing!r}", name=self._missing)
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """
+    Bind `name` the way `import name` does, without executing it yet.
+
+    Returns the top-level package (for 'mysql.connector', the near-empty
+    'mysql'), whose attribute for the module loads it on first use.
+    """
+    top = name.partition('.')[0]
+    if name in sys.modules:
+        return sys.modules[top]
+    try:
+        spec = importlib.util.find_spec(name)
+    except ModuleNotFoundError:
+        spec = None
+    if spec is None or spec.loader is None:
+        return _MissingModule(top, name)
+
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    parent, _, child = name.rpartition('.')
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return sys.modules[top]
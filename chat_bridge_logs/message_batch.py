@@ -0,0 +1,206 @@
+"""
+Column-oriented storage for the messages of one parsed transcript.
+
+The parsers fill a MessageBatch instead of building one dict per message:
+speakers are kept as one-byte codes, timestamps and bodies as parallel lists,
+and the bodies of memory-mapped transcripts as (offset, length) pairs into
+the map that are only decoded when a row is written. The database and
+search index writers read the columns directly through rows() and
+columns().
+
+For existing callers a batch still behaves like the old list of message
+dicts: len(), iteration and indexing yield {'speaker', 'timestamp',
+'content', 'order'} dicts (built on access), slicing yields a batch, and a
+batch compares equal to the equivalent list of dicts.
+
+Each message also has a content hash (message_hash) over its speaker,
+timestamp and body, which the processor stores next to the row to tell
+which messages of a re-ingested session actually changed.
+"""
+import hashlib
+import mmap
+import re
+import sys
+from array import array
+from collections.abc import Sequence
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+SPEAKERS = tuple(sys.intern(speaker) for speaker in ('Human', 'Agent A', 'Agent B'))
+_SPEAKER_CODES = {speaker: code for code, speaker in enumerate(SPEAKERS)}
+
+# <sub> tag (provider · model) at the start of a message body
+_SUB_TAG_RE = re.compile(r'^<sub[^>]*>.*?</sub>\s*', re.DOTALL)
+
+
+def mapped_text(mapping: mmap.mmap, start: int, end: int) -> str:
+    """Decode a message body from a byte range of a memory map, as the text parsers store it."""
+    return _SUB_TAG_RE.sub('', mapping[start:end].decode('utf-8').strip())
+
+
+def message_hash(speaker: str, timestamp: str, content: str) -> str:
+    """Stable 32-character hex hash of a message's stored columns (except its order)."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{speaker}\0{timestamp}\0".encode('utf-8'))
+    digest.update(content.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class MessageBatch(Sequence):
+    """
+    The messages of one transcript, stored column-wise.
+
+    A batch holds either text bodies (texts) or, when source is a memory
+    map, byte offsets and lengths into it; orders run from first_order up.
+    """
+
+    __slots__ = ('speaker_codes', 'timestamps', 'texts', 'source', 'offsets', 'lengths',
+                 'first_order')
+
+    def __init__(self, first_order: int = 0, source: Optional[mmap.mmap] = None):
+        self.speaker_codes = array('B')
+        self.timestamps: List[str] = []
+        self.texts: Optional[List[str]] = [] if source is None else None
+        self.source = source
+        self.offsets = array('q') if source is not None else None
+        self.lengths = array('q') if source is not None else None
+        self.first_order = first_order
+
+    @classmethod
+    def from_dicts(cls, messages: Iterable[Dict]) -> 'MessageBatch':
+        """
+        Build a batch from message dicts (the compatibility form).
+
+        The dicts must have consecutive orders, as every parser produces.
+        """
+        batch = cls()
+        for msg in messages:
+            if not batch.timestamps:
+                batch.first_order = msg['order']
+            elif msg['order'] != batch.first_order + len(batch.timestamps):
+                raise ValueError(f"Message orders are not consecutive at {msg['order']}")
+            batch.append(msg['speaker'], msg['timestamp'], str(msg['content']))
+        return batch
+
+    @classmethod
+    def coerce(cls, messages: Union['MessageBatch', Iterable[Dict]]) -> 'MessageBatch':
+        """Return messages as a batch (unchanged if it already is one)."""
+        return messages if isinstance(messages, cls) else cls.from_dicts(messages)
+
+    def append(self, speaker: str, timestamp: str, content: str):
+        """Add a message with a text body."""
+        self.speaker_codes.append(_SPEAKER_CODES[speaker])
+        self.timestamps.append(timestamp)
+        self.texts.append(content)
+
+    def append_mapped(self, speaker: str, timestamp: str, start: int, end: int):
+        """Add a message whose body is bytes start:end of the source map."""
+        self.speaker_codes.append(_SPEAKER_CODES[speaker])
+        self.timestamps.append(timestamp)
+        self.offsets.append(start)
+        self.lengths.append(end - start)
+
+    def __len__(self) -> int:
+        return len(self.speaker_codes)
+
+    def speaker(self, index: int) -> str:
+        return SPEAKERS[self.speaker_codes[index]]
+
+    def content(self, index: int) -> str:
+        """The body of message `index`, decoded from the source map if needed."""
+        if self.source is None:
+            return self.texts[index]
+        start = self.offsets[index]
+        return mapped_text(self.source, start, start + self.lengths[index])
+
+    def contents(self) -> Iterator[str]:
+        """All bodies in order (mapped ones decoded one at a time)."""
+        if self.source is None:
+            return iter(self.texts)
+        return (self.content(index) for index in range(len(self)))
+
+    def columns(self) -> Iterator[Tuple[int, str, str, str]]:
+        """Yield (order, speaker, timestamp, content) per message."""
+        speakers = (SPEAKERS[code] for code in self.speaker_codes)
+        return zip(range(self.first_order, self.first_order + len(self)), speakers,
+                   self.timestamps, self.contents())
+
+    def rows(self, session_id: str) -> Iterator[tuple]:
+        """Yield messages table rows: (session_id, speaker, timestamp, content, message_order)."""
+        for order, speaker, timestamp, content in self.columns():
+            yield session_id, speaker, timestamp, content, order
+
+    def hashes(self) -> List[str]:
+        """message_hash() of every message, in order."""
+        return [message_hash(speaker, timestamp, content)
+                for _, speaker, timestamp, content in self.columns()]
+
+    def hashed_rows(self, session_id: str, hashes: List[str],
+                    indexes: Optional[Iterable[int]] = None) -> Iterator[tuple]:
+        """
+        Yield messages table rows with their hash as a sixth column.
+
+        hashes: The batch's hashes(), so bodies are not hashed twice
+        indexes: Only yield these messages (default: all)
+        """
+        if indexes is None:
+            indexes = range(len(self))
+        for index in indexes:
+            yield (session_id, self.speaker(index), self.timestamps[index], self.content(index),
+                   self.first_order + index, hashes[index])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._slice(index)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('message index out of range')
+        return {
+            'speaker': self.speaker(index),
+            'timestamp': self.timestamps[index],
+            'content': self.content(index),
+            'order': self.first_order + index,
+        }
+
+    def _slice(self, index: slice) -> 'MessageBatch':
+        start, stop, step = index.indices(len(self))
+        if step != 1:
+            raise ValueError('MessageBatch slices must be contiguous')
+        stop = max(start, stop)
+        part = MessageBatch(self.first_order + start, self.source)
+        part.speaker_codes = self.speaker_codes[start:stop]
+        part.timestamps = self.timestamps[start:stop]
+        if self.source is None:
+            part.texts = self.texts[start:stop]
+        else:
+            part.offsets = self.offsets[start:stop]
+            part.lengths = self.lengths[start:stop]
+        return part
+
+    def __iter__(self) -> Iterator[Dict]:
+        for order, speaker, timestamp, content in self.columns():
+            yield {'speaker': speaker, 'timestamp': timestamp, 'content': content, 'order': order}
+
+    def as_dicts(self) -> List[Dict]:
+        """The messages as a list of dicts, the form parse_markdown_file used to return."""
+        return list(self)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (MessageBatch, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"<MessageBatch of {len(self)} messages from order {self.first_order}>"
+
+    def __getstate__(self):
+        # Memory maps cannot be pickled: send decoded bodies instead
+        if self.source is None:
+            return (self.speaker_codes, self.timestamps, self.texts, self.first_order)
+        return (self.speaker_codes, self.timestamps, list(self.contents()), self.first_order)
+
+    def __setstate__(self, state):
+        self.speaker_codes, self.timestamps, self.texts, self.first_order = state
+        self.source = self.offsets = self.lengths = None
@@ -1,13 +1,517 @@
 import re
-import mysql.connector
-import zipfile
+import os
+import json
+import mmap
+import hashlib
+import queue
+import sys
+import threading
+import time
 import shutil
+from contextlib import nullcontext
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import (IO, TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Optional, Set,
+                    Tuple, Union)
+
+from lazy_import import lazy_import
+from message_batch import _SUB_TAG_RE, MessageBatch
+
+if TYPE_CHECKING:
+    from bundle_archive import BundleArchive
+    from ingest_jobs import JobStatus
+    from ingest_metrics import IngestMetrics
+    from search_index import SearchIndex
+    from session_stats import SessionStats
+
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+except ImportError:  # Linux-only extra; --watch falls back to mtime polling
+    INotify = None
+
+# Imported on first use, so runs without the database start fast (see lazy_import.py).
+# The modules of the other modes (search index, session stats, schema, export,
+# jobs, metrics, bundles) are imported where those modes begin.
+mysql = lazy_import('mysql.connector')
+sqlite3 = lazy_import('sqlite3')
+
+MANIFEST_FILENAME = '.ingest_manifest.json'
+SESSION_INDEX_FILENAME = 'session_index.jsonl'
+_TOPIC_CHARS = 50  # as truncated by the archive viewer (index.php)
+
+# Markdown files in the log folder that are not transcripts
+_SKIPPED_FILENAMES = ('logging.md', 'index.md')
+
+# The Session ID sits in the first lines of every transcript
+_SESSION_ID_BYTES_RE = re.compile(rb'\*\*Session ID:\*\* (conv_\d+_\d+)')
+_HEADER_PEEK_BYTES = 1024
+_FINGERPRINT_BYTES = 64 * 1024
+
+
+# Registry of precompiled header patterns, shared by both parsers.
+# Header fields are only read from the metadata block before "## Conversation".
+_FIELD_PAIR_RE = re.compile(r'\*\*([^*\n]+?):\*\* ')
+_CONVERSATION_RE = re.compile(r'## Conversation\n\n')
+_CONVERSATION_HEADING = '## Conversation'
+
+def _interned(value: str) -> str:
+    """Strip a header value and intern it (providers, models and personas repeat across files)."""
+    return sys.intern(value.strip())
+
+
+# Single-line fields: name -> (target, key, value pattern, convert)
+_HEADER_FIELDS = {
+    'Session ID': ('session', 'session_id', re.compile(r'conv_\d+_\d+'), str),
+    'Started': ('session', 'started_at', re.compile(r'[\d-]+ [\d:]+'), str),
+    'Max Rounds': ('session', 'max_rounds', re.compile(r'\d+'), int),
+    'Memory Rounds': ('session', 'memory_rounds', re.compile(r'\d+'), int),
+    'Stop Word Detection': ('session', 'stop_word_detection', re.compile(r'\w+'),
+                            lambda v: v == 'Enabled'),
+    'Stop Words': ('session', 'stop_words', re.compile(r'.+'), str),
+}
+for _label in ('A', 'B'):
+    _HEADER_FIELDS.update({
+        f'Agent {_label} Provider': (_label, 'provider', re.compile(r'.+'), _interned),
+        f'Agent {_label} Model': (_label, 'model', re.compile(r'.+'), _interned),
+        f'Agent {_label} Temperature': (_label, 'temperature', re.compile(r'[\d.]+'), float),
+        f'Agent {_label} Persona': (_label, 'persona', re.compile(r'.+'), _interned),
+    })
+
+# Multi-line fields: name -> (target, key, stop_on_blank, tail pattern). The value
+# runs to the first newline followed by "###", by a blank line (starter) or by a
+# blank line and "**" (system prompts), or to the end of the metadata block.
+_STARTER_TAIL_RE = re.compile(r'.*?(?=\n\n|\n###|\Z)', re.DOTALL)
+_PROMPT_TAIL_RE = re.compile(r'.*?(?=\n\n\*\*|\n###|\Z)', re.DOTALL)
+_MULTILINE_FIELDS = {
+    'Conversation Starter': ('session', 'conversation_starter', True, _STARTER_TAIL_RE),
+    'Agent A System Prompt': ('A', 'system_prompt', False, _PROMPT_TAIL_RE),
+    'Agent B System Prompt': ('B', 'system_prompt', False, _PROMPT_TAIL_RE),
+}
+
+_MESSAGE_RE = re.compile(
+    r'### (Human|Agent A|Agent B) \(([\d-]+ [\d:]+)\)\n(?:<sub[^>]*>.*?</sub>\n)?\n?(.+?)(?=\n### |\Z)',
+    re.DOTALL
+)
+_MESSAGE_HEADER_RE = re.compile(r'### (Human|Agent A|Agent B) \(([\d-]+ [\d:]+)\)$')
+
+# Byte-level patterns for memory-mapped parsing
+_CONVERSATION_BYTES_RE = re.compile(_CONVERSATION_RE.pattern.encode())
+_MESSAGE_BYTES_RE = re.compile(_MESSAGE_RE.pattern.encode(), re.DOTALL)
+
+
+def _header_value(name: str, raw: str):
+    """Convert the raw text after a single-line ``**Field:**`` marker (None if it does not fit)."""
+    target, key, pattern, convert = _HEADER_FIELDS[name]
+    match = pattern.match(raw)
+    return convert(match.group()) if match else None
+
+
+def _new_parse_result() -> Tuple[Dict, Dict[str, Dict]]:
+    """Return an empty parse result and its field targets ('session', 'A', 'B')."""
+    data = {
+        'session': {
+            'session_id': None,
+            'started_at': None,
+            'conversation_starter': None,
+            'max_rounds': None,
+            'memory_rounds': None,
+            'stop_word_detection': False,
+            'stop_words': None
+        },
+        'agents': [],
+        'messages': MessageBatch()
+    }
+    for label in ('A', 'B'):
+        data['agents'].append({
+            'label': label,
+            'provider': None,
+            'model': None,
+            'temperature': None,
+            'persona': None,
+            'system_prompt': None
+        })
+    targets = {'session': data['session'], 'A': data['agents'][0], 'B': data['agents'][1]}
+    return data, targets
+
+
+# Write statements shared by the sync and async processors. Multi-row
+# statements carry a {values} slot that _batch_statements fills in.
+_SESSION_UPSERT_SQL = """
+INSERT INTO sessions 
+(session_id, started_at, conversation_starter, max_rounds, 
+ memory_rounds, stop_word_detection, stop_words)
+VALUES (%s, %s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+started_at = VALUES(started_at),
+conversation_starter = VALUES(conversation_starter)
+"""
+
+_AGENT_UPSERT_SQL = """
+INSERT INTO agents 
+(session_id, agent_label, provider, model, temperature, persona, system_prompt)
+VALUES {values}
+ON DUPLICATE KEY UPDATE
+provider = VALUES(provider),
+model = VALUES(model),
+temperature = VALUES(temperature),
+persona = VALUES(persona),
+system_prompt = VALUES(system_prompt)
+"""
+
+_MESSAGE_INSERT_SQL = """
+INSERT INTO messages 
+(session_id, speaker, timestamp, content, message_order)
+VALUES {values}
+"""
+
+_DELETE_MESSAGES_SQL = "DELETE FROM messages WHERE session_id = %s"
+_DELETE_MESSAGES_FROM_SQL = "DELETE FROM messages WHERE session_id = %s AND message_order >= %s"
+
+# Messages with content hashes: only rows whose hash differs are rewritten
+_HASHED_MESSAGE_INSERT_SQL = """
+INSERT INTO messages 
+(session_id, speaker, timestamp, content, message_order, content_hash)
+VALUES {values}
+"""
+
+_MESSAGE_HASHES_SQL = """
+SELECT message_order, content_hash FROM messages
+WHERE session_id = %s AND message_order >= %s
+"""
+
+_DELETE_MESSAGE_ORDERS_SQL = "DELETE FROM messages WHERE session_id = %s AND message_order IN ({orders})"
+_DELETE_ORDERS_PER_STATEMENT = 1000
+
+
+def _session_row(session_data: Dict) -> tuple:
+    return (
+        session_data['session_id'],
+        session_data['started_at'],
+        session_data['conversation_starter'],
+        session_data['max_rounds'],
+        session_data['memory_rounds'],
+        session_data['stop_word_detection'],
+        session_data['stop_words']
+    )
+
+
+def _agent_rows(session_id: str, agents: List[Dict]) -> Iterable[tuple]:
+    return ((
+        session_id,
+        agent['label'],
+        agent['provider'],
+        agent['model'],
+        agent['temperature'],
+        agent['persona'],
+        agent['system_prompt']
+    ) for agent in agents)
+
+
+def _message_rows(session_id: str, messages: Union[MessageBatch, List[Dict]]) -> Iterable[tuple]:
+    # A generator, so memory-mapped bodies are decoded one batch at a time
+    return MessageBatch.coerce(messages).rows(session_id)
+
+
+def _stored_hashes(rows: Iterable[tuple]) -> Dict[int, Optional[str]]:
+    """message_order -> content_hash from the rows of _MESSAGE_HASHES_SQL."""
+    stored = {}
+    for order, digest in rows:
+        # An order stored twice (left over from before messages were replaced
+        # on re-ingest) never matches, so the order is rewritten once
+        stored[order] = None if order in stored else digest
+    return stored
+
+
+def _message_changes(first_order: int, hashes: List[str],
+                     stored: Dict[int, Optional[str]]) -> Tuple[List[int], List[int]]:
+    """
+    Compare the hashes of messages from first_order on with the stored ones.
+
+    Returns the indexes of the messages to write (new or changed) and the
+    stored orders to delete first (changed, or past the end of the batch).
+    """
+    write = []
+    stale = []
+    for index, digest in enumerate(hashes):
+        order = first_order + index
+        if order in stored:
+            if stored.pop(order) == digest:
+                continue
+            stale.append(order)
+        write.append(index)
+    stale.extend(sorted(stored))
+    return write, stale
+
+
+def _delete_orders_statements(session_id: str, orders: List[int]):
+    """(statement, params) pairs that delete the given message orders of a session."""
+    for start in range(0, len(orders), _DELETE_ORDERS_PER_STATEMENT):
+        chunk = orders[start:start + _DELETE_ORDERS_PER_STATEMENT]
+        yield (_DELETE_MESSAGE_ORDERS_SQL.format(orders=', '.join(['%s'] * len(chunk))),
+               [session_id] + chunk)
+
+
+def _index_record(filename: str, size: int, data: Dict) -> Dict:
+    """One session index line: what the archive viewer lists per transcript."""
+    session = data['session']
+    agents = {agent['label']: agent for agent in data['agents']}
+    topic = (session['conversation_starter'] or '').split('\n', 1)[0].strip()
+    if len(topic) > _TOPIC_CHARS:
+        topic = topic[:_TOPIC_CHARS] + '...'
+    record = {
+        'filename': filename,
+        'session_id': session['session_id'],
+        'started': session['started_at'],
+        'topic': topic,
+    }
+    for label in ('A', 'B'):
+        agent = agents.get(label, {})
+        record[f'agent_{label.lower()}_persona'] = agent.get('persona')
+        record[f'agent_{label.lower()}_provider'] = agent.get('provider')
+    record['messages'] = len(data['messages'])
+    record['size'] = size
+    return record
+
+
+def _batch_statements(query: str, rows: Iterable[tuple], max_packet_bytes: int):
+    """
+    Split a multi-row INSERT into (statement, params) pairs.
+
+    query must contain a ``{values}`` slot for the row placeholders. Each
+    statement is kept under max_packet_bytes (estimated from the escaped
+    parameter sizes); a single row larger than the budget is sent alone.
+    rows may be a generator; only the current statement's rows are held.
+    """
+    placeholder = None
+    base_size = len(query) + 16
+    batch = []
+    params = []
+    size = base_size
+    for row in rows:
+        if placeholder is None:
+            placeholder = '(' + ', '.join(['%s'] * len(row)) + ')'
+        row_size = len(placeholder) + 2 + sum(_sql_literal_size(value) for value in row)
+        if batch and size + row_size > max_packet_bytes:
+            yield query.format(values=', '.join(batch)), params
+            batch = []
+            params = []
+            size = base_size
+        batch.append(placeholder)
+        params.extend(row)
+        size += row_size
+    if batch:
+        yield query.format(values=', '.join(batch)), params
+
+
+def _sql_literal_size(value) -> int:
+    """Upper bound on the bytes a parameter takes once escaped into a statement."""
+    if value is None:
+        return 4
+    if isinstance(value, str):
+        size = len(value) if value.isascii() else len(value.encode('utf-8'))
+        escapes = sum(value.count(c) for c in ('\\', "'", '"', '\n', '\r', '\x00', '\x1a'))
+        return size + escapes + 2
+    return len(str(value)) + 2
+
+
+class _MultilineField:
+    """
+    Line-by-line equivalent of a multi-line header field's tail pattern.
+
+    The value ends before the first line starting with ``###``, or before a
+    blank line (conversation starter) / a blank line and ``**`` (system
+    prompts). finish() closes it at the end of the metadata block.
+    """
+
+    def __init__(self, first: str, stop_on_blank: bool):
+        self.lines = [first]
+        self.stop_on_blank = stop_on_blank
+
+    def feed(self, line: str) -> bool:
+        """Consume the next line; return True once the value is complete."""
+        if line.startswith('###') or (self.stop_on_blank and line == ''):
+            return True
+        if (not self.stop_on_blank and line.startswith('**') and len(self.lines) > 1
+                and self.lines[-1] == ''):
+            return True
+        self.lines.append(line)
+        return False
+
+    def finish(self, heading: str = ''):
+        """End the value at the metadata block boundary, dropping the heading text."""
+        if heading and self.lines[-1].endswith(heading):
+            self.lines[-1] = self.lines[-1][:-len(heading)]
+
+    @property
+    def value(self) -> str:
+        return '\n'.join(self.lines).strip()
+
+
+class _MessageScanner:
+    """
+    Line-driven equivalent of the conversation ``finditer`` in the regex parser.
+
+    Only the current message is buffered, so memory stays proportional to
+    the largest single message rather than the whole transcript.
+    """
+
+    SEEK, AFTER_HEADER, SUB, AFTER_SUB, BODY = range(5)
+
+    def __init__(self, messages: MessageBatch):
+        self.messages = messages
+        self.state = self.SEEK
+        self.speaker = None
+        self.timestamp = None
+        self.body = []
+        self.forced = False
+        self.sub_lines = []
+        self.sub_gt = False
+        self.body_started = False
+
+    def feed(self, line: str, has_newline: bool = True):
+        """Consume one line of the conversation section (without its newline)."""
+        state = self.state
+        if state == self.BODY:
+            if not self.body_started:
+                self._start_body(line)
+            elif self.forced:
+                self.body.append(line)
+                self.forced = False
+            elif line.startswith('### '):
+                self._emit()
+                self.feed(line, has_newline)
+            else:
+                self.body.append(line)
+        elif state == self.SEEK:
+            match = _MESSAGE_HEADER_RE.search(line)
+            if match and has_newline:
+                self.speaker, self.timestamp = match.group(1), match.group(2)
+                self.state = self.AFTER_HEADER
+        elif state == self.AFTER_HEADER:
+            if line.startswith('<sub'):
+                self.state = self.SUB
+                self.sub_lines = [(line, has_newline)]
+                self.sub_gt = False
+                self._check_sub_closed(line, has_newline, 4)
+            elif line == '' and has_newline:
+                self._skip_blank()
+            else:
+                self._start_body(line)
+        elif state == self.SUB:
+            self.sub_lines.append((line, has_newline))
+            self._check_sub_closed(line, has_newline, 0)
+        elif state == self.AFTER_SUB:
+            self.sub_lines = []
+            if line == '' and has_newline:
+                self._skip_blank()
+            else:
+                self._start_body(line)
+
+    def close(self):
+        """Flush the message in progress at end of input."""
+        if self.state == self.SUB or (self.state == self.AFTER_SUB and self.sub_lines):
+            # The <sub> block never closed, or closed on the last line and
+            # left no body: the regex backtracks and reads it as the body
+            pending, self.sub_lines = self.sub_lines, []
+            self._start_body(pending[0][0])
+            for line, has_newline in pending[1:]:
+                self.feed(line, has_newline)
+            self.close()
+        elif self.state in (self.AFTER_SUB, self.BODY):
+            self._emit()
+
+    def _check_sub_closed(self, line: str, has_newline: bool, start: int):
+        gt = -1
+        if not self.sub_gt:
+            gt = line.find('>', start)
+            if gt == -1:
+                return
+            self.sub_gt = True
+        if has_newline and line.endswith('</sub>') and len(line) - 6 > gt:
+            # sub_lines are kept until the next line, see close()
+            self.state = self.AFTER_SUB
+
+    def _skip_blank(self):
+        # Optional blank line between the header (or <sub> tag) and the body
+        self.state = self.BODY
+        self.body = []
+        self.forced = False
+        self.body_started = False
+
+    def _start_body(self, line: str):
+        # The first body line never terminates the message; if it is blank
+        # the line after it is kept unconditionally as well.
+        self.state = self.BODY
+        self.body = [line]
+        self.forced = line == ''
+        self.body_started = True
+
+    def _emit(self):
+        content = '\n'.join(self.body).strip()
+        content = _SUB_TAG_RE.sub('', content)
+        self.messages.append(self.speaker, self.timestamp, content)
+        self.state = self.SEEK
+        self.body = []
+
+
+class _PollingWatcher:
+    """Reports transcripts whose size or mtime changed since the last poll."""
+
+    def __init__(self, directory: str, pattern: str):
+        self.directory = Path(directory)
+        self.pattern = pattern
+        self.seen = self._snapshot()
+
+    def _snapshot(self) -> Dict[Path, Tuple[int, int]]:
+        snapshot = {}
+        for filepath in self.directory.glob(self.pattern):
+            try:
+                stat = filepath.stat()
+            except FileNotFoundError:
+                continue
+            snapshot[filepath] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def wait(self, interval: float) -> Set[Path]:
+        time.sleep(interval)
+        current = self._snapshot()
+        changed = {filepath for filepath, seen in current.items() if self.seen.get(filepath) != seen}
+        self.seen = current
+        return changed
+
+    def close(self):
+        pass
+
+
+class _InotifyWatcher:
+    """Reports files written to or moved into the directory, via inotify."""
+
+    def __init__(self, directory: str, pattern: str):
+        self.directory = Path(directory)
+        self.pattern = pattern
+        self.inotify = INotify()
+        self.inotify.add_watch(directory, inotify_flags.CREATE | inotify_flags.MODIFY |
+                               inotify_flags.CLOSE_WRITE | inotify_flags.MOVED_TO)
+
+    def wait(self, interval: float) -> Set[Path]:
+        # After the first event keep collecting for `interval`, so a burst of
+        # writes to a live transcript becomes a single ingest
+        events = self.inotify.read(timeout=int(interval * 1000), read_delay=int(interval * 1000))
+        return {self.directory / event.name for event in events
+                if event.name and Path(event.name).match(self.pattern)}
+
+    def close(self):
+        self.inotify.close()
+
 
 class ChatBridgeProcessor:
-    def __init__(self, db_config: Dict[str, str], archive_folder: str = 'archive'):
+    def __init__(self, db_config: Dict[str, str], archive_folder: str = 'archive',
+                 pool_size: int = 1, max_packet_bytes: int = 1024 * 1024,
+                 mmap_threshold: Optional[int] = 8 * 1024 * 1024,
+                 full_text_search: bool = True, metrics: Optional['IngestMetrics'] = None,
+                 session_stats: bool = True, message_hashes: bool = True,
+                 manage_schema: bool = True, bundle_archive: Optional['BundleArchive'] = None,
+                 progress: Optional['JobStatus'] = None):
         """
         Initialize processor with database configuration.
 
@@ -19,23 +523,182 @@ class ChatBridgeProcessor:
             'database': 'chat_bridge'
         }
         archive_folder: Folder where processed logs will be archived (default: 'archive')
+        pool_size: Number of connections kept in the connection pool (default: 1)
+        max_packet_bytes: Size budget for one multi-row INSERT statement; keep it
+            below the server's max_allowed_packet (default: 1 MB)
+        mmap_threshold: Files of at least this many bytes are parsed from a memory
+            map with lazily decoded message bodies (default: 8 MB, None disables)
+        full_text_search: Keep the SQLite full-text search and similarity
+            index of each processed directory up to date (see search_index.py
+            and similarity_index.py)
+        metrics: Record per-stage timings and row counts of every ingested
+            file here (see ingest_metrics.py)
+        session_stats: Keep the per-session rollups in the session_stats
+            table up to date (see session_stats.py)
+        message_hashes: Store a content hash with every message and, when a
+            session is re-ingested, only rewrite the messages whose hash
+            changed (the content_hash column is added if missing)
+        manage_schema: On the first connect, apply pending schema migrations
+            and add upcoming monthly partitions of messages (see schema.py)
+        bundle_archive: Append every file process_directory ingests to this
+            rolling archive of compressed transcripts (see bundle_archive.py);
+            compression runs in the archive's background thread
+        progress: Report process_directory's progress (files done/total,
+            current file, failures) to this job status (see ingest_jobs.py)
         """
         self.db_config = db_config
+        self.pool_size = pool_size
+        self.max_packet_bytes = max_packet_bytes
+        self.mmap_threshold = mmap_threshold
+        self.full_text_search = full_text_search
+        self.metrics = metrics
+        self.session_stats = session_stats
+        self._stats_table_ready = False
+        self.message_hashes = message_hashes
+        self._hash_column_ready = False
+        self.manage_schema = manage_schema
+        self._schema_ready = False
+        # Message rows written and left alone as unchanged since reset_message_counts()
+        self.messages_written = 0
+        self.messages_skipped = 0
+        self.pool = None
         self.conn = None
         self.cursor = None
+        # Error that made the last write fail, to tell a lost connection from a rejected file
+        self.last_error: Optional[Exception] = None
         self.archive_folder = Path(archive_folder)
+        self.bundle_archive = bundle_archive
+        self.progress = progress
     
     def connect(self):
-        """Establish database connection."""
-        self.conn = mysql.connector.connect(**self.db_config)
+        """
+        Establish database connection.
+
+        Connections come from a small pool created on first use. If a
+        connection is already held it is reused as is, without a round trip
+        to the server; reconnect() re-establishes one the server dropped.
+        """
+        if self.conn is not None:
+            return
+        if self.pool is None:
+            from mysql.connector import pooling
+            self.pool = pooling.MySQLConnectionPool(
+                pool_name='chat_bridge',
+                pool_size=self.pool_size,
+                **self.db_config
+            )
+        self.conn = self.pool.get_connection()
+        self._new_cursor()
+
+    def reconnect(self):
+        """Re-establish the connection after the server dropped it."""
+        if self.conn is None:
+            self.connect()
+            return
+        self.conn.ping(reconnect=True, attempts=3, delay=1)
+        self._new_cursor()
+
+    def _new_cursor(self):
+        # A reconnect invalidates the old cursor, so start a fresh one
+        if self.cursor:
+            try:
+                self.cursor.close()
+            except mysql.connector.Error:
+                pass
         self.cursor = self.conn.cursor()
+        if self.manage_schema and not self._schema_ready:
+            self.ensure_schema()
+        if self.session_stats and not self._stats_table_ready:
+            self.ensure_stats_table()
+        if self.message_hashes and not self._hash_column_ready:
+            self.ensure_hash_column()
+
+    def ensure_schema(self):
+        """
+        Apply pending schema migrations and split off upcoming monthly
+        partitions of messages (if it is partitioned).
+
+        Runs once per processor. A failure (e.g. missing ALTER privilege on
+        an existing database) is reported and ingest goes on with the
+        tables as they are.
+        """
+        from schema import add_message_partitions, migrate
+
+        self._schema_ready = True
+        try:
+            applied = migrate(self.cursor)
+            if applied:
+                print(f"Applied schema migrations: {', '.join(map(str, applied))}")
+            added = add_message_partitions(self.cursor)
+            if added:
+                print(f"Added messages partitions: {', '.join(added)}")
+        except mysql.connector.Error as e:
+            print(f"Warning: could not update the database schema: {e}")
+
+    def ensure_stats_table(self):
+        """
+        Create the session_stats table if it does not exist yet.
+
+        Runs outside any file's transaction, as DDL commits implicitly. If
+        the table cannot be created, session stats are turned off.
+        """
+        from session_stats import SESSION_STATS_TABLE_SQL
+
+        try:
+            self.cursor.execute(SESSION_STATS_TABLE_SQL)
+            self._stats_table_ready = True
+        except mysql.connector.Error as e:
+            print(f"Warning: session stats disabled, cannot create session_stats: {e}")
+            self.session_stats = False
+
+    def ensure_hash_column(self):
+        """
+        Add the content_hash column to messages if it does not exist yet.
+
+        Rows stored before it existed have no hash and are rewritten (with
+        one) the next time their session is ingested. If the column cannot
+        be added, messages are replaced wholesale as before.
+        """
+        from schema import ADD_HASH_COLUMN_SQL, HASH_COLUMN_CHECK_SQL
+
+        try:
+            self.cursor.execute(HASH_COLUMN_CHECK_SQL)
+            self.cursor.fetchall()
+        except mysql.connector.Error:
+            try:
+                self.cursor.execute(ADD_HASH_COLUMN_SQL)
+            except mysql.connector.Error as e:
+                print(f"Warning: message hashes disabled, cannot add messages.content_hash: {e}")
+                self.message_hashes = False
+                return
+        self._hash_column_ready = True
+
+    def reset_message_counts(self):
+        self.messages_written = 0
+        self.messages_skipped = 0
     
     def disconnect(self):
-        """Close database connection."""
+        """Close database connection (returning it to the pool)."""
         if self.cursor:
-            self.cursor.close()
+            try:
+                self.cursor.close()
+            except mysql.connector.Error:
+                pass
+            self.cursor = None
+        if self.conn:
+            try:
+                self.conn.close()
+            except mysql.connector.Error:
+                pass
+            self.conn = None
+
+    def rollback(self):
+        """Roll back the current transaction, ignoring a dead connection."""
         if self.conn:
-            self.conn.close()
+            try:
+                self.conn.rollback()
+            except mysql.connector.Error as e:
+                print(f"Error rolling back transaction: {e}")
 
     def archive_log(self, filepath: str) -> bool:
         """
@@ -58,7 +721,8 @@ class ChatBridgeProcessor:
             zip_filename = f"{filepath.stem}_{timestamp}.zip"
             zip_path = self.archive_folder / zip_filename
 
-            # Create zip archive
+            # Create zip archive (zipfile is only imported when archiving, for startup time)
+            import zipfile
             with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
                 zipf.write(filepath, filepath.name)
 
@@ -73,241 +737,1319 @@ class ChatBridgeProcessor:
             return False
     
     def parse_markdown_file(self, filepath: str) -> Dict:
-        """Parse markdown log file and extract structured data."""
+        """
+        Parse markdown log file and extract structured data in a single streaming pass.
+
+        Returns {'session': dict, 'agents': [dict, dict], 'messages': MessageBatch};
+        the batch also reads as a list of message dicts (see message_batch.py).
+        """
+        if self.mmap_threshold is not None and os.path.getsize(filepath) >= self.mmap_threshold:
+            with self._stage('parse'):
+                data = self.parse_markdown_file_mmap(filepath)
+            if data is not None:
+                return data
+        with open(filepath, 'r', encoding='utf-8') as f:
+            if self.metrics is None:
+                return self.parse_lines(f)
+            with self._stage('parse'):
+                return self.parse_lines(self.metrics.timed(f, 'read', within='parse'))
+
+    def parse_markdown_file_mmap(self, filepath: str) -> Optional[Dict]:
+        """
+        Parse a (very large) transcript from a read-only memory map.
+
+        Message boundaries are located as byte offsets and kept in a
+        MessageBatch over the map, which decodes each body only when it is
+        written, so a multi-MB transcript is never held as one Python string
+        and peak memory stays well below twice the file size.
+
+        Returns None for files with CR line endings, which need the newline
+        translation of the text-mode parser.
+        """
+        with open(filepath, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return None
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if mapping.find(b'\r') != -1:
+            mapping.close()
+            return None
+
+        data, targets = _new_parse_result()
+
+        # Header fields live in the metadata block before the conversation
+        conversation_section = _CONVERSATION_BYTES_RE.search(mapping)
+        metadata_end = conversation_section.start() if conversation_section else len(mapping)
+        self._apply_metadata(targets, mapping[:metadata_end].decode('utf-8'))
+
+        if conversation_section:
+            messages = data['messages'] = MessageBatch(source=mapping)
+            for match in _MESSAGE_BYTES_RE.finditer(mapping, conversation_section.end()):
+                start, end = match.span(3)
+                messages.append_mapped(match.group(1).decode('ascii'),
+                                       match.group(2).decode('ascii'), start, end)
+        else:
+            mapping.close()
+
+        return data
+
+    def parse_lines(self, lines: Iterable[str]) -> Dict:
+        """
+        Parse a transcript from an iterable of lines (e.g. an open file).
+
+        Produces the same dict as parse_markdown_file_regex, but reads each
+        line once and only buffers the message currently being built.
+        """
+        data, targets = _new_parse_result()
+        pending = set(_HEADER_FIELDS) | set(_MULTILINE_FIELDS)
+        active_multiline = []
+        scanner = _MessageScanner(data['messages'])
+        # 0: metadata block, 1: just saw the "## Conversation" heading, 2: in conversation
+        conversation_state = 0
+
+        for line in lines:
+            has_newline = line.endswith('\n')
+            if has_newline:
+                line = line[:-1]
+
+            if conversation_state == 2:
+                scanner.feed(line, has_newline)
+                continue
+            if conversation_state == 1 and line == '' and has_newline:
+                # The metadata block ended right before the heading
+                conversation_state = 2
+                for target, key, collector in active_multiline:
+                    collector.finish(_CONVERSATION_HEADING)
+                    targets[target][key] = collector.value
+                active_multiline = []
+                continue
+            conversation_state = 1 if line.endswith(_CONVERSATION_HEADING) and has_newline else 0
+
+            if active_multiline:
+                for entry in active_multiline[:]:
+                    target, key, collector = entry
+                    if collector.feed(line):
+                        targets[target][key] = collector.value
+                        active_multiline.remove(entry)
+
+            if not pending or '**' not in line:
+                continue
+            for match in _FIELD_PAIR_RE.finditer(line):
+                name = match.group(1)
+                if name not in pending:
+                    continue
+                pending.discard(name)
+                if name in _MULTILINE_FIELDS:
+                    target, key, stop_on_blank, tail = _MULTILINE_FIELDS[name]
+                    collector = _MultilineField(line[match.end():], stop_on_blank)
+                    active_multiline.append((target, key, collector))
+                else:
+                    target, key = _HEADER_FIELDS[name][:2]
+                    targets[target][key] = _header_value(name, line[match.end():])
+
+        # No conversation section: the metadata block runs to the end of the file
+        for target, key, collector in active_multiline:
+            targets[target][key] = collector.value
+        scanner.close()
+        return data
+
+    def parse_markdown_file_regex(self, filepath: str) -> Dict:
+        """Parse markdown log file with whole-document regex searches (reference parser)."""
         with open(filepath, 'r', encoding='utf-8') as f:
             content = f.read()
-        
-        data = {
-            'session': {},
-            'agents': [],
-            'messages': []
-        }
-        
-        # Extract session ID and started time
-        session_id_match = re.search(r'\*\*Session ID:\*\* (conv_\d+_\d+)', content)
-        started_match = re.search(r'\*\*Started:\*\* ([\d-]+ [\d:]+)', content)
-        starter_match = re.search(r'\*\*Conversation Starter:\*\* (.+?)(?=\n\n|\n###)', content, re.DOTALL)
-        
-        data['session']['session_id'] = session_id_match.group(1) if session_id_match else None
-        data['session']['started_at'] = started_match.group(1) if started_match else None
-        data['session']['conversation_starter'] = starter_match.group(1).strip() if starter_match else None
-        
-        # Extract session settings
-        max_rounds_match = re.search(r'\*\*Max Rounds:\*\* (\d+)', content)
-        memory_rounds_match = re.search(r'\*\*Memory Rounds:\*\* (\d+)', content)
-        stop_word_match = re.search(r'\*\*Stop Word Detection:\*\* (\w+)', content)
-        stop_words_match = re.search(r'\*\*Stop Words:\*\* (.+)', content)
-        
-        data['session']['max_rounds'] = int(max_rounds_match.group(1)) if max_rounds_match else None
-        data['session']['memory_rounds'] = int(memory_rounds_match.group(1)) if memory_rounds_match else None
-        data['session']['stop_word_detection'] = stop_word_match.group(1) == 'Enabled' if stop_word_match else False
-        data['session']['stop_words'] = stop_words_match.group(1) if stop_words_match else None
-        
-        # Extract Agent A configuration
-        agent_a = {
-            'label': 'A',
-            'provider': self._extract_field(content, 'Agent A Provider'),
-            'model': self._extract_field(content, 'Agent A Model'),
-            'temperature': self._extract_float(content, 'Agent A Temperature'),
-            'persona': self._extract_field(content, 'Agent A Persona'),
-            'system_prompt': self._extract_multiline_field(content, 'Agent A System Prompt')
-        }
-        data['agents'].append(agent_a)
-        
-        # Extract Agent B configuration
-        agent_b = {
-            'label': 'B',
-            'provider': self._extract_field(content, 'Agent B Provider'),
-            'model': self._extract_field(content, 'Agent B Model'),
-            'temperature': self._extract_float(content, 'Agent B Temperature'),
-            'persona': self._extract_field(content, 'Agent B Persona'),
-            'system_prompt': self._extract_multiline_field(content, 'Agent B System Prompt')
-        }
-        data['agents'].append(agent_b)
-        
+
+        data, targets = _new_parse_result()
+
+        # Header fields live in the metadata block before the conversation
+        conversation_section = _CONVERSATION_RE.search(content)
+        metadata = content[:conversation_section.start()] if conversation_section else content
+        for name, raw in self._scan_metadata(metadata).items():
+            if name in _MULTILINE_FIELDS:
+                target, key = _MULTILINE_FIELDS[name][:2]
+                targets[target][key] = raw.strip()
+            elif name in _HEADER_FIELDS:
+                target, key = _HEADER_FIELDS[name][:2]
+                targets[target][key] = _header_value(name, raw)
+
         # Extract conversation messages
-        conversation_section = re.search(r'## Conversation\n\n(.+)', content, re.DOTALL)
         if conversation_section:
-            messages_text = conversation_section.group(1)
-            # Updated pattern to handle optional <sub> tag for provider/model info
-            message_pattern = r'### (Human|Agent A|Agent B) \(([\d-]+ [\d:]+)\)\n(?:<sub[^>]*>.*?</sub>\n)?\n?(.+?)(?=\n### |\Z)'
-
-            for i, match in enumerate(re.finditer(message_pattern, messages_text, re.DOTALL)):
+            messages_text = content[conversation_section.end():]
+            for match in _MESSAGE_RE.finditer(messages_text):
                 speaker = match.group(1)
                 timestamp = match.group(2)
                 message_content = match.group(3).strip()
 
                 # Skip the <sub> tag content from the message body if present
-                message_content = re.sub(r'^<sub[^>]*>.*?</sub>\s*', '', message_content, flags=re.DOTALL)
-
-                data['messages'].append({
-                    'speaker': speaker,
-                    'timestamp': timestamp,
-                    'content': message_content,
-                    'order': i
-                })
-        
+                message_content = _SUB_TAG_RE.sub('', message_content)
+
+                data['messages'].append(speaker, timestamp, message_content)
+
         return data
-    
-    def _extract_field(self, content: str, field_name: str) -> Optional[str]:
-        """Extract single-line field value."""
-        match = re.search(rf'\*\*{field_name}:\*\* (.+)', content)
-        return match.group(1).strip() if match else None
-    
-    def _extract_float(self, content: str, field_name: str) -> Optional[float]:
-        """Extract float field value."""
-        match = re.search(rf'\*\*{field_name}:\*\* ([\d.]+)', content)
-        return float(match.group(1)) if match else None
-    
-    def _extract_multiline_field(self, content: str, field_name: str) -> Optional[str]:
-        """Extract multi-line field value."""
-        match = re.search(rf'\*\*{field_name}:\*\* (.+?)(?=\n\n\*\*|\n###)', content, re.DOTALL)
-        return match.group(1).strip() if match else None
+
+    def parse_markdown_file_resumable(self, filepath: str) -> Optional[Tuple[Dict, Optional[int], int]]:
+        """
+        Parse a transcript and note where to resume once the file grows.
+
+        Returns:
+            (data, resume_offset, resume_order) as for parse_messages_from;
+            resume_offset is None while the file has no conversation section
+            yet. None for files with CR line endings.
+        """
+        data, targets = _new_parse_result()
+        with open(filepath, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return data, None, 0
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+                if mapping.find(b'\r') != -1:
+                    return None
+                conversation_section = _CONVERSATION_BYTES_RE.search(mapping)
+                metadata_end = conversation_section.start() if conversation_section else len(mapping)
+                self._apply_metadata(targets, mapping[:metadata_end].decode('utf-8'))
+        if not conversation_section:
+            return data, None, 0
+
+        parsed = self.parse_messages_from(filepath, conversation_section.end())
+        if parsed is None:
+            return None
+        data['messages'], resume_offset, resume_order = parsed
+        return data, resume_offset, resume_order
+
+    def parse_messages_from(self, filepath: str, offset: int,
+                            first_order: int = 0) -> Optional[Tuple[MessageBatch, int, int]]:
+        """
+        Parse the conversation of a transcript from a byte offset onwards.
+
+        offset must be the start of the conversation or of a message header
+        line; first_order is the order of the first message found there.
+        Used by --watch so a growing transcript is never parsed from the top
+        again.
+
+        Returns:
+            (messages, resume_offset, resume_order): the next parse of this
+            file should start at resume_offset (the header of its last,
+            possibly still incomplete message) with first_order=resume_order.
+            None if the file has CR line endings.
+        """
+        messages = MessageBatch(first_order)
+        scanner = _MessageScanner(messages)
+        resume_offset, resume_count = offset, 0
+        with open(filepath, 'rb') as f:
+            f.seek(offset)
+            position = offset
+            for raw in f:
+                if b'\r' in raw:
+                    return None
+                has_newline = raw.endswith(b'\n')
+                # An unterminated last line may end inside a character that is still being written
+                line = raw[:-1].decode('utf-8') if has_newline else raw.decode('utf-8', 'replace')
+                scanner.feed(line, has_newline)
+                if scanner.state == scanner.AFTER_HEADER:
+                    resume_offset, resume_count = position, len(messages)
+                position += len(raw)
+        scanner.close()
+        return messages, resume_offset, first_order + resume_count
+
+    def _apply_metadata(self, targets: Dict[str, Dict], metadata: str):
+        """Store the header fields of a metadata block into the parse result."""
+        for name, raw in self._scan_metadata(metadata).items():
+            if name in _MULTILINE_FIELDS:
+                target, key = _MULTILINE_FIELDS[name][:2]
+                targets[target][key] = raw.strip()
+            elif name in _HEADER_FIELDS:
+                target, key = _HEADER_FIELDS[name][:2]
+                targets[target][key] = _header_value(name, raw)
+
+    def _scan_metadata(self, metadata: str) -> Dict[str, str]:
+        """
+        Capture every ``**Field:** value`` pair of the metadata block in one pass.
+
+        Returns the raw text of the first occurrence of each field: the rest of
+        the line for single-line fields, the full tail for multi-line ones.
+        """
+        fields = {}
+        for match in _FIELD_PAIR_RE.finditer(metadata):
+            name = match.group(1)
+            if name in fields:
+                continue
+            if name in _MULTILINE_FIELDS:
+                fields[name] = _MULTILINE_FIELDS[name][3].match(metadata, match.end()).group()
+            else:
+                end = metadata.find('\n', match.end())
+                fields[name] = metadata[match.end():end if end != -1 else len(metadata)]
+        return fields
     
     def insert_session(self, session_data: Dict) -> bool:
         """Insert session data into database."""
-        query = """
-        INSERT INTO sessions 
-        (session_id, started_at, conversation_starter, max_rounds, 
-         memory_rounds, stop_word_detection, stop_words)
-        VALUES (%s, %s, %s, %s, %s, %s, %s)
-        ON DUPLICATE KEY UPDATE
-        started_at = VALUES(started_at),
-        conversation_starter = VALUES(conversation_starter)
-        """
-        
         try:
-            self.cursor.execute(query, (
-                session_data['session_id'],
-                session_data['started_at'],
-                session_data['conversation_starter'],
-                session_data['max_rounds'],
-                session_data['memory_rounds'],
-                session_data['stop_word_detection'],
-                session_data['stop_words']
-            ))
+            with self._stage('insert_session'):
+                self.cursor.execute(_SESSION_UPSERT_SQL, _session_row(session_data))
+            self._count_rows('sessions', 1)
             return True
         except mysql.connector.Error as e:
+            self.last_error = e
             print(f"Error inserting session: {e}")
             return False
     
     def insert_agents(self, session_id: str, agents: List[Dict]) -> bool:
         """Insert agent configurations."""
-        query = """
-        INSERT INTO agents 
-        (session_id, agent_label, provider, model, temperature, persona, system_prompt)
-        VALUES (%s, %s, %s, %s, %s, %s, %s)
-        ON DUPLICATE KEY UPDATE
-        provider = VALUES(provider),
-        model = VALUES(model),
-        temperature = VALUES(temperature),
-        persona = VALUES(persona),
-        system_prompt = VALUES(system_prompt)
-        """
-        
         try:
-            for agent in agents:
-                self.cursor.execute(query, (
-                    session_id,
-                    agent['label'],
-                    agent['provider'],
-                    agent['model'],
-                    agent['temperature'],
-                    agent['persona'],
-                    agent['system_prompt']
-                ))
+            with self._stage('insert_agents'):
+                self._execute_batched(_AGENT_UPSERT_SQL, _agent_rows(session_id, agents))
+            self._count_rows('agents', len(agents))
             return True
         except mysql.connector.Error as e:
+            self.last_error = e
             print(f"Error inserting agents: {e}")
             return False
     
-    def insert_messages(self, session_id: str, messages: List[Dict]) -> bool:
-        """Insert conversation messages."""
-        query = """
-        INSERT INTO messages 
-        (session_id, speaker, timestamp, content, message_order)
-        VALUES (%s, %s, %s, %s, %s)
+    def insert_messages(self, session_id: str, messages: List[Dict],
+                        indexes: Optional[List[int]] = None,
+                        hashes: Optional[List[str]] = None) -> bool:
+        """
+        Insert conversation messages.
+
+        indexes: Only insert these messages of the batch (default: all)
+        hashes: The batch's precomputed hashes (computed here if needed)
         """
-        
         try:
-            for msg in messages:
-                self.cursor.execute(query, (
-                    session_id,
-                    msg['speaker'],
-                    msg['timestamp'],
-                    msg['content'],
-                    msg['order']
-                ))
+            with self._stage('insert_messages'):
+                if self.message_hashes:
+                    batch = MessageBatch.coerce(messages)
+                    rows = batch.hashed_rows(session_id, hashes or batch.hashes(), indexes)
+                    self._execute_batched(_HASHED_MESSAGE_INSERT_SQL, rows)
+                else:
+                    self._execute_batched(_MESSAGE_INSERT_SQL, _message_rows(session_id, messages))
+            written = len(messages) if indexes is None else len(indexes)
+            self.messages_written += written
+            self._count_rows('messages', written)
             return True
         except mysql.connector.Error as e:
+            self.last_error = e
             print(f"Error inserting messages: {e}")
             return False
+
+    def replace_messages(self, session_id: str, messages: List[Dict], first_message: int = 0) -> bool:
+        """
+        Make the stored messages of a session from first_message on match
+        messages, which start at that order.
+
+        With message hashes, the stored hashes are fetched in one query and
+        only new or changed messages are written; stored messages past the
+        end of the batch are deleted. Otherwise all of them are deleted and
+        reinserted.
+        """
+        batch = MessageBatch.coerce(messages)
+        if not self.message_hashes:
+            return (self.delete_messages(session_id, first_message)
+                    and self.insert_messages(session_id, batch))
+        try:
+            with self._stage('compare_messages'):
+                self.cursor.execute(_MESSAGE_HASHES_SQL, (session_id, first_message))
+                stored = _stored_hashes(self.cursor.fetchall())
+                hashes = batch.hashes()
+                write, stale = _message_changes(first_message, hashes, stored)
+            with self._stage('delete_messages'):
+                for statement, params in _delete_orders_statements(session_id, stale):
+                    self.cursor.execute(statement, params)
+        except mysql.connector.Error as e:
+            self.last_error = e
+            print(f"Error comparing stored messages: {e}")
+            return False
+        skipped = len(batch) - len(write)
+        self.messages_skipped += skipped
+        if self.metrics is not None:
+            self.metrics.add_skipped('messages', skipped)
+        return self.insert_messages(session_id, batch, write, hashes) if write else True
     
-    def process_file(self, filepath: str) -> bool:
-        """Process a single markdown file and insert into database."""
-        print(f"Processing: {filepath}")
+    def write_session_stats(self, session_id: str, stats: 'SessionStats') -> bool:
+        """Replace the session_stats rows of a session (in the current transaction)."""
+        from session_stats import stats_statements
 
         try:
-            # Parse the file
-            data = self.parse_markdown_file(filepath)
+            with self._stage('session_stats'):
+                statements = stats_statements(session_id, stats)
+                for statement, params in statements:
+                    self.cursor.execute(statement, params)
+            self._count_rows('session_stats', len(statements) - 1)
+            return True
+        except mysql.connector.Error as e:
+            self.last_error = e
+            print(f"Error writing session stats: {e}")
+            return False
 
-            # Connect to database
-            self.connect()
+    def _execute_batched(self, query: str, rows: Iterable[tuple]):
+        """Execute a multi-row INSERT as statements that fit max_packet_bytes."""
+        for statement, params in _batch_statements(query, rows, self.max_packet_bytes):
+            self.cursor.execute(statement, params)
 
-            # Insert session
-            if not self.insert_session(data['session']):
-                return False
+    def _stage(self, name: str):
+        """Time a block as an ingest stage of the current file (if metrics are on)."""
+        return self.metrics.stage(name) if self.metrics is not None else nullcontext()
 
-            # Insert agents
-            if not self.insert_agents(data['session']['session_id'], data['agents']):
-                return False
+    def _count_rows(self, table: str, count: int):
+        if self.metrics is not None:
+            self.metrics.add_rows(table, count)
 
-#             # Insert messages
-#             if not self.insert_messages(data['session']['session_id'], data['messages']):
-#                 return False
-# 
-            # Commit transaction
-            self.conn.commit()
+    def process_file(self, filepath: str) -> bool:
+        """
+        Process a single markdown file and insert into database.
+
+        Each file is committed (or rolled back) as its own transaction. When
+        called from process_directory the connection is shared across files;
+        otherwise one is opened and closed just for this file.
+        """
+        return self.ingest_file(filepath) is not None
+
+    def ingest_file(self, filepath: str, first_message: int = 0,
+                    replace_messages: bool = True,
+                    load: Optional[Callable[[], Dict]] = None) -> Optional[Dict]:
+        """
+        Parse a file and write it to the database.
+
+        Args:
+            filepath: Path to the transcript
+            first_message: Only messages with this order or later are inserted
+                (used for files that were appended to since the last run)
+            replace_messages: Replace the session's stored messages from
+                first_message on, so re-ingesting a file never duplicates
+                its messages (with message hashes, unchanged ones are kept)
+            load: Returns the already-parsed data (e.g. a worker's future
+                result) instead of parsing the file here
+
+        Returns:
+            The parsed data if successful, None otherwise
+        """
+        print(f"Processing: {filepath}")
+        owns_connection = self.conn is None
+        owns_record = self.metrics is not None and not self.metrics.recording
+        if owns_record:
+            self.metrics.begin_file(filepath)
+        stored = False
+
+        try:
+            # Parse the file (with workers, this waits for the worker's result)
+            if load:
+                with self._stage('parse'):
+                    data = load()
+            else:
+                data = self.parse_markdown_file(filepath)
+
+            if not self._store_with_retry(
+                    filepath, lambda: self.store_parsed(data, first_message, replace_messages)):
+                return None
+
+            stored = True
             print(f"Successfully processed: {filepath}")
 
             # Archive the log file after successful processing
            # if not self.archive_log(filepath):
             #    print(f"Warning: Failed to archive {filepath}")
 
-            return True
+            return data
 
         except Exception as e:
             print(f"Error processing file {filepath}: {e}")
-            if self.conn:
-                self.conn.rollback()
+            self.rollback()
+            return None
+        finally:
+            if owns_record:
+                self.metrics.end_file(stored)
+            if owns_connection:
+                self.disconnect()
+
+    def _store_with_retry(self, filepath: str, store: Callable[[], bool]) -> bool:
+        """
+        Run one write transaction, replaying it once if the server went away.
+
+        Connects first (reusing the open connection if there is one) and rolls
+        back if the transaction fails. The connection is only checked, and
+        re-established, after a write failed with a connection error.
+        """
+        self.connect()
+        self.last_error = None
+        if store():
+            return True
+        # Client-side losses (e.g. 2006 server gone away) surface as InterfaceError
+        lost = isinstance(self.last_error, (mysql.connector.errors.OperationalError,
+                                            mysql.connector.errors.InterfaceError))
+        if not lost or self.conn.is_connected():
+            self.rollback()
+            return False
+
+        # The server went away mid-file: reconnect and replay it once
+        print(f"Connection lost while processing {filepath}, reconnecting")
+        self.reconnect()
+        if store():
+            return True
+        self.rollback()
+        return False
+
+    def store_parsed(self, data: Dict, first_message: int = 0,
+                     replace_messages: bool = True) -> bool:
+        """Write one parsed transcript and commit it as a single transaction."""
+        session_id = data['session']['session_id']
+
+        # Insert session
+        if not self.insert_session(data['session']):
+            return False
+
+        # Insert agents
+        if not self.insert_agents(session_id, data['agents']):
+            return False
+
+        # Insert messages
+        messages = data['messages'][first_message:]
+        if replace_messages:
+            if not self.replace_messages(session_id, messages, first_message):
+                return False
+        elif not self.insert_messages(session_id, messages):
+            return False
+
+        # The whole transcript is parsed, so its rollups are recomputed in full
+        if self.session_stats:
+            from session_stats import SessionStats
+
+            if not self.write_session_stats(session_id, SessionStats.from_data(data)):
+                return False
+
+        return self.commit()
+
+    def store_messages(self, session_id: str, messages: MessageBatch, first_message: int,
+                       stats: Optional['SessionStats'] = None) -> bool:
+        """
+        Replace a session's messages from first_message on and commit.
+
+        messages must start at order first_message; the session and agent
+        rows are left alone. stats, if given, are the session's updated
+        rollups and are written in the same transaction.
+        """
+        if not self.replace_messages(session_id, messages, first_message):
+            return False
+        if stats is not None and not self.write_session_stats(session_id, stats):
+            return False
+        return self.commit()
+
+    def commit(self) -> bool:
+        """Commit the current transaction."""
+        try:
+            with self._stage('commit'):
+                self.conn.commit()
+        except mysql.connector.Error as e:
+            self.last_error = e
+            print(f"Error committing transaction: {e}")
+            return False
+        return True
+
+    def delete_messages(self, session_id: str, first_message: int = 0) -> bool:
+        """Delete the stored messages of a session (from order first_message on)."""
+        try:
+            with self._stage('delete_messages'):
+                if first_message:
+                    self.cursor.execute(_DELETE_MESSAGES_FROM_SQL, (session_id, first_message))
+                else:
+                    self.cursor.execute(_DELETE_MESSAGES_SQL, (session_id,))
+            return True
+        except mysql.connector.Error as e:
+            self.last_error = e
+            print(f"Error deleting messages: {e}")
             return False
+
+    def load_manifest(self, directory: str) -> Dict[str, Dict]:
+        """Load the ingest manifest of a directory (empty if there is none yet)."""
+        manifest_path = Path(directory) / MANIFEST_FILENAME
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"Warning: ignoring unreadable manifest {manifest_path}: {e}")
+            return {}
+
+    def save_manifest(self, directory: str, manifest: Dict[str, Dict]):
+        """Atomically write the ingest manifest of a directory."""
+        manifest_path = Path(directory) / MANIFEST_FILENAME
+        tmp_path = manifest_path.with_name(manifest_path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, manifest_path)
+
+    def load_session_index(self, directory: str) -> Dict[str, Dict]:
+        """Load the session index of a directory, keyed by filename (empty if there is none yet)."""
+        index_path = Path(directory) / SESSION_INDEX_FILENAME
+        index = {}
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        index[record['filename']] = record
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Warning: ignoring unreadable session index {index_path}: {e}")
+            return {}
+        return index
+
+    def save_session_index(self, directory: str, index: Dict[str, Dict]):
+        """
+        Atomically write the session index of a directory as JSON lines.
+
+        Lines are sorted newest session first (then by filename), the order
+        the archive viewer shows them in, so it can list them as read.
+        """
+        records = sorted(index.values(), key=lambda record: record['filename'])
+        records.sort(key=lambda record: record['started'] or '', reverse=True)
+        index_path = Path(directory) / SESSION_INDEX_FILENAME
+        tmp_path = index_path.with_name(index_path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+                f.write('\n')
+        os.replace(tmp_path, index_path)
+
+    def open_search_index(self, directory: str) -> Optional['SearchIndex']:
+        """Open the full-text search index of a directory (None if disabled or unavailable)."""
+        if not self.full_text_search:
+            return None
+        from search_index import SEARCH_INDEX_FILENAME, SearchIndex
+
+        try:
+            return SearchIndex(Path(directory) / SEARCH_INDEX_FILENAME)
+        except sqlite3.Error as e:
+            print(f"Warning: full-text search index unavailable: {e}")
+            return None
+
+    def index_ingested(self, filepath: Path, size: int, data: Dict, index: Dict[str, Dict],
+                       search: Optional['SearchIndex'], first_message: int = 0):
+        """Update the session index record and full-text index of an ingested file."""
+        index[filepath.name] = _index_record(filepath.name, size, data)
+        if search is not None:
+            try:
+                search.add_session(filepath.name, size, data, first_message)
+            except sqlite3.Error as e:
+                # The file stays unindexed and is picked up by refresh_indexes
+                print(f"Warning: could not update search index for {filepath}: {e}")
+
+    def refresh_indexes(self, directory: str, pattern: str, manifest: Dict[str, Dict],
+                        index: Dict[str, Dict], search: Optional['SearchIndex'] = None):
+        """
+        Bring the session and search indexes in line with the transcripts on disk.
+
+        Session index records of deleted files are dropped (the search index
+        keeps their messages, as the database does). Duplicates reuse the
+        record of the transcript they duplicate; any other file missing from
+        either index or indexed at another size (e.g. one the database
+        rejected) is parsed for the indexes only. Saves the session index.
+        """
+        files = {f.name: f for f in Path(directory).glob(pattern) if f.name not in _SKIPPED_FILENAMES}
+        for name in [name for name in index if name not in files]:
+            del index[name]
+        searched = search.indexed_files() if search is not None else {}
+
+        duplicates = []
+        for name, filepath in files.items():
+            try:
+                size = filepath.stat().st_size
+            except FileNotFoundError:
+                index.pop(name, None)
+                continue
+            original = manifest.get(name, {}).get('duplicate_of')
+            if original:
+                duplicates.append((name, size, original))
+                continue
+            stale_record = name not in index or index[name]['size'] != size
+            stale_search = search is not None and searched.get(name) != size
+            if not (stale_record or stale_search):
+                continue
+            try:
+                data = self.parse_markdown_file(str(filepath))
+            except (OSError, ValueError) as e:
+                print(f"Warning: could not index {filepath}: {e}")
+                continue
+            self.index_ingested(filepath, size, data, index, search if stale_search else None)
+
+        for name, size, original in duplicates:
+            if original in index:
+                index[name] = dict(index[original], filename=name, size=size)
+
+        self.save_session_index(directory, index)
+
+    def check_manifest(self, entry: Optional[Dict], filepath: Path) -> Tuple[str, Dict]:
+        """
+        Compare a file against its manifest entry.
+
+        Size and mtime are checked first, so an unchanged file is never opened.
+        Otherwise the file is hashed once; the digest of its first entry['size']
+        bytes tells whether the old content is still intact (an append).
+
+        Returns:
+            (status, state) where status is 'new', 'unchanged', 'appended' or
+            'changed', and state holds the file's current size/mtime/sha256
+        """
+        stat = filepath.stat()
+        state = {'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+        if entry is None:
+            state['sha256'] = self._hash_file(filepath)[0]
+            return 'new', state
+        if entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns:
+            state['sha256'] = entry['sha256']
+            return 'unchanged', state
+
+        prefix_size = entry['size'] if entry['size'] < stat.st_size else None
+        digest, prefix_digest = self._hash_file(filepath, prefix_size)
+        state['sha256'] = digest
+        if digest == entry['sha256']:
+            return 'unchanged', state
+        if prefix_digest == entry['sha256']:
+            return 'appended', state
+        return 'changed', state
+
+    def _hash_file(self, filepath: Path, prefix_size: Optional[int] = None) -> Tuple[str, Optional[str]]:
+        """Return the SHA-256 of a file and, optionally, of its first prefix_size bytes."""
+        sha = hashlib.sha256()
+        prefix_digest = None
+        remaining = prefix_size
+        with open(filepath, 'rb') as f:
+            while True:
+                chunk = f.read(1024 * 1024)
+                if not chunk:
+                    break
+                if remaining is not None and len(chunk) >= remaining:
+                    sha.update(chunk[:remaining])
+                    prefix_digest = sha.hexdigest()
+                    sha.update(chunk[remaining:])
+                    remaining = None
+                else:
+                    sha.update(chunk)
+                    if remaining is not None:
+                        remaining -= len(chunk)
+        return sha.hexdigest(), prefix_digest
+    
+    def read_session_id(self, filepath: Path) -> Optional[str]:
+        """Read the Session ID header from the first few hundred bytes of a transcript."""
+        with open(filepath, 'rb') as f:
+            match = _SESSION_ID_BYTES_RE.search(f.read(_HEADER_PEEK_BYTES))
+        return match.group(1).decode('ascii') if match else None
+
+    def _fingerprint(self, filepath: Path, size: int) -> str:
+        """Cheap content fingerprint: hash of the first and last 64 KB."""
+        sha = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            sha.update(f.read(_FINGERPRINT_BYTES))
+            if size > _FINGERPRINT_BYTES:
+                f.seek(max(_FINGERPRINT_BYTES, size - _FINGERPRINT_BYTES))
+                sha.update(f.read())
+        return sha.hexdigest()
+
+    def find_duplicates(self, pending: List[Tuple], manifest: Dict[str, Dict]) -> Tuple[List[Tuple], List[Tuple]]:
+        """
+        Pick one representative per group of duplicate transcripts.
+
+        Files are grouped first by size plus content fingerprint (exact copies),
+        then by Session ID header. Within a session the largest file wins, as it
+        holds the most complete conversation; ties go to the shortest name, so
+        "x.md" is kept over "x (1).md". A file is also a duplicate if an already
+        ingested, unchanged file of the same session is at least as large.
+
+        Returns:
+            (kept, duplicates): kept holds the pending (filepath, status, state)
+            tuples to ingest; duplicates holds (filepath, state, session_id,
+            representative name) tuples
+        """
+        sizes = {}
+        for item in pending:
+            filepath, status, state = item
+            size = state['size'] if state else filepath.stat().st_size
+            sizes.setdefault(size, []).append(item)
+
+        # Exact copies: same size and same content
+        content_groups = []
+        for size, items in sizes.items():
+            if len(items) == 1:
+                content_groups.append((size, items))
+                continue
+            by_content = {}
+            for item in items:
+                filepath, status, state = item
+                key = state.get('sha256') if state else None
+                by_content.setdefault(key or self._fingerprint(filepath, size), []).append(item)
+            content_groups.extend((size, group) for group in by_content.values())
+
+        # Same session: group the representatives of each content group by Session ID
+        sessions = {}
+        for size, items in content_groups:
+            items.sort(key=lambda item: (len(item[0].name), item[0].name))
+            sessions.setdefault(self.read_session_id(items[0][0]), []).append((size, items))
+
+        ingested = {}
+        pending_names = {item[0].name for item in pending}
+        for name, entry in manifest.items():
+            if name not in pending_names and entry.get('session_id'):
+                ingested[entry['session_id']] = max(ingested.get(entry['session_id'], (-1, name)),
+                                                    (entry['size'], name))
+
+        kept = []
+        duplicates = []
+        for session_id, groups in sessions.items():
+            if session_id is None:
+                # Without a Session ID only byte-identical copies are merged
+                for size, items in groups:
+                    kept.append(items[0])
+                    duplicates.extend((filepath, state, None, items[0][0].name)
+                                      for filepath, status, state in items[1:])
+                continue
+
+            groups.sort(key=lambda group: (-group[0], len(group[1][0][0].name), group[1][0][0].name))
+            if session_id in ingested and ingested[session_id][0] >= groups[0][0]:
+                representative = ingested[session_id][1]
+                losers = [items for size, items in groups]
+            else:
+                winner = groups[0][1][0]
+                representative = winner[0].name
+                kept.append(winner)
+                losers = [groups[0][1][1:]] + [items for size, items in groups[1:]]
+            for items in losers:
+                duplicates.extend((filepath, state, session_id, representative)
+                                  for filepath, status, state in items)
+
+        # Keep the original file order for ingest
+        order = {item[0]: index for index, item in enumerate(pending)}
+        kept.sort(key=lambda item: order[item[0]])
+        return kept, duplicates
+
+    def process_directory(self, directory: str, pattern: str = "*.md", incremental: bool = True,
+                          workers: int = 1):
+        """
+        Process all markdown files in a directory.
+
+        With incremental=True (the default) a manifest of size, mtime and content
+        hash per file is kept in the directory. Unchanged files are skipped and
+        files that were only appended to get just their new messages inserted.
+
+        With workers > 1, files are parsed in a process pool while a single
+        writer thread stores the results in file order.
+        """
+        manifest, pending, duplicates = self.plan_directory(directory, pattern, incremental)
+        index = self.load_session_index(directory)
+        search = self.open_search_index(directory)
+        self.reset_message_counts()
+        if self.progress is not None:
+            self.progress.start(directory, len(pending))
+        
+        if pending:
+            try:
+                self.connect()
+            except mysql.connector.Error as e:
+                print(f"Error connecting to database: {e}")
+
+        try:
+            if workers > 1 and len(pending) > 1:
+                success_count = self._ingest_parallel(pending, manifest, incremental, workers,
+                                                      index, search)
+            else:
+                items = ((filepath, status, state, None) for filepath, status, state in pending)
+                success_count = self._ingest_pending(items, manifest, incremental, index, search)
         finally:
             self.disconnect()
-    
-    def process_directory(self, directory: str, pattern: str = "*.md"):
-        """Process all markdown files in a directory."""
+            if incremental:
+                self.save_manifest(directory, manifest)
+            self.refresh_indexes(directory, pattern, manifest, index, search)
+            if search is not None:
+                search.close()
+            if self.bundle_archive is not None:
+                self.bundle_archive.flush()
+        
+        print(f"\nProcessed {success_count}/{len(pending)} files successfully")
+        if duplicates:
+            print(f"Skipped {len(duplicates)} duplicate files")
+        if self.message_hashes and pending:
+            print(f"Messages: {self.messages_written} written, {self.messages_skipped} unchanged skipped")
+        self.report_metrics()
+
+    def report_metrics(self):
+        """Print the metrics summary and write the configured metric files."""
+        if self.metrics is None:
+            return
+        print(self.metrics.summary())
+        self._write_metrics()
+
+    def _write_metrics(self):
+        if self.metrics is None:
+            return
+        try:
+            self.metrics.write()
+        except OSError as e:
+            print(f"Warning: could not write ingest metrics: {e}")
+
+    def plan_directory(self, directory: str, pattern: str = "*.md",
+                       incremental: bool = True) -> Tuple[Dict[str, Dict], List[Tuple], List[Tuple]]:
+        """
+        Work out which files of a directory need ingesting.
+
+        Skips unchanged files (per the manifest) and duplicate copies, and
+        records the duplicates in the manifest.
+
+        Returns:
+            (manifest, pending, duplicates) where pending holds
+            (filepath, status, state) tuples for record_ingest/ingest_file
+        """
         path = Path(directory)
         files = list(path.glob(pattern))
     
         # Filter out logging.md and index.md
-        files = [f for f in files if f.name not in ['logging.md', 'index.md']]
+        files = [f for f in files if f.name not in _SKIPPED_FILENAMES]
         
         print(f"Found {len(files)} files to process")
-        
-        success_count = 0
+
+        manifest = self.load_manifest(directory) if incremental else {}
+        pending = []
+        skipped_count = 0
         for filepath in files:
-            if self.process_file(str(filepath)):
-                success_count += 1
-        
-        print(f"\nProcessed {success_count}/{len(files)} files successfully")
+            entry = manifest.get(filepath.name)
+            status, state = self.check_manifest(entry, filepath) if incremental else ('new', None)
+            if status == 'unchanged':
+                entry.update(state)
+                skipped_count += 1
+            else:
+                if status == 'appended' and entry.get('duplicate_of'):
+                    # Never ingested itself, so there is no message count to resume from
+                    status = 'changed'
+                pending.append((filepath, status, state))
+
+        if skipped_count:
+            print(f"Skipped {skipped_count} unchanged files")
+
+        pending, duplicates = self.find_duplicates(pending, manifest)
+        for filepath, state, session_id, original in duplicates:
+            print(f"Skipping duplicate: {filepath.name} (same session as {original})")
+            if incremental:
+                state.update(session_id=session_id, messages=None, duplicate_of=original)
+                manifest[filepath.name] = state
+        return manifest, pending, duplicates
+
+    def appended_from(self, entry: Dict) -> int:
+        """
+        First message to rewrite for a file that was appended to.
+
+        The last stored message is rewritten too: it may have been caught
+        while still being written.
+        """
+        return max(entry['messages'] - 1, 0)
+
+    def record_ingest(self, manifest: Dict[str, Dict], filepath: Path, state: Dict, data: Dict):
+        """Store a successfully ingested file's state in the manifest."""
+        state['session_id'] = data['session']['session_id']
+        state['messages'] = len(data['messages'])
+        manifest[filepath.name] = state
+
+    def _ingest_pending(self, items: Iterable[Tuple], manifest: Dict[str, Dict],
+                        incremental: bool, index: Dict[str, Dict],
+                        search: Optional['SearchIndex']) -> int:
+        """
+        Write (filepath, status, state, load) items in order; return the success count.
+
+        The session and search indexes of every ingested file are updated as well.
+        """
+        success_count = 0
+        for filepath, status, state, load in items:
+            first_message = 0
+            if status == 'appended':
+                first_message = self.appended_from(manifest[filepath.name])
+            if self.progress is not None:
+                self.progress.file_started(filepath)
+            data = self.ingest_file(str(filepath), first_message, load=load)
+            if data is None:
+                if self.progress is not None:
+                    self.progress.file_finished(filepath, False)
+                continue
+            success_count += 1
+            size = state['size'] if state else filepath.stat().st_size
+            if self.progress is not None:
+                self.progress.file_finished(filepath, True, size)
+            self.index_ingested(filepath, size, data, index, search, first_message)
+            if incremental:
+                self.record_ingest(manifest, filepath, state, data)
+            if self.bundle_archive is not None:
+                self.bundle_archive.submit(filepath, data['session']['session_id'])
+        return success_count
+
+    def _ingest_parallel(self, pending: List[Tuple], manifest: Dict[str, Dict],
+                         incremental: bool, workers: int, index: Dict[str, Dict],
+                         search: Optional['SearchIndex']) -> int:
+        """
+        Parse files in a process pool and write them from one writer thread.
+
+        Parse futures are handed to the writer through a bounded queue, so at
+        most about 2 * workers parsed files are held in memory at a time.
+        """
+        # Imported here, not at startup: only needed with workers
+        from concurrent.futures import ProcessPoolExecutor
+
+        results = queue.Queue(maxsize=workers * 2)
+        success = []
+
+        def drain():
+            while True:
+                item = results.get()
+                if item is None:
+                    return
+                yield item
+
+        writer = threading.Thread(
+            target=lambda: success.append(self._ingest_pending(drain(), manifest, incremental,
+                                                                   index, search)),
+            name='chat-bridge-writer'
+        )
+        writer.start()
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for filepath, status, state in pending:
+                    future = executor.submit(_parse_in_worker, str(filepath))
+                    self._put_while_alive(results, (filepath, status, state, future.result), writer)
+                self._put_while_alive(results, None, writer)
+                writer.join()
+        finally:
+            if writer.is_alive():
+                # Unblock the writer if submitting failed part way
+                results.put(None)
+                writer.join()
+        return success[0] if success else 0
+
+    def _put_while_alive(self, results: queue.Queue, item, writer: threading.Thread):
+        """Put onto the bounded queue, giving up if the writer thread died."""
+        while True:
+            try:
+                results.put(item, timeout=1)
+                return
+            except queue.Full:
+                if not writer.is_alive():
+                    raise RuntimeError("Writer thread stopped unexpectedly")
+
+
+    def watch_directory(self, directory: str, pattern: str = "*.md", interval: float = 2.0,
+                        use_inotify: bool = True):
+        """
+        Keep ingesting transcripts as they are written, until interrupted.
+
+        After a normal incremental run, new or growing files are picked up
+        through inotify (if inotify_simple is installed) or by polling sizes
+        and mtimes every `interval` seconds. A growing transcript is parsed
+        from its last message onwards and only its new messages are written.
+        """
+        if use_inotify and INotify is not None:
+            watcher = _InotifyWatcher(directory, pattern)
+        else:
+            watcher = _PollingWatcher(directory, pattern)
+        # The watcher exists before the catch-up run, so no write is missed
+        self.process_directory(directory, pattern)
+        manifest = self.load_manifest(directory)
+        index = self.load_session_index(directory)
+        search = self.open_search_index(directory)
+        print(f"Watching {directory} for new transcripts (Ctrl+C to stop)")
+
+        try:
+            self.connect()
+        except mysql.connector.Error as e:
+            print(f"Error connecting to database: {e}")
+
+        try:
+            while True:
+                changed = sorted(filepath for filepath in watcher.wait(interval)
+                                 if filepath.name not in _SKIPPED_FILENAMES and filepath.is_file())
+                if not changed:
+                    continue
+                for filepath in changed:
+                    self.ingest_growing(filepath, manifest, index, search)
+                self.save_manifest(directory, manifest)
+                self.save_session_index(directory, index)
+                self._write_metrics()
+        except KeyboardInterrupt:
+            print("\nStopped watching")
+        finally:
+            watcher.close()
+            self.disconnect()
+            if search is not None:
+                search.close()
+
+    def ingest_growing(self, filepath: Path, manifest: Dict[str, Dict],
+                       index: Dict[str, Dict], search: Optional['SearchIndex'] = None) -> bool:
+        """
+        Ingest a new or changed file seen by watch_directory.
+
+        Files that were only appended to since their last ingest by the watcher
+        resume parsing at their last stored message; anything else is parsed
+        in full, after the duplicate check of process_directory.
+        Updates the manifest entry, session index record and search index;
+        returns True if anything was written.
+        """
+        entry = manifest.get(filepath.name)
+        try:
+            status, state = self.check_manifest(entry, filepath)
+        except FileNotFoundError:
+            return False
+        if status == 'unchanged':
+            return False
+        if self.metrics is None:
+            return self._ingest_changed(filepath, entry, status, state, manifest, index, search)
+
+        self.metrics.begin_file(str(filepath), state['size'])
+        written = False
+        try:
+            written = self._ingest_changed(filepath, entry, status, state, manifest, index, search)
+        finally:
+            self.metrics.end_file(written)
+        return written
+
+    def _ingest_changed(self, filepath: Path, entry: Optional[Dict], status: str, state: Dict,
+                        manifest: Dict[str, Dict], index: Dict[str, Dict],
+                        search: Optional['SearchIndex']) -> bool:
+        """Ingest a file found new or changed by ingest_growing; returns True if anything was written."""
+        from session_stats import SessionStats
+
+        # Without the rollup state of the settled messages, stats need a full parse
+        resumable = (status == 'appended' and entry.get('resume_offset') is not None
+                     and not entry.get('duplicate_of')
+                     and (not self.session_stats or entry.get('stats') is not None))
+        if resumable:
+            with self._stage('parse'):
+                parsed = self.parse_messages_from(str(filepath), entry['resume_offset'],
+                                                  entry['resume_order'])
+            if parsed is not None:
+                messages, resume_offset, resume_order = parsed
+                session_id = entry['session_id']
+                stats = settled = None
+                if self.session_stats:
+                    # Messages before the new resume point are final: fold them into the saved state
+                    stats = SessionStats.from_state(entry['stats'])
+                    stats.add_messages(messages[:resume_order - entry['resume_order']])
+                    settled = stats.to_state()
+                    stats.add_messages(messages[resume_order - entry['resume_order']:])
+                print(f"Processing: {filepath} ({len(messages)} new or updated messages)")
+                try:
+                    stored = self._store_with_retry(
+                        filepath, lambda: self.store_messages(session_id, messages, entry['resume_order'],
+                                                              stats))
+                except mysql.connector.Error as e:
+                    print(f"Error processing file {filepath}: {e}")
+                    stored = False
+                if not stored:
+                    return False
+                state.update(session_id=session_id, messages=entry['resume_order'] + len(messages),
+                             resume_offset=resume_offset, resume_order=resume_order, stats=settled)
+                manifest[filepath.name] = state
+                if filepath.name in index:
+                    index[filepath.name].update(messages=state['messages'], size=state['size'])
+                if search is not None:
+                    try:
+                        search.add_messages(filepath.name, state['size'], session_id,
+                                            messages, entry['resume_order'])
+                    except sqlite3.Error as e:
+                        print(f"Warning: could not update search index for {filepath}: {e}")
+                print(f"Successfully processed: {filepath}")
+                return True
+
+        kept, duplicates = self.find_duplicates([(filepath, status, state)], manifest)
+        if duplicates:
+            filepath, state, session_id, original = duplicates[0]
+            print(f"Skipping duplicate: {filepath.name} (same session as {original})")
+            if self.metrics is not None:
+                self.metrics.cancel_file()
+            state.update(session_id=session_id, messages=None, duplicate_of=original)
+            manifest[filepath.name] = state
+            if original in index:
+                index[filepath.name] = dict(index[original], filename=filepath.name, size=state['size'])
+            return False
+
+        with self._stage('parse'):
+            parsed = self.parse_markdown_file_resumable(str(filepath))
+        if parsed is None:
+            # CR line endings: no byte offsets to resume from, parse in full every time
+            data = self.ingest_file(str(filepath))
+            resume_offset, resume_order = None, 0
+        else:
+            data, resume_offset, resume_order = parsed
+            data = self.ingest_file(str(filepath), load=lambda: data)
+        if data is None:
+            return False
+        self.record_ingest(manifest, filepath, state, data)
+        state.update(resume_offset=resume_offset, resume_order=resume_order)
+        if self.session_stats and resume_offset is not None:
+            settled = SessionStats.for_agents(data['agents'])
+            settled.add_messages(data['messages'][:resume_order])
+            state['stats'] = settled.to_state()
+        self.index_ingested(filepath, state['size'], data, index, search)
+        return True
+
+    def export_sessions(self, output: str = '-', fmt: str = 'markdown',
+                        session_ids: Optional[List[str]] = None, since: Optional[str] = None,
+                        until: Optional[str] = None, provider: Optional[str] = None,
+                        model: Optional[str] = None) -> Tuple[int, int]:
+        """
+        Stream sessions from the database to output as Chat Bridge markdown,
+        NDJSON or CSV, in constant memory (see session_export.py).
+
+        Returns:
+            (sessions, messages) exported
+        """
+        from session_export import export_sessions
+
+        return export_sessions(self.db_config, output, fmt, session_ids=session_ids, since=since,
+                               until=until, provider=provider, model=model)
+
+    def parse_to_ndjson(self, paths: Iterable[str], out: IO[str],
+                        per: str = 'session') -> Tuple[int, int, int]:
+        """
+        Parse transcripts and write what was extracted to out as NDJSON (no database).
+
+        per='session' writes one line per transcript: the session fields,
+        "file", "agents" and "messages". per='message' writes the session
+        line without "messages", then one line per message, as
+        session_export's NDJSON. out is flushed after every file, so readers
+        get each transcript as soon as it is parsed.
+
+        Returns:
+            (files parsed, messages, files that could not be parsed)
+        """
+        from session_export import write_ndjson
+
+        parsed = messages = failed = 0
+        for path in paths:
+            try:
+                data = self.parse_markdown_file(path)
+            except (OSError, ValueError) as e:
+                print(f"Error parsing {path}: {e}", file=sys.stderr)
+                failed += 1
+                continue
+            session = dict(data['session'], file=path)
+            session_id = session['session_id']
+            rows = ((session_id,) + row for row in MessageBatch.coerce(data['messages']).columns())
+            messages += write_ndjson(out, session, data['agents'], rows, nested=per == 'session')
+            out.flush()
+            parsed += 1
+        return parsed, messages, failed
+
+
+def transcript_paths(target: str, pattern: str = "*.md") -> Iterator[str]:
+    """
+    Transcripts named by a CLI argument: the transcripts in a folder, a
+    single file, or for '-' the paths read from stdin (one per line, read as
+    they arrive).
+    """
+    if target == '-':
+        for line in sys.stdin:
+            line = line.rstrip('\r\n')
+            if line:
+                yield line
+    elif os.path.isdir(target):
+        for filepath in sorted(Path(target).glob(pattern)):
+            if filepath.name not in _SKIPPED_FILENAMES:
+                yield str(filepath)
+    else:
+        yield target
+
+
+def _parse_in_worker(filepath: str) -> Dict:
+    """Parse one file in a worker process (no database connection needed)."""
+    # Memory maps cannot be sent back to the writer, so always parse to text
+    processor = ChatBridgeProcessor({}, mmap_threshold=None, full_text_search=False)
+    return processor.parse_markdown_file(filepath)
 
 
 # Usage example
 if __name__ == "__main__":
-    import os
-    from dotenv import load_dotenv
+    import argparse
+
+    # Light modules, needed for the option defaults and choices
+    from ingest_jobs import JOBS_DIR
+    from ingest_metrics import PROFILERS
+    from session_export import FORMATS as EXPORT_FORMATS
+
+    parser = argparse.ArgumentParser(description='Process Chat Bridge transcripts into the database.')
+    parser.add_argument('directory', nargs='?', default='.',
+                        help='Folder containing the transcripts (default: current directory); '
+                             'with --parse-only also a transcript, or - to read paths from stdin')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Parse files in N worker processes (default: 1, serial)')
+    parser.add_argument('--watch', action='store_true',
+                        help='Keep running and ingest transcripts as they are written')
+    parser.add_argument('--interval', type=float, default=2.0,
+                        help='Seconds between polls (or to batch inotify events) in --watch mode (default: 2)')
+    parser.add_argument('--poll', action='store_true',
+                        help='In --watch mode, poll mtimes even if inotify is available')
+    parser.add_argument('--no-search-index', action='store_true',
+                        help='Do not maintain the full-text search and similarity index')
+    parser.add_argument('--no-session-stats', action='store_true',
+                        help='Do not maintain the session_stats rollup table')
+    parser.add_argument('--no-message-hashes', action='store_true',
+                        help='Rewrite all messages of a re-ingested session instead of only changed ones')
+    parser.add_argument('--no-migrate', action='store_true',
+                        help='Do not apply schema migrations on connect (see schema.py)')
+    parser.add_argument('--bundle-archive', nargs='?', const='archive', metavar='DIR',
+                        help='Append ingested transcripts to monthly compressed bundles in DIR '
+                             '(default: archive; see bundle_archive.py)')
+    parser.add_argument('--job', action='store_true',
+                        help='Run in the background and print the job ID and status file right away '
+                             '(one job runs at a time; see ingest_jobs.py)')
+    parser.add_argument('--jobs-dir', default=JOBS_DIR,
+                        help=f'Folder for job status files, logs and the run lock (default: {JOBS_DIR})')
+    parser.add_argument('--job-id', help=argparse.SUPPRESS)
+    parser.add_argument('--backfill', action='store_true',
+                        help='Rebuild the database from all transcripts with LOAD DATA LOCAL INFILE')
+    parser.add_argument('--export', choices=EXPORT_FORMATS,
+                        help='Export sessions from the database instead of ingesting (see session_export.py)')
+    parser.add_argument('--output', default='-',
+                        help='Export to this file, or folder for one markdown file per session '
+                             '(default: - for stdout)')
+    parser.add_argument('--session', action='append', metavar='SESSION_ID',
+                        help='Export only this session (repeatable)')
+    parser.add_argument('--since', metavar='DATE', help='Export only sessions started at or after DATE')
+    parser.add_argument('--until', metavar='DATE', help='Export only sessions started before DATE')
+    parser.add_argument('--provider', help='Export only sessions with an agent of this provider')
+    parser.add_argument('--model', help='Export only sessions with an agent of this model')
+    parser.add_argument('--parse-only', action='store_true',
+                        help='Only parse the transcripts and write NDJSON to stdout; needs no '
+                             'database, driver or .env')
+    parser.add_argument('--per', choices=('session', 'message'), default='session',
+                        help='With --parse-only, write one line per session (with its messages) '
+                             'or a session line followed by one line per message (default: session)')
+    parser.add_argument('--metrics-json', metavar='PATH',
+                        help='Write per-stage ingest timings and row counts as JSON')
+    parser.add_argument('--metrics-prometheus', metavar='PATH',
+                        help='Write ingest totals as a Prometheus textfile-collector .prom file')
+    parser.add_argument('--profile', choices=PROFILERS,
+                        help='Profile every file and dump the slowest ones')
+    parser.add_argument('--profile-top', type=int, default=5,
+                        help='Number of slowest files to dump profiles of (default: 5)')
+    parser.add_argument('--profile-dir', default='ingest_profiles',
+                        help='Folder for the profile dumps (default: ingest_profiles)')
+    args = parser.parse_args()
+    if args.job and args.watch:
+        parser.error('--job cannot be combined with --watch')
+    if args.parse_only and (args.job or args.watch or args.backfill or args.export):
+        parser.error('--parse-only cannot be combined with --job, --watch, --backfill or --export')
+
+    if args.parse_only:
+        # No .env, driver or search index: startup stays within the budget
+        # checked by benchmarks/bench_startup.py
+        processor = ChatBridgeProcessor({}, full_text_search=False)
+        try:
+            files, messages, failed = processor.parse_to_ndjson(
+                transcript_paths(args.directory), sys.stdout, args.per)
+        except BrokenPipeError:
+            # The reader stopped early (e.g. | head); exit without a traceback
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            sys.exit(1)
+        print(f"Parsed {files} files ({messages} messages), {failed} failed", file=sys.stderr)
+        sys.exit(1 if failed else 0)
+
+    if args.job:
+        # Start this same command as a background job (start_job swaps in the job options)
+        from ingest_jobs import start_job
+        print(json.dumps(start_job(sys.argv[1:], args.jobs_dir)))
+        sys.exit(0)
     
-    # Load environment variables
+    # Load environment variables (imported here: only the database modes need them)
+    from dotenv import load_dotenv
     load_dotenv()
     
     # Database configuration from .env
@@ -319,11 +2061,56 @@ if __name__ == "__main__":
         'port': int(os.getenv('DB_PORT', 3306))
     }
     
+    if args.job_id and not args.metrics_json:
+        # Keep every job's metrics next to its status file
+        from ingest_jobs import job_file
+        args.metrics_json = str(job_file(args.job_id, args.jobs_dir, '.metrics.json'))
+
+    metrics = None
+    if args.metrics_json or args.metrics_prometheus or args.profile:
+        from ingest_metrics import IngestMetrics
+        metrics = IngestMetrics(json_path=args.metrics_json, prometheus_path=args.metrics_prometheus,
+                                profile=args.profile, profile_top=args.profile_top,
+                                profile_dir=args.profile_dir)
+
+    bundles = None
+    if args.bundle_archive:
+        from bundle_archive import BundleArchive
+        bundles = BundleArchive(args.bundle_archive)
+
     # Create processor
-    processor = ChatBridgeProcessor(db_config)
-    
-    # Process all markdown files in current directory
-    processor.process_directory('.')
+    processor = ChatBridgeProcessor(db_config, full_text_search=not args.no_search_index,
+                                    metrics=metrics, session_stats=not args.no_session_stats,
+                                    message_hashes=not args.no_message_hashes,
+                                    manage_schema=not args.no_migrate, bundle_archive=bundles)
     
-    # Or specify a different directory:
-    # processor.process_directory('/path/to/transcripts')
+    if args.export:
+        try:
+            sessions, messages = processor.export_sessions(
+                args.output, args.export, session_ids=args.session, since=args.since,
+                until=args.until, provider=args.provider, model=args.model)
+        except mysql.connector.Error as e:
+            print(f"Error exporting sessions: {e}", file=sys.stderr)
+            sys.exit(1)
+        # stdout may be the export itself
+        print(f"Exported {sessions} sessions ({messages} messages)", file=sys.stderr)
+        sys.exit(0)
+
+    def run(progress: Optional['JobStatus'] = None):
+        # Process all markdown files in the given directory
+        processor.progress = progress
+        if args.backfill:
+            from backfill import backfill_directory
+            backfill_directory(processor, args.directory, workers=args.workers)
+        elif args.watch:
+            processor.watch_directory(args.directory, interval=args.interval, use_inotify=not args.poll)
+        else:
+            processor.process_directory(args.directory, workers=args.workers)
+        if processor.bundle_archive is not None:
+            processor.bundle_archive.close()
+
+    if args.job_id:
+        from ingest_jobs import run_job
+        run_job(args.job_id, run, args.jobs_dir)
+    else:
+        run()
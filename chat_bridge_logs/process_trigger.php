@@ -1,11 +1,72 @@
 <?php
-// process_trigger.php - Triggers Python script to process logs to database
+// process_trigger.php - Starts a background Python ingest job, or reports a job's progress
+//
+//   process_trigger.php           start a job; returns its job_id right away
+//   process_trigger.php?job=ID    the job's status (state, files done/total, current file,
+//                                 errors, throughput), plus its ingest metrics once finished
 
 header('Content-Type: application/json');
 
 // Path to your Python script
 $pythonPath = '/usr/bin/python3';  // Adjust if needed
 $scriptPath = __DIR__ . '/process_logs.py';
+// Job status files, logs and the run lock (see ingest_jobs.py)
+$jobsDir = __DIR__ . '/ingest_jobs';
+
+// Whether a process is still there (EPERM: it exists, under another user)
+function processExists($pid) {
+    if (function_exists('posix_kill')) {
+        return posix_kill($pid, 0) || posix_get_last_error() === 1;
+    }
+    return !is_dir('/proc') || file_exists("/proc/$pid");
+}
+
+if (isset($_GET['job'])) {
+    // Polling only reads the status file the job keeps up to date
+    $jobId = basename($_GET['job']);
+    $status = json_decode((string) @file_get_contents("$jobsDir/$jobId.json"), true);
+    if (!is_array($status)) {
+        http_response_code(404);
+        echo json_encode([
+            'success' => false,
+            'error' => 'Unknown job: ' . $jobId
+        ]);
+        exit;
+    }
+    // A job whose process is gone before it finished never will (ingest_jobs.py
+    // also records this in the status file the next time it reads it)
+    $pid = intval($status['pid'] ?? 0);
+    if (in_array($status['state'], ['queued', 'running'], true) && $pid > 0 && !processExists($pid)) {
+        $status['state'] = 'failed';
+        $status['error'] = "Job process $pid exited before the job finished (see its log)";
+    }
+    unset($status['log_file'], $status['metrics_file']);
+
+    $metrics = null;
+    $report = json_decode((string) @file_get_contents("$jobsDir/$jobId.metrics.json"), true);
+    if (is_array($report)) {
+        // Summary only: the per-file records stay in the JSON report
+        $metrics = [
+            'files' => $report['files'],
+            'succeeded' => $report['succeeded'],
+            'failed' => $report['failed'],
+            'seconds' => round($report['seconds'], 3),
+            'bytes' => $report['bytes'],
+            'rows' => $report['rows'],
+            'skipped' => $report['skipped'],
+            'files_per_second' => $report['files_per_second'],
+            'stages' => array_map(function ($seconds) { return round($seconds, 3); }, $report['stages']),
+            'slowest' => $report['slowest'],
+        ];
+    }
+
+    echo json_encode([
+        'success' => true,
+        'job' => $status,
+        'metrics' => $metrics
+    ]);
+    exit;
+}
 
 // Check if Python script exists
 if (!file_exists($scriptPath)) {
@@ -16,24 +77,25 @@ if (!file_exists($scriptPath)) {
     exit;
 }
 
-// Execute Python script and capture output
-$command = escapeshellcmd("$pythonPath $scriptPath 2>&1");
+// Start the job; Python prints the queued job's status and returns without waiting for the run
+$command = escapeshellcmd("$pythonPath $scriptPath") . ' --job --jobs-dir ' . escapeshellarg($jobsDir) . ' 2>&1';
 $output = shell_exec($command);
-$exitCode = 0;
+$job = json_decode((string) $output, true);
 
-// Check if execution was successful
-if ($output === null) {
+// Check if the job was started
+if (!is_array($job) || !isset($job['job_id'])) {
     echo json_encode([
         'success' => false,
-        'error' => 'Failed to execute Python script. Check permissions.'
+        'error' => 'Failed to start the Python job. Check permissions.',
+        'output' => $output
     ]);
     exit;
 }
 
-// Return success with output
 echo json_encode([
     'success' => true,
-    'output' => $output,
-    'message' => 'Logs processed to database successfully'
+    'job_id' => $job['job_id'],
+    'state' => $job['state'],
+    'message' => 'Processing started'
 ]);
 ?>
\ No newline at end of file
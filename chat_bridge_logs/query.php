@@ -60,6 +60,20 @@ try {
             echo json_encode(['columns' => $columns]);
             exit;
         }
+
+        // Precomputed rollups: one session (all speakers), or one speaker ('*' = whole session) across sessions
+        if ($action === 'session_stats') {
+            if (isset($_GET['session_id'])) {
+                $stmt = $pdo->prepare("SELECT * FROM session_stats WHERE session_id = ?");
+                $stmt->execute([$_GET['session_id']]);
+            } else {
+                $limit = max(1, min((int) ($_GET['limit'] ?? 100), 1000));
+                $stmt = $pdo->prepare("SELECT * FROM session_stats WHERE speaker = ? ORDER BY session_id DESC LIMIT $limit");
+                $stmt->execute([$_GET['speaker'] ?? '*']);
+            }
+            echo json_encode(['stats' => $stmt->fetchAll(PDO::FETCH_ASSOC)]);
+            exit;
+        }
     }
     
     if ($_SERVER['REQUEST_METHOD'] === 'POST') {
@@ -0,0 +1,468 @@
+"""
+The database schema the processor writes to, its migrations, and an EXPLAIN
+check of the queries run against it.
+
+Tables (InnoDB, utf8mb4), with primary keys matching the write paths:
+
+    sessions       PRIMARY KEY (session_id)                  session upsert
+    agents         PRIMARY KEY (session_id, agent_label)     agent upsert
+    messages       PRIMARY KEY (session_id, message_order)   replace by order
+    session_stats  PRIMARY KEY (session_id, speaker)         see session_stats.py
+
+InnoDB clusters rows by primary key, so a session's messages are stored
+together in order and reading a transcript is one range scan. Each table
+except session_stats keeps an AUTO_INCREMENT id with an ordinary index, for
+the query dashboard's ORDER BY id queries.
+
+Secondary indexes serve the viewer and processor queries in QUERIES:
+
+    sessions.idx_started            recent sessions (covering with the key)
+    agents.idx_provider_model       agents per provider / model (covering)
+    messages.idx_timestamp          recent messages, messages in a date range
+    messages.idx_hashes             the stored content hashes of a session,
+                                    without reading the message bodies
+    session_stats.idx_speaker       one speaker's rollups across sessions
+
+messages can be range partitioned by month on timestamp
+(partition_messages=True): one partition per month, p_old for anything
+before the first month and p_future for anything after the last. MySQL then
+needs timestamp in the primary key, so the key becomes (session_id,
+message_order, timestamp) and timestamp NOT NULL. Partitioned tables cannot
+have FULLTEXT indexes; full-text search is served by search_index.py
+anyway. add_message_partitions() splits new months off p_future; the
+processor runs it whenever it connects, so the partitions keep up.
+
+Migrations are numbered and recorded in schema_migrations; migrate()
+applies the missing ones. The later ones bring tables created by hand
+before this module existed up to date (the content_hash column, then the
+keys and indexes). Where such a table has another primary key (e.g. id), a
+UNIQUE key on the expected columns is added instead of replacing it.
+
+check_queries() runs EXPLAIN on QUERIES and flags full table scans, and
+full index scans that neither cover the query nor stop at a LIMIT. Run it
+against a populated database: on near-empty tables the optimizer scans
+whatever it likes.
+
+Usage:
+    python schema.py [--partition-messages] [--partition-from 2025-01] [--months-ahead 3]
+    python schema.py --explain
+"""
+import argparse
+import os
+import sys
+from datetime import date, datetime
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from lazy_import import lazy_import
+from session_stats import SESSION_STATS_TABLE_SQL
+
+mysql = lazy_import('mysql.connector')
+
+MIGRATIONS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INT NOT NULL PRIMARY KEY,
+    description VARCHAR(255) NOT NULL,
+    applied_at DATETIME NOT NULL
+)
+"""
+
+SESSIONS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id BIGINT NOT NULL AUTO_INCREMENT,
+    session_id VARCHAR(64) NOT NULL,
+    started_at DATETIME,
+    conversation_starter TEXT,
+    max_rounds INT,
+    memory_rounds INT,
+    stop_word_detection BOOLEAN NOT NULL DEFAULT FALSE,
+    stop_words TEXT,
+    PRIMARY KEY (session_id),
+    KEY idx_id (id),
+    KEY idx_started (started_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+AGENTS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS agents (
+    id BIGINT NOT NULL AUTO_INCREMENT,
+    session_id VARCHAR(64) NOT NULL,
+    agent_label CHAR(1) NOT NULL,
+    provider VARCHAR(64),
+    model VARCHAR(128),
+    temperature FLOAT,
+    persona VARCHAR(255),
+    system_prompt TEXT,
+    PRIMARY KEY (session_id, agent_label),
+    KEY idx_id (id),
+    KEY idx_provider_model (provider, model)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+# {timestamp_null} and {primary_key} differ for the partitioned layout
+_MESSAGES_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS messages (
+    id BIGINT NOT NULL AUTO_INCREMENT,
+    session_id VARCHAR(64) NOT NULL,
+    speaker VARCHAR(16) NOT NULL,
+    timestamp DATETIME {timestamp_null},
+    content MEDIUMTEXT,
+    message_order INT NOT NULL,
+    content_hash CHAR(32),
+    PRIMARY KEY ({primary_key}),
+    KEY idx_id (id),
+    KEY idx_timestamp (timestamp),
+    KEY idx_hashes (session_id, message_order, content_hash)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+HASH_COLUMN_CHECK_SQL = "SELECT content_hash FROM messages LIMIT 0"
+ADD_HASH_COLUMN_SQL = "ALTER TABLE messages ADD COLUMN content_hash CHAR(32) NULL"
+
+PRIMARY_KEYS = {
+    'sessions': ('session_id',),
+    'agents': ('session_id', 'agent_label'),
+    'messages': ('session_id', 'message_order'),
+    'session_stats': ('session_id', 'speaker'),
+}
+PARTITIONED_MESSAGES_KEY = ('session_id', 'message_order', 'timestamp')
+
+# Secondary indexes: table -> {name: columns}
+INDEXES = {
+    'sessions': {'idx_id': ('id',), 'idx_started': ('started_at',)},
+    'agents': {'idx_id': ('id',), 'idx_provider_model': ('provider', 'model')},
+    'messages': {'idx_id': ('id',), 'idx_timestamp': ('timestamp',),
+                 'idx_hashes': ('session_id', 'message_order', 'content_hash')},
+    'session_stats': {'idx_speaker': ('speaker', 'session_id')},
+}
+
+# Representative viewer and processor queries: (name, query, sample params)
+QUERIES = [
+    ('recent sessions',
+     "SELECT session_id, started_at FROM sessions ORDER BY started_at DESC LIMIT 50", ()),
+    ('session', "SELECT * FROM sessions WHERE session_id = %s", ('conv_20250101_000000',)),
+    ('session agents', "SELECT * FROM agents WHERE session_id = %s", ('conv_20250101_000000',)),
+    ('agents per provider',
+     "SELECT provider, model, COUNT(*) FROM agents GROUP BY provider, model", ()),
+    ('transcript',
+     "SELECT speaker, timestamp, content FROM messages WHERE session_id = %s ORDER BY message_order",
+     ('conv_20250101_000000',)),
+    ('stored hashes',
+     "SELECT message_order, content_hash FROM messages WHERE session_id = %s AND message_order >= %s",
+     ('conv_20250101_000000', 0)),
+    ('recent messages', "SELECT * FROM messages ORDER BY timestamp DESC LIMIT 20", ()),
+    ('messages in a month',
+     "SELECT COUNT(*) FROM messages WHERE timestamp >= %s AND timestamp < %s",
+     ('2025-01-01', '2025-02-01')),
+    ('session stats', "SELECT * FROM session_stats WHERE session_id = %s", ('conv_20250101_000000',)),
+    ('speaker stats',
+     "SELECT * FROM session_stats WHERE speaker = %s ORDER BY session_id DESC LIMIT 100", ('*',)),
+]
+
+_INDEX_COLUMNS_SQL = """
+SELECT INDEX_NAME, NON_UNIQUE, COLUMN_NAME
+FROM information_schema.STATISTICS
+WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+ORDER BY INDEX_NAME, SEQ_IN_INDEX
+"""
+
+_TABLE_COLUMNS_SQL = """
+SELECT COLUMN_NAME FROM information_schema.COLUMNS
+WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+"""
+
+_PARTITIONS_SQL = """
+SELECT PARTITION_NAME FROM information_schema.PARTITIONS
+WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'messages' AND PARTITION_NAME IS NOT NULL
+ORDER BY PARTITION_ORDINAL_POSITION
+"""
+
+_FUTURE_PARTITION = 'p_future'
+
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _next_month(month: date) -> date:
+    return month.replace(year=month.year + 1, month=1) if month.month == 12 else month.replace(month=month.month + 1)
+
+
+def _months(first: date, months_ahead: int, today: Optional[date] = None) -> List[date]:
+    """First days of the months from first through months_ahead months after today."""
+    last = _month_start(today or date.today())
+    for _ in range(months_ahead):
+        last = _next_month(last)
+    months = []
+    month = _month_start(first)
+    while month <= last:
+        months.append(month)
+        month = _next_month(month)
+    return months
+
+
+def _month_partition(month: date) -> str:
+    return f"PARTITION p{month:%Y%m} VALUES LESS THAN ('{_next_month(month):%Y-%m-%d}')"
+
+
+def messages_partition_clause(first_month: date, months_ahead: int = 3,
+                              today: Optional[date] = None) -> str:
+    """The PARTITION BY clause of a monthly partitioned messages table."""
+    partitions = [f"PARTITION p_old VALUES LESS THAN ('{_month_start(first_month):%Y-%m-%d}')"]
+    partitions += [_month_partition(month) for month in _months(first_month, months_ahead, today)]
+    partitions.append(f"PARTITION {_FUTURE_PARTITION} VALUES LESS THAN (MAXVALUE)")
+    return "PARTITION BY RANGE COLUMNS(timestamp) (\n    " + ",\n    ".join(partitions) + "\n)"
+
+
+def messages_table_sql(partitioned: bool = False, first_month: Optional[date] = None,
+                       months_ahead: int = 3) -> str:
+    """CREATE TABLE statement of messages, optionally partitioned by month from first_month."""
+    if not partitioned:
+        return _MESSAGES_TABLE_SQL.format(timestamp_null='NULL',
+                                          primary_key=', '.join(PRIMARY_KEYS['messages']))
+    sql = _MESSAGES_TABLE_SQL.format(timestamp_null='NOT NULL',
+                                     primary_key=', '.join(PARTITIONED_MESSAGES_KEY))
+    return sql.rstrip() + '\n' + messages_partition_clause(first_month or date.today(), months_ahead)
+
+
+def _columns(cursor, table: str) -> Set[str]:
+    """Column names of a table (empty if it does not exist)."""
+    cursor.execute(_TABLE_COLUMNS_SQL, (table,))
+    return {column for (column,) in cursor.fetchall()}
+
+
+def _indexes(cursor, table: str) -> Tuple[Dict[str, Tuple[str, ...]], List[Tuple[str, ...]]]:
+    """Index name -> columns of a table, and the column lists of its unique indexes."""
+    cursor.execute(_INDEX_COLUMNS_SQL, (table,))
+    indexes = {}
+    unique = set()
+    for name, non_unique, column in cursor.fetchall():
+        indexes[name] = indexes.get(name, ()) + (column,)
+        if not int(non_unique):
+            unique.add(name)
+    return indexes, [indexes[name] for name in unique]
+
+
+def _create_tables(cursor, partition_messages: bool, first_month: Optional[date], months_ahead: int):
+    for statement in (SESSIONS_TABLE_SQL, AGENTS_TABLE_SQL,
+                      messages_table_sql(partition_messages, first_month, months_ahead),
+                      SESSION_STATS_TABLE_SQL):
+        cursor.execute(statement)
+
+
+def _add_hash_column(cursor, **options):
+    # Looked up rather than caught, so the migrations run on any driver's cursor
+    if 'content_hash' not in _columns(cursor, 'messages'):
+        cursor.execute(ADD_HASH_COLUMN_SQL)
+
+
+def _add_keys(cursor, **options):
+    """
+    Add the expected primary/unique keys and secondary indexes that a table
+    lacks (indexes on columns the table does not have are left out).
+    """
+    for table, key in PRIMARY_KEYS.items():
+        columns_present = _columns(cursor, table)
+        if not columns_present:
+            continue
+        indexes, unique = _indexes(cursor, table)
+        columns = ', '.join(f"`{column}`" for column in key)
+        primary = indexes.get('PRIMARY')
+        if primary is None:
+            cursor.execute(f"ALTER TABLE `{table}` ADD PRIMARY KEY ({columns})")
+        elif primary != PARTITIONED_MESSAGES_KEY and key not in unique:
+            cursor.execute(f"ALTER TABLE `{table}` ADD UNIQUE KEY `uq_{table}` ({columns})")
+        missing = [f"ADD INDEX `{name}` ({', '.join(f'`{column}`' for column in index)})"
+                   for name, index in INDEXES[table].items()
+                   if name not in indexes and index not in indexes.values()
+                   and columns_present.issuperset(index)]
+        if missing:
+            cursor.execute(f"ALTER TABLE `{table}` {', '.join(missing)}")
+
+
+# (version, description, function(cursor, partition_messages, first_month, months_ahead))
+MIGRATIONS = [
+    (1, 'create sessions, agents, messages and session_stats', _create_tables),
+    (2, 'add messages.content_hash', _add_hash_column),
+    (3, 'add primary keys and indexes', _add_keys),
+]
+
+
+def applied_migrations(cursor) -> List[int]:
+    """Versions recorded in schema_migrations (creating the table if needed)."""
+    cursor.execute(MIGRATIONS_TABLE_SQL)
+    cursor.execute("SELECT version FROM schema_migrations ORDER BY version")
+    return [version for (version,) in cursor.fetchall()]
+
+
+def migrate(cursor, partition_messages: bool = False, first_month: Optional[date] = None,
+            months_ahead: int = 3) -> List[int]:
+    """
+    Apply the migrations that have not run yet on this database.
+
+    Args:
+        cursor: A cursor of a mysql.connector connection (or anything with
+            the same execute/fetchall, see async_process_logs.py)
+        partition_messages: Create messages partitioned by month (only
+            affects a messages table that does not exist yet)
+        first_month: First monthly partition; earlier rows go to p_old
+            (default: the current month)
+        months_ahead: Months past the current one to create partitions for
+
+    Returns:
+        The versions applied now
+    """
+    done = set(applied_migrations(cursor))
+    applied = []
+    for version, description, run in MIGRATIONS:
+        if version in done:
+            continue
+        # DDL commits implicitly, so each migration is recorded right after it ran
+        run(cursor, partition_messages=partition_messages, first_month=first_month,
+            months_ahead=months_ahead)
+        cursor.execute("INSERT INTO schema_migrations (version, description, applied_at) "
+                       "VALUES (%s, %s, %s)", (version, description, datetime.now()))
+        cursor.execute("COMMIT")
+        applied.append(version)
+    return applied
+
+
+def message_partitions(cursor) -> List[str]:
+    """Partition names of messages, in order (empty if it is not partitioned)."""
+    cursor.execute(_PARTITIONS_SQL)
+    return [name for (name,) in cursor.fetchall()]
+
+
+def add_message_partitions(cursor, months_ahead: int = 3, today: Optional[date] = None) -> List[str]:
+    """
+    Split monthly partitions off p_future up to months_ahead months from now.
+
+    A no-op for an unpartitioned messages table. Returns the names of the
+    partitions added.
+    """
+    partitions = message_partitions(cursor)
+    months = sorted(name for name in partitions if name[1:].isdigit())
+    if _FUTURE_PARTITION not in partitions or not months:
+        return []
+    last = datetime.strptime(months[-1][1:], '%Y%m').date()
+    new = _months(_next_month(last), months_ahead, today)
+    if not new:
+        return []
+    clauses = [_month_partition(month) for month in new]
+    clauses.append(f"PARTITION {_FUTURE_PARTITION} VALUES LESS THAN (MAXVALUE)")
+    cursor.execute(f"ALTER TABLE messages REORGANIZE PARTITION {_FUTURE_PARTITION} INTO "
+                   f"({', '.join(clauses)})")
+    return [f"p{month:%Y%m}" for month in new]
+
+
+def partition_messages(cursor, first_month: date, months_ahead: int = 3):
+    """
+    Convert an existing, unpartitioned messages table to monthly partitions.
+
+    Rebuilds the whole table: the primary key gains timestamp, timestamp
+    becomes NOT NULL (NULL timestamps must be fixed first) and FULLTEXT
+    indexes must be dropped beforehand.
+    """
+    key = ', '.join(PARTITIONED_MESSAGES_KEY)
+    cursor.execute(f"ALTER TABLE messages MODIFY timestamp DATETIME NOT NULL, "
+                   f"DROP PRIMARY KEY, ADD PRIMARY KEY ({key})\n"
+                   f"{messages_partition_clause(first_month, months_ahead)}")
+
+
+def explain(cursor, query: str, params: Sequence = ()) -> List[Dict]:
+    """EXPLAIN a query; one dict per row of the plan."""
+    cursor.execute(f"EXPLAIN {query}", tuple(params))
+    columns = [column.lower() for column in cursor.column_names]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def full_scans(plan: List[Dict], query: str) -> List[str]:
+    """Describe the steps of a plan that read a whole table or index."""
+    flagged = []
+    limited = ' LIMIT ' in query.upper()
+    for step in plan:
+        access = (step.get('type') or '').upper()
+        extra = step.get('extra') or ''
+        if access == 'ALL':
+            flagged.append(f"full table scan of {step.get('table')} (~{step.get('rows')} rows)")
+        elif access == 'INDEX' and 'Using index' not in extra and not limited:
+            flagged.append(f"full index scan of {step.get('table')} via {step.get('key')} "
+                           f"(~{step.get('rows')} rows)")
+    return flagged
+
+
+def check_queries(cursor, queries=QUERIES) -> List[Tuple[str, List[str]]]:
+    """EXPLAIN each (name, query, params) and return (name, problems) for those that scan."""
+    problems = []
+    for name, query, params in queries:
+        try:
+            flagged = full_scans(explain(cursor, query, params), query)
+        except mysql.connector.Error as e:
+            flagged = [f"EXPLAIN failed: {e}"]
+        if flagged:
+            problems.append((name, flagged))
+    return problems
+
+
+def _month_arg(value: str) -> date:
+    return datetime.strptime(value, '%Y-%m').date()
+
+
+def main():
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description='Create or migrate the Chat Bridge database schema.')
+    parser.add_argument('--partition-messages', action='store_true',
+                        help='Partition messages by month (new table, or convert an existing one)')
+    parser.add_argument('--partition-from', type=_month_arg, default=None,
+                        help='First monthly partition as YYYY-MM (default: current month)')
+    parser.add_argument('--months-ahead', type=int, default=3,
+                        help='Create partitions this many months past the current one (default: 3)')
+    parser.add_argument('--explain', action='store_true',
+                        help='EXPLAIN the representative queries and flag full scans')
+    args = parser.parse_args()
+
+    load_dotenv()
+    db_config = {
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'user': os.getenv('DB_USER'),
+        'password': os.getenv('DB_PASSWORD'),
+        'database': os.getenv('DB_NAME'),
+        'port': int(os.getenv('DB_PORT', 3306))
+    }
+
+    try:
+        conn = mysql.connector.connect(**db_config)
+    except mysql.connector.Error as e:
+        print(f"Error connecting to database: {e}")
+        sys.exit(1)
+    cursor = conn.cursor()
+    try:
+        if args.explain:
+            problems = check_queries(cursor)
+            for name, flagged in problems:
+                for problem in flagged:
+                    print(f"{name}: {problem}")
+            print(f"{len(QUERIES) - len(problems)}/{len(QUERIES)} queries without full scans")
+            sys.exit(1 if problems else 0)
+
+        applied = migrate(cursor, args.partition_messages, args.partition_from, args.months_ahead)
+        print(f"Applied migrations: {applied}" if applied else "Schema is up to date")
+        if args.partition_messages:
+            if message_partitions(cursor):
+                added = add_message_partitions(cursor, args.months_ahead)
+                if added:
+                    print(f"Added partitions: {', '.join(added)}")
+            else:
+                print("Partitioning messages (rebuilds the table)...")
+                partition_messages(cursor, args.partition_from or date.today(), args.months_ahead)
+                print("messages is now partitioned by month")
+    except mysql.connector.Error as e:
+        print(f"Error migrating schema: {e}")
+        sys.exit(1)
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
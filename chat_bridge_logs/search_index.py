@@ -0,0 +1,317 @@
+"""
+Full-text search over ingested messages, kept in a local SQLite FTS5 sidecar.
+
+ChatBridgeProcessor updates the index file by file while it ingests; this
+module also provides the search API:
+
+    index = SearchIndex('chat_bridge_logs/.search_index.sqlite')
+    page = index.search('"nature of intelligence" consciousness', speaker='Agent A')
+
+Plain words must all occur in a message, "quoted text" must occur as a
+phrase. Results are ranked by BM25 and paginated. BM25 has to score every
+match before the first page can be returned, so of queries matching more
+than `rank_limit` messages (typically a single very common word) only the
+`rank_limit` most recently indexed matches are ranked, which FTS5 can stop
+collecting after that many; the result says how many were.
+
+The same file holds the MinHash signatures and LSH buckets of
+similarity_index.py (`index.similarity`), updated along with the messages.
+"""
+import re
+import sqlite3
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+from message_batch import MessageBatch
+from similarity_index import SimilarityIndex
+
+SEARCH_INDEX_FILENAME = '.search_index.sqlite'
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS sessions (
+        session_id TEXT PRIMARY KEY,
+        filename TEXT,
+        started TEXT,
+        agent_a_provider TEXT,
+        agent_a_model TEXT,
+        agent_b_provider TEXT,
+        agent_b_model TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS messages (
+        id INTEGER PRIMARY KEY,
+        session_id TEXT NOT NULL,
+        message_order INTEGER NOT NULL,
+        speaker TEXT,
+        timestamp TEXT,
+        provider TEXT,
+        model TEXT
+    )
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS messages_session_order ON messages (session_id, message_order)",
+    # Message bodies; the rowid is messages.id
+    "CREATE VIRTUAL TABLE IF NOT EXISTS message_fts USING fts5(content, tokenize = 'unicode61')",
+    # Size of each transcript as last indexed, to spot files that still need indexing
+    "CREATE TABLE IF NOT EXISTS files (filename TEXT PRIMARY KEY, size INTEGER NOT NULL)",
+]
+
+_QUERY_TERM_RE = re.compile(r'"([^"]*)"|(\S+)')
+_FILTER_COLUMNS = ('speaker', 'provider', 'model', 'session_id')
+
+
+def fts_query(text: str) -> str:
+    """
+    Turn a search box string into an FTS5 query.
+
+    Every word and every "quoted phrase" becomes a quoted FTS5 phrase, so
+    all of them must match and characters such as - or : never reach the
+    FTS5 query parser as operators.
+    """
+    terms = []
+    for phrase, word in _QUERY_TERM_RE.findall(text):
+        term = (phrase or word).strip()
+        if term:
+            terms.append('"' + term.replace('"', '""') + '"')
+    return ' '.join(terms)
+
+
+class SearchIndex:
+    def __init__(self, path: str, rank_limit: int = 10000):
+        """
+        Open (creating if needed) the search index at path.
+
+        rank_limit: Queries with more matches than this only rank (and
+            page through) their rank_limit most recently indexed matches, to
+            keep them fast (default: 10000)
+
+        The connection may be handed between threads, e.g. to the writer
+        thread of process_directory(workers=N), as long as only one uses it
+        at a time.
+        """
+        self.path = Path(path)
+        self.rank_limit = rank_limit
+        # Between begin() and commit()/rollback(): updates are not committed one by one
+        self._held = False
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        with self.conn:
+            for statement in _SCHEMA:
+                self.conn.execute(statement)
+        self.similarity = SimilarityIndex(self.conn)
+
+    def close(self):
+        """Close the index (an update held since begin() is dropped)."""
+        self.conn.close()
+
+    def begin(self):
+        """
+        Hold the updates that follow in one transaction until commit() or
+        rollback(), e.g. until the database writes they mirror are committed.
+        """
+        self.conn.execute("BEGIN")
+        self._held = True
+
+    def commit(self):
+        self.conn.commit()
+        self._held = False
+
+    def rollback(self):
+        self.conn.rollback()
+        self._held = False
+
+    def _transaction(self):
+        # Each update is its own transaction unless they are being held
+        return nullcontext() if self._held else self.conn
+
+    def indexed_files(self) -> Dict[str, int]:
+        """Return the size of every transcript as it was last indexed, by filename."""
+        return dict(self.conn.execute("SELECT filename, size FROM files"))
+
+    def add_session(self, filename: str, size: int, data: Dict, first_message: int = 0):
+        """
+        Index a parsed transcript (as returned by parse_markdown_file).
+
+        Messages from first_message on replace those indexed before, so an
+        appended transcript only needs its new messages indexed.
+        """
+        session = data['session']
+        agents = {agent['label']: agent for agent in data['agents']}
+        agent_a = agents.get('A', {})
+        agent_b = agents.get('B', {})
+        with self._transaction():
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (session['session_id'], filename, session['started_at'],
+                 agent_a.get('provider'), agent_a.get('model'),
+                 agent_b.get('provider'), agent_b.get('model'))
+            )
+            self._replace_messages(session['session_id'], data['messages'][first_message:], first_message)
+            self.conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?)", (filename, size))
+
+    def add_messages(self, filename: str, size: int, session_id: str,
+                     messages: Union[MessageBatch, List[Dict]], first_message: int):
+        """
+        Index messages of an already indexed session (used by --watch).
+
+        messages must start at order first_message; they replace every
+        message indexed from that order on.
+        """
+        with self._transaction():
+            self._replace_messages(session_id, messages, first_message)
+            self.conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?)", (filename, size))
+
+    def _replace_messages(self, session_id: str, messages: Union[MessageBatch, Iterable[Dict]],
+                          first_message: int):
+        stale = self.conn.execute(
+            "SELECT id FROM messages WHERE session_id = ? AND message_order >= ?",
+            (session_id, first_message)
+        ).fetchall()
+        self.conn.executemany("DELETE FROM message_fts WHERE rowid = ?", stale)
+        self.similarity.remove_messages([message_id for message_id, in stale])
+        self.conn.executemany("DELETE FROM messages WHERE id = ?", stale)
+
+        agents = self.conn.execute(
+            "SELECT agent_a_provider, agent_a_model, agent_b_provider, agent_b_model "
+            "FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone() or (None, None, None, None)
+        by_speaker = {'Agent A': agents[:2], 'Agent B': agents[2:]}
+
+        # Allocate ids up front so both tables can be filled with executemany
+        next_id = self.conn.execute("SELECT coalesce(max(id), 0) + 1 FROM messages").fetchone()[0]
+        rows = []
+        bodies = []
+        columns = MessageBatch.coerce(messages).columns()
+        for message_id, (order, speaker, timestamp, content) in enumerate(columns, next_id):
+            provider, model = by_speaker.get(speaker, (None, None))
+            rows.append((message_id, session_id, order, speaker, timestamp, provider, model))
+            bodies.append((message_id, content))
+        self.conn.executemany("INSERT INTO messages VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        self.conn.executemany("INSERT INTO message_fts (rowid, content) VALUES (?, ?)", bodies)
+        self.similarity.add_messages(session_id, bodies)
+
+    def search(self, query: str, speaker: Optional[str] = None, provider: Optional[str] = None,
+               model: Optional[str] = None, session_id: Optional[str] = None,
+               page: int = 1, per_page: int = 20, raw: bool = False) -> Dict:
+        """
+        Search message content.
+
+        Args:
+            query: Words and "quoted phrases" that must all occur in a message;
+                with raw=True, an FTS5 query (allows OR, NOT, NEAR, prefix*)
+            speaker: Only messages by 'Human', 'Agent A' or 'Agent B'
+            provider / model: Only messages written by an agent with this
+                provider / model
+            session_id: Only messages of this session
+            page: 1-based page number
+            per_page: Results per page
+
+        Returns:
+            {'query', 'total', 'page', 'per_page', 'ranked', 'ranked_matches',
+            'results'}, with results best match first. 'ranked' is False if
+            there were more than rank_limit matches: then only the
+            'ranked_matches' most recently indexed ones were ranked and are
+            paged through. Each result holds session_id, filename, started,
+            order, speaker, timestamp, provider, model, snippet and score
+        """
+        match = query if raw else fts_query(query)
+        if not match:
+            raise ValueError("Empty search query")
+        page = max(page, 1)
+
+        conditions = ["message_fts MATCH ?"]
+        params = [match]
+        filters = dict(zip(_FILTER_COLUMNS, (speaker, provider, model, session_id)))
+        for column, value in filters.items():
+            if value is not None:
+                conditions.append(f"m.{column} = ?")
+                params.append(value)
+        where = " AND ".join(conditions)
+
+        # message_fts drives the join: only matching rows are ever looked up
+        source = f"FROM message_fts CROSS JOIN messages m ON m.id = message_fts.rowid WHERE {where}"
+        total = self.conn.execute(f"SELECT count(*) {source}", params).fetchone()[0]
+        ranked = total <= self.rank_limit
+        if ranked:
+            candidates = f"SELECT m.id, bm25(message_fts) AS score {source}"
+            candidate_params = params
+        else:
+            # Rank the latest matches only; FTS5 stops after rank_limit rows
+            candidates = (f"SELECT m.id, bm25(message_fts) AS score {source} "
+                          f"ORDER BY message_fts.rowid DESC LIMIT ?")
+            candidate_params = params + [self.rank_limit]
+        hits = self.conn.execute(
+            f"SELECT id, score FROM ({candidates}) ORDER BY score, id LIMIT ? OFFSET ?",
+            candidate_params + [per_page, (page - 1) * per_page]
+        ).fetchall()
+
+        # Snippets and session details only for the rows on this page
+        details = {}
+        if hits:
+            placeholders = ', '.join('?' * len(hits))
+            for row in self.conn.execute(
+                    f"""
+                    SELECT m.id, m.session_id, s.filename, s.started, m.message_order, m.speaker,
+                           m.timestamp, m.provider, m.model,
+                           snippet(message_fts, 0, '**', '**', '...', 16)
+                    FROM message_fts
+                    CROSS JOIN messages m ON m.id = message_fts.rowid
+                    LEFT JOIN sessions s ON s.session_id = m.session_id
+                    WHERE message_fts MATCH ? AND message_fts.rowid IN ({placeholders})
+                    """,
+                    [match] + [message_id for message_id, score in hits]):
+                details[row[0]] = row[1:]
+
+        keys = ('session_id', 'filename', 'started', 'order', 'speaker', 'timestamp',
+                'provider', 'model', 'snippet')
+        results = []
+        for message_id, score in hits:
+            result = dict(zip(keys, details[message_id]))
+            result['score'] = score
+            results.append(result)
+        return {
+            'query': query,
+            'total': total,
+            'page': page,
+            'per_page': per_page,
+            'ranked': ranked,
+            'ranked_matches': min(total, self.rank_limit),
+            'results': results,
+        }
+
+
+# Usage example
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Search ingested Chat Bridge messages.')
+    parser.add_argument('query', help='Words and "quoted phrases" to search for')
+    parser.add_argument('--directory', default='.',
+                        help='Folder containing the transcripts (default: current directory)')
+    parser.add_argument('--speaker')
+    parser.add_argument('--provider')
+    parser.add_argument('--model')
+    parser.add_argument('--session')
+    parser.add_argument('--page', type=int, default=1)
+    parser.add_argument('--per-page', type=int, default=20)
+    args = parser.parse_args()
+
+    index = SearchIndex(Path(args.directory) / SEARCH_INDEX_FILENAME)
+    try:
+        page = index.search(args.query, speaker=args.speaker, provider=args.provider,
+                            model=args.model, session_id=args.session,
+                            page=args.page, per_page=args.per_page)
+    finally:
+        index.close()
+
+    if page['ranked']:
+        print(f"{page['total']} matches (page {page['page']})")
+    else:
+        print(f"{page['total']} matches, best of the {page['ranked_matches']} most recently "
+              f"indexed shown (page {page['page']}); narrow the query to rank them all")
+    for result in page['results']:
+        print(f"\n{result['filename']} #{result['order']} {result['speaker']} ({result['timestamp']})")
+        print(f"  {result['snippet']}")
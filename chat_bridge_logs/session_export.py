@@ -0,0 +1,332 @@
+"""
+Stream sessions out of the database as Chat Bridge markdown, NDJSON or CSV.
+
+Rows are read through unbuffered (server-side) cursors in small batches and
+written out as they arrive, so exporting the largest sessions or the whole
+corpus runs in constant memory:
+
+    markdown   the transcript as Chat Bridge writes it; parse_markdown_file
+               on the export gives back the stored rows. Into a folder,
+               every session becomes its own <session_id>.md; into a file
+               (or stdout) the sessions follow one another
+    ndjson     a {"type": "session", ...} line per session, with its agents,
+               followed by a {"type": "message", ...} line per message
+    csv        one row per message, with the session's start time and the
+               speaking agent's provider and model
+
+Sessions (joined with their agents) are read on one connection and messages
+on a second, both ordered by session_id, and merged as they stream in.
+
+    processor = ChatBridgeProcessor(db_config)
+    processor.export_sessions('october.ndjson', 'ndjson', since='2025-10-01')
+
+Usage:
+    python process_logs.py --export markdown --session conv_20251006_095749 --output -
+    python process_logs.py --export csv --since 2025-10-01 --provider openai --output oct.csv
+    python process_logs.py --export markdown --output exported/
+"""
+import csv
+import json
+import os
+import sys
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, IO, Iterable, Iterator, List, Optional, Tuple
+
+from lazy_import import lazy_import
+
+mysql = lazy_import('mysql.connector')
+
+FORMATS = ('markdown', 'ndjson', 'csv')
+CSV_COLUMNS = ('session_id', 'started_at', 'message_order', 'speaker', 'provider', 'model',
+               'timestamp', 'content')
+
+_AGENT_FIELDS = ('provider', 'model', 'temperature', 'persona', 'system_prompt')
+
+_SESSIONS_SQL = """
+SELECT s.session_id, s.started_at, s.conversation_starter, s.max_rounds, s.memory_rounds,
+       s.stop_word_detection, s.stop_words,
+       a.provider, a.model, a.temperature, a.persona, a.system_prompt,
+       b.provider, b.model, b.temperature, b.persona, b.system_prompt
+FROM sessions s
+LEFT JOIN agents a ON a.session_id = s.session_id AND a.agent_label = 'A'
+LEFT JOIN agents b ON b.session_id = s.session_id AND b.agent_label = 'B'
+{where}
+ORDER BY s.session_id
+"""
+
+_MESSAGES_SQL = """
+SELECT m.session_id, m.message_order, m.speaker, m.timestamp, m.content
+FROM messages m
+JOIN sessions s ON s.session_id = m.session_id
+{where}
+ORDER BY m.session_id, m.message_order
+"""
+
+# Rows fetched per round trip from the unbuffered cursors
+_FETCH_ROWS = 500
+
+
+def _where(session_ids: Optional[List[str]], since: Optional[str], until: Optional[str],
+           provider: Optional[str], model: Optional[str]) -> Tuple[str, list]:
+    """WHERE clause (on sessions s) and its parameters for the export filters."""
+    conditions = []
+    params: list = []
+    if session_ids:
+        conditions.append(f"s.session_id IN ({', '.join(['%s'] * len(session_ids))})")
+        params.extend(session_ids)
+    if since:
+        conditions.append("s.started_at >= %s")
+        params.append(since)
+    if until:
+        conditions.append("s.started_at < %s")
+        params.append(until)
+    if provider or model:
+        agent = ["f.session_id = s.session_id"]
+        if provider:
+            agent.append("f.provider = %s")
+            params.append(provider)
+        if model:
+            agent.append("f.model = %s")
+            params.append(model)
+        conditions.append(f"EXISTS (SELECT 1 FROM agents f WHERE {' AND '.join(agent)})")
+    return ("WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+
+def _stream(cursor, query: str, params: list) -> Iterator[tuple]:
+    cursor.execute(query, params)
+    while True:
+        rows = cursor.fetchmany(_FETCH_ROWS)
+        if not rows:
+            return
+        yield from rows
+
+
+def _text(value) -> str:
+    """A stored value as it appears in a transcript (DATETIMEs without fractions)."""
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return str(value)
+
+
+def _session(row: tuple) -> Tuple[Dict, List[Dict]]:
+    """Session and agents of a _SESSIONS_SQL row, shaped like parse_markdown_file's result."""
+    session = {
+        'session_id': row[0],
+        'started_at': _text(row[1]) or None,
+        'conversation_starter': row[2],
+        'max_rounds': row[3],
+        'memory_rounds': row[4],
+        'stop_word_detection': bool(row[5]),
+        'stop_words': row[6],
+    }
+    agents = []
+    for label, start in (('A', 7), ('B', 12)):
+        agent = {'label': label}
+        agent.update(zip(_AGENT_FIELDS, row[start:start + len(_AGENT_FIELDS)]))
+        agents.append(agent)
+    return session, agents
+
+
+def _merge(session_rows: Iterable[tuple],
+           message_rows: Iterable[tuple]) -> Iterator[Tuple[tuple, Iterator[tuple]]]:
+    """
+    Pair every session row with an iterator over its message rows.
+
+    Both streams are ordered by session_id. Messages of a session missing
+    from the session stream (written between the two queries) are skipped.
+    """
+    message_rows = iter(message_rows)
+    pending = next(message_rows, None)
+
+    def messages_of(session_id):
+        nonlocal pending
+        while pending is not None and pending[0] < session_id:
+            pending = next(message_rows, None)
+        while pending is not None and pending[0] == session_id:
+            yield pending
+            pending = next(message_rows, None)
+
+    for row in session_rows:
+        messages = messages_of(row[0])
+        yield row, messages
+        # Skip whatever the writer left unread, to stay aligned
+        for _ in messages:
+            pass
+
+
+def write_markdown(out: IO[str], session: Dict, agents: List[Dict],
+                   messages: Iterable[tuple]) -> int:
+    """Write one session as a Chat Bridge transcript; returns the number of messages."""
+    out.write("# Chat Bridge Session\n\n"
+              f"**Session ID:** {_text(session['session_id'])}\n"
+              f"**Started:** {_text(session['started_at'])}\n"
+              f"**Conversation Starter:** {_text(session['conversation_starter'])}\n\n"
+              "## Agent Configuration\n\n")
+    for agent in agents:
+        label = agent['label']
+        out.write(f"**Agent {label} Provider:** {_text(agent['provider'])}\n"
+                  f"**Agent {label} Model:** {_text(agent['model'])}\n"
+                  f"**Agent {label} Temperature:** {_text(agent['temperature'])}\n"
+                  f"**Agent {label} Persona:** {_text(agent['persona'])}\n"
+                  f"**Agent {label} System Prompt:** {_text(agent['system_prompt'])}\n\n")
+    # No "## Session Settings" heading: the last system prompt runs on to the
+    # next "**" line when parsed, so the stored prompt already ends with it
+    out.write(f"**Max Rounds:** {_text(session['max_rounds'])}\n"
+              f"**Memory Rounds:** {_text(session['memory_rounds'])}\n"
+              f"**Stop Word Detection:** {'Enabled' if session['stop_word_detection'] else 'Disabled'}\n"
+              f"**Stop Words:** {_text(session['stop_words'])}\n\n"
+              "## Conversation\n\n")
+    tags = {f"Agent {agent['label']}": f"<sub>{agent['provider']} · {agent['model']}</sub>\n"
+            for agent in agents if agent['provider'] and agent['model']}
+    count = 0
+    for _, _, speaker, timestamp, content in messages:
+        content = content or ''
+        if content.startswith('<sub'):
+            # Parsing strips a leading <sub> tag off the body; give it an empty one to strip
+            content = '<sub></sub>' + content
+        out.write(f"### {speaker} ({_text(timestamp)})\n{tags.get(speaker, '')}\n{content}\n\n")
+        count += 1
+    return count
+
+
+def _message_record(order: int, speaker: str, timestamp, content: str) -> Dict:
+    return {
+        'message_order': order,
+        'speaker': speaker,
+        'timestamp': _text(timestamp) or None,
+        'content': content,
+    }
+
+
+def write_ndjson(out: IO[str], session: Dict, agents: List[Dict],
+                 messages: Iterable[tuple], nested: bool = False) -> int:
+    """
+    Write a session line and one line per message; returns the number of messages.
+
+    nested: Write the messages into the session line instead, as its
+        "messages" list (one line per session)
+    """
+    record = {'type': 'session'}
+    record.update(session)
+    record['agents'] = agents
+    if nested:
+        record['messages'] = [_message_record(*row[1:]) for row in messages]
+        out.write(json.dumps(record, ensure_ascii=False, default=_text) + '\n')
+        return len(record['messages'])
+    out.write(json.dumps(record, ensure_ascii=False, default=_text) + '\n')
+    count = 0
+    for row in messages:
+        line = {'type': 'message', 'session_id': row[0]}
+        line.update(_message_record(*row[1:]))
+        out.write(json.dumps(line, ensure_ascii=False) + '\n')
+        count += 1
+    return count
+
+
+def write_csv_rows(writer, session: Dict, agents: List[Dict], messages: Iterable[tuple]) -> int:
+    """Write one CSV row (CSV_COLUMNS) per message; returns the number of messages."""
+    models = {f"Agent {agent['label']}": (agent['provider'], agent['model']) for agent in agents}
+    count = 0
+    for session_id, order, speaker, timestamp, content in messages:
+        provider, model = models.get(speaker, (None, None))
+        writer.writerow((session_id, _text(session['started_at']), order, speaker,
+                         _text(provider), _text(model), _text(timestamp), content or ''))
+        count += 1
+    return count
+
+
+@contextmanager
+def _output(path: str) -> Iterator[IO[str]]:
+    """stdout for '-'; otherwise a file that only appears once it is complete."""
+    if path == '-':
+        yield sys.stdout
+        sys.stdout.flush()
+        return
+    tmp_path = f"{path}.tmp"
+    # newline='' so the csv module's \r\n row endings are written unchanged
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        yield f
+    os.replace(tmp_path, path)
+
+
+def export_rows(session_rows: Iterable[tuple], message_rows: Iterable[tuple], output: str = '-',
+                fmt: str = 'markdown') -> Tuple[int, int]:
+    """
+    Write merged _SESSIONS_SQL and _MESSAGES_SQL rows to output.
+
+    With fmt='markdown' and a folder as output (an existing folder, or a path
+    ending in a separator), every session gets its own <session_id>.md.
+
+    Returns:
+        (sessions, messages) exported
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    sessions = messages = 0
+    if fmt == 'markdown' and output != '-' and (output.endswith(os.sep) or os.path.isdir(output)):
+        folder = Path(output)
+        folder.mkdir(parents=True, exist_ok=True)
+        for row, rows in _merge(session_rows, message_rows):
+            session, agents = _session(row)
+            with _output(str(folder / f"{Path(session['session_id']).name}.md")) as out:
+                messages += write_markdown(out, session, agents, rows)
+            sessions += 1
+        return sessions, messages
+
+    with _output(output) as out:
+        writer = None
+        if fmt == 'csv':
+            writer = csv.writer(out)
+            writer.writerow(CSV_COLUMNS)
+        for row, rows in _merge(session_rows, message_rows):
+            session, agents = _session(row)
+            if fmt == 'markdown':
+                messages += write_markdown(out, session, agents, rows)
+            elif fmt == 'ndjson':
+                messages += write_ndjson(out, session, agents, rows)
+            else:
+                messages += write_csv_rows(writer, session, agents, rows)
+            sessions += 1
+    return sessions, messages
+
+
+def export_sessions(db_config: Dict, output: str = '-', fmt: str = 'markdown',
+                    session_ids: Optional[List[str]] = None, since: Optional[str] = None,
+                    until: Optional[str] = None, provider: Optional[str] = None,
+                    model: Optional[str] = None) -> Tuple[int, int]:
+    """
+    Export sessions from the database.
+
+    Args:
+        db_config: mysql.connector connection arguments
+        output: File, folder (markdown only) or '-' for stdout
+        fmt: 'markdown', 'ndjson' or 'csv'
+        session_ids: Only these sessions
+        since, until: Only sessions started in [since, until)
+        provider, model: Only sessions with an agent of this provider and/or model
+
+    Returns:
+        (sessions, messages) exported
+    """
+    where, params = _where(session_ids, since, until, provider, model)
+    connections = []
+    try:
+        # An unbuffered cursor holds its connection until drained, so the two
+        # streams need a connection each
+        for _ in range(2):
+            connections.append(mysql.connector.connect(**db_config))
+        session_cursor = connections[0].cursor(buffered=False)
+        message_cursor = connections[1].cursor(buffered=False)
+        return export_rows(_stream(session_cursor, _SESSIONS_SQL.format(where=where), params),
+                           _stream(message_cursor, _MESSAGES_SQL.format(where=where), params),
+                           output, fmt)
+    finally:
+        for conn in connections:
+            try:
+                conn.close()
+            except mysql.connector.Error:
+                pass
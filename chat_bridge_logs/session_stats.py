@@ -0,0 +1,236 @@
+"""
+Per-session analytics rollups, computed while a transcript is being ingested.
+
+For every session the processor writes one session_stats row per speaker
+(Human, Agent A, Agent B) plus a '*' row for the whole session:
+
+    messages, characters, avg_characters, code_blocks
+    responses, response_avg, response_p50/p90/p99, response_max
+        seconds between a message and the previous message by another
+        speaker, from the `### Speaker (timestamp)` headers
+    first_message_at, last_message_at
+
+so dashboard questions such as message counts per speaker or average reply
+length by model are primary key lookups instead of GROUP BY scans over
+messages. Percentiles come from a histogram of response times (exact below
+two minutes, 5% buckets above; averages and maxima are exact), which makes
+the stats mergeable: the watcher keeps the state of a transcript's settled
+messages in the manifest and only adds the newly written messages to it.
+"""
+import math
+import re
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from message_batch import SPEAKERS, MessageBatch
+
+SESSION_STATS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS session_stats (
+    session_id VARCHAR(64) NOT NULL,
+    speaker VARCHAR(16) NOT NULL,
+    provider VARCHAR(64),
+    model VARCHAR(128),
+    messages INT NOT NULL,
+    characters BIGINT NOT NULL,
+    avg_characters DOUBLE,
+    code_blocks INT NOT NULL,
+    responses INT NOT NULL,
+    response_avg DOUBLE,
+    response_p50 INT,
+    response_p90 INT,
+    response_p99 INT,
+    response_max INT,
+    first_message_at DATETIME,
+    last_message_at DATETIME,
+    PRIMARY KEY (session_id, speaker),
+    KEY idx_speaker (speaker, session_id)
+)
+"""
+
+STATS_COLUMNS = ('session_id', 'speaker', 'provider', 'model', 'messages', 'characters',
+                 'avg_characters', 'code_blocks', 'responses', 'response_avg', 'response_p50',
+                 'response_p90', 'response_p99', 'response_max', 'first_message_at',
+                 'last_message_at')
+
+_STATS_INSERT_SQL = f"""
+INSERT INTO session_stats
+({', '.join(STATS_COLUMNS)})
+VALUES ({', '.join(['%s'] * len(STATS_COLUMNS))})
+"""
+
+_STATS_DELETE_SQL = "DELETE FROM session_stats WHERE session_id = %s"
+
+# Speaker key of the whole-session row
+ALL_SPEAKERS = '*'
+
+_FENCE_RE = re.compile(r'^```', re.MULTILINE)
+# Response times from this many seconds on share 5% wide histogram buckets
+_EXACT_SECONDS = 120
+_BUCKET_BASE = math.log(1.05)
+
+
+def _bucket(seconds: int) -> int:
+    """Histogram key for a response time: itself if short, else its bucket's representative value."""
+    if seconds < _EXACT_SECONDS:
+        return seconds
+    return int(round(math.exp(round(math.log(seconds) / _BUCKET_BASE) * _BUCKET_BASE)))
+
+
+def _parse_timestamp(timestamp: str) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError):
+        return None
+
+
+class _Rollup:
+    """Mergeable counters for one speaker (or the whole session)."""
+
+    __slots__ = ('messages', 'characters', 'code_blocks', 'response_total', 'response_max',
+                 'histogram', 'first', 'last')
+
+    def __init__(self):
+        self.messages = 0
+        self.characters = 0
+        self.code_blocks = 0
+        self.response_total = 0
+        self.response_max: Optional[int] = None
+        self.histogram: Dict[int, int] = {}
+        self.first: Optional[str] = None
+        self.last: Optional[str] = None
+
+    def add(self, content: str, timestamp: str, response: Optional[int]):
+        self.messages += 1
+        self.characters += len(content)
+        if '```' in content:
+            self.code_blocks += len(_FENCE_RE.findall(content)) // 2
+        if response is not None:
+            self.response_total += response
+            if self.response_max is None or response > self.response_max:
+                self.response_max = response
+            key = _bucket(response)
+            self.histogram[key] = self.histogram.get(key, 0) + 1
+        if self.first is None:
+            self.first = timestamp
+        self.last = timestamp
+
+    def percentile(self, fraction: float) -> Optional[int]:
+        """Nearest-rank percentile of the response times."""
+        total = sum(self.histogram.values())
+        if not total:
+            return None
+        rank = max(math.ceil(fraction * total), 1)
+        seen = 0
+        for seconds in sorted(self.histogram):
+            seen += self.histogram[seconds]
+            if seen >= rank:
+                return seconds
+        return None
+
+    def row(self, session_id: str, speaker: str, provider: Optional[str], model: Optional[str]) -> tuple:
+        responses = sum(self.histogram.values())
+        return (
+            session_id, speaker, provider, model, self.messages, self.characters,
+            self.characters / self.messages if self.messages else None,
+            self.code_blocks, responses,
+            self.response_total / responses if responses else None,
+            self.percentile(0.5), self.percentile(0.9), self.percentile(0.99),
+            self.response_max, self.first, self.last,
+        )
+
+    def state(self) -> List:
+        return [self.messages, self.characters, self.code_blocks, self.response_total,
+                self.response_max, {str(seconds): count for seconds, count in self.histogram.items()},
+                self.first, self.last]
+
+    @classmethod
+    def from_state(cls, state: List) -> '_Rollup':
+        rollup = cls()
+        (rollup.messages, rollup.characters, rollup.code_blocks, rollup.response_total,
+         rollup.response_max, histogram, rollup.first, rollup.last) = state
+        rollup.histogram = {int(seconds): count for seconds, count in histogram.items()}
+        return rollup
+
+
+class SessionStats:
+    """
+    Accumulates the rollups of one session, message by message.
+
+    Messages must be added in order. to_state() / from_state() save and
+    restore the accumulator as JSON-serializable data, so more messages can
+    be added in a later run.
+    """
+
+    def __init__(self, agents: Optional[Dict[str, Tuple[Optional[str], Optional[str]]]] = None):
+        # speaker -> (provider, model)
+        self.agents = agents or {}
+        self.rollups: Dict[str, _Rollup] = {}
+        self.last_speaker: Optional[str] = None
+        self.last_time: Optional[datetime] = None
+
+    @classmethod
+    def for_agents(cls, agents: List[Dict]) -> 'SessionStats':
+        """Start the stats of a session from its parsed agent configurations."""
+        return cls({f"Agent {agent['label']}": (agent['provider'], agent['model']) for agent in agents})
+
+    @classmethod
+    def from_data(cls, data: Dict) -> 'SessionStats':
+        """Stats of a whole parsed transcript."""
+        stats = cls.for_agents(data['agents'])
+        stats.add_messages(data['messages'])
+        return stats
+
+    def add_messages(self, messages: Iterable):
+        """Add messages (a MessageBatch or message dicts), which must follow those added so far."""
+        total = self.rollups.setdefault(ALL_SPEAKERS, _Rollup())
+        for order, speaker, timestamp, content in MessageBatch.coerce(messages).columns():
+            time = _parse_timestamp(timestamp)
+            response = None
+            if (time is not None and self.last_time is not None
+                    and self.last_speaker is not None and speaker != self.last_speaker):
+                seconds = int((time - self.last_time).total_seconds())
+                if seconds >= 0:
+                    response = seconds
+            rollup = self.rollups.get(speaker)
+            if rollup is None:
+                rollup = self.rollups[speaker] = _Rollup()
+            rollup.add(content, timestamp, response)
+            total.add(content, timestamp, response)
+            self.last_speaker = speaker
+            if time is not None:
+                self.last_time = time
+
+    def rows(self, session_id: str) -> List[tuple]:
+        """session_stats rows: the '*' row first, then one per speaker that has messages."""
+        rows = []
+        for speaker in (ALL_SPEAKERS,) + SPEAKERS:
+            rollup = self.rollups.get(speaker)
+            if rollup is None or not rollup.messages:
+                continue
+            provider, model = self.agents.get(speaker, (None, None))
+            rows.append(rollup.row(session_id, speaker, provider, model))
+        return rows
+
+    def to_state(self) -> Dict:
+        return {
+            'agents': {speaker: list(agent) for speaker, agent in self.agents.items()},
+            'rollups': {speaker: rollup.state() for speaker, rollup in self.rollups.items()},
+            'last_speaker': self.last_speaker,
+            'last_time': self.last_time.isoformat(sep=' ') if self.last_time else None,
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict) -> 'SessionStats':
+        stats = cls({speaker: tuple(agent) for speaker, agent in state['agents'].items()})
+        stats.rollups = {speaker: _Rollup.from_state(rollup)
+                         for speaker, rollup in state['rollups'].items()}
+        stats.last_speaker = state['last_speaker']
+        stats.last_time = _parse_timestamp(state['last_time']) if state['last_time'] else None
+        return stats
+
+
+def stats_statements(session_id: str, stats: SessionStats) -> List[Tuple[str, tuple]]:
+    """The statements that replace a session's session_stats rows."""
+    statements = [(_STATS_DELETE_SQL, (session_id,))]
+    statements += [(_STATS_INSERT_SQL, row) for row in stats.rows(session_id)]
+    return statements
@@ -0,0 +1,439 @@
+"""
+Near-duplicate detection with MinHash signatures and an LSH index.
+
+Many sessions are reruns of the same conversation starter with other
+persona pairs. To find out which runs are near-identical and where they
+diverged without comparing message bodies pairwise, every message gets a
+MinHash signature of its word shingles when it is indexed, and every
+session the bin-wise minimum of its messages' signatures (which is the
+signature of all its shingles together). Signatures are cut into bands
+and each band hashed into an LSH bucket, so sessions sharing a bucket
+with session X are the only candidates that need comparing with it.
+
+The tables live in the full-text search index (.search_index.sqlite),
+which keeps them up to date as transcripts are ingested: SearchIndex hands
+every batch of messages it indexes to SimilarityIndex.
+
+    index = SearchIndex('chat_bridge_logs/.search_index.sqlite')
+    index.similarity.similar_sessions('conv_20251006_095749', threshold=0.6)
+    index.similarity.compare_sessions('conv_20251006_095749', 'conv_20251006_101204')
+
+Signatures use one-permutation hashing: each shingle is hashed once, the
+top bits of the hash pick one of NUM_BINS bins and the bin keeps the
+smallest remaining bits seen. The share of equal bins estimates the
+Jaccard similarity of two shingle sets like NUM_BINS separate hash
+functions would, at the cost of one hash per shingle. Sessions are cut
+into SESSION_BANDS bands, so sessions with a similarity around 0.5 and up
+share a bucket; messages into fewer, wider MESSAGE_BANDS, which keeps
+their (many more) buckets down to near-identical messages, from about 0.9.
+
+Usage:
+    python similarity_index.py similar conv_20251006_095749 [--threshold 0.5] [--limit 20]
+    python similarity_index.py compare conv_20251006_095749 conv_20251006_101204
+    python similarity_index.py groups [--threshold 0.8]
+    python similarity_index.py catch-up
+"""
+import re
+import sqlite3
+import zlib
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+NUM_BINS = 64
+SESSION_BANDS = 16
+MESSAGE_BANDS = 4
+# Consecutive words per shingle
+SHINGLE_WORDS = 3
+# Messages with fewer shingles ("Yes, exactly.") get a signature but no LSH
+# buckets: they would all land in the same few buckets
+MIN_MESSAGE_SHINGLES = 8
+
+_BIN_BITS = 6  # log2(NUM_BINS)
+_VALUE_BITS = 32 - _BIN_BITS
+_VALUE_MASK = (1 << _VALUE_BITS) - 1
+# Value of a bin no shingle fell into; larger than any real value
+_EMPTY = 0xFFFFFFFF
+# Knuth's multiplicative constant, to spread CRC-32 values over the bins
+_MIX = 0x9E3779B1
+_WORD_RE = re.compile(r'\w+')
+
+_SCHEMA = [
+    # Signatures are array('I', ...) bytes; message ids are messages.id
+    "CREATE TABLE IF NOT EXISTS message_minhash (id INTEGER PRIMARY KEY, signature BLOB NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS session_minhash (session_id TEXT PRIMARY KEY, signature BLOB NOT NULL)",
+    # Buckets are band_keys() values
+    """
+    CREATE TABLE IF NOT EXISTS session_lsh (
+        bucket INTEGER NOT NULL,
+        session_id TEXT NOT NULL,
+        PRIMARY KEY (bucket, session_id)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS message_lsh (
+        bucket INTEGER NOT NULL,
+        id INTEGER NOT NULL,
+        PRIMARY KEY (bucket, id)
+    ) WITHOUT ROWID
+    """,
+]
+
+
+def minhash(text: str) -> Tuple[array, int]:
+    """
+    MinHash signature of the word shingles of text.
+
+    Returns:
+        (signature, number of shingles); texts shorter than a shingle count
+        as one shingle, empty texts have an all-empty signature
+    """
+    # Encoded in one go; words never contain the whitespace split() cuts at
+    words = ' '.join(_WORD_RE.findall(text.lower())).encode('utf-8').split()
+    if len(words) < SHINGLE_WORDS:
+        shingles = [b' '.join(words)] if words else []
+    else:
+        shingles = map(b' '.join, zip(*(words[i:] for i in range(SHINGLE_WORDS))))
+    signature = array('I', [_EMPTY]) * NUM_BINS
+    count = 0
+    for shingle in shingles:
+        value = (zlib.crc32(shingle) * _MIX) & 0xFFFFFFFF
+        position = value >> _VALUE_BITS
+        value &= _VALUE_MASK
+        if value < signature[position]:
+            signature[position] = value
+        count += 1
+    return signature, count
+
+
+def merge(signatures: Iterable[Sequence[int]]) -> array:
+    """Signature of the union of the shingle sets of signatures (bin-wise minimum)."""
+    merged = array('I', [_EMPTY]) * NUM_BINS
+    for signature in signatures:
+        merged = array('I', map(min, merged, signature))
+    return merged
+
+
+def similarity(a: Sequence[int], b: Sequence[int]) -> float:
+    """Estimated Jaccard similarity of the shingle sets of two signatures."""
+    equal = used = 0
+    for x, y in zip(a, b):
+        if x != _EMPTY or y != _EMPTY:
+            used += 1
+            equal += x == y
+    return equal / used if used else 0.0
+
+
+def band_keys(signature: Sequence[int], bands: int = SESSION_BANDS) -> List[int]:
+    """
+    LSH bucket of every band of a signature: band number << 32 | band hash.
+
+    Empty bins borrow the value of the next non-empty bin (plus how far
+    away it is), so short texts still collide with similar ones.
+    """
+    dense = array('I', signature)
+    nearest = None
+    # Two passes backwards, so the bins after the last filled one wrap around
+    for i in range(2 * NUM_BINS - 1, -1, -1):
+        if signature[i % NUM_BINS] != _EMPTY:
+            nearest = i
+        elif i < NUM_BINS and nearest is not None:
+            dense[i] = signature[nearest % NUM_BINS] + ((nearest - i) << _VALUE_BITS)
+    if nearest is None:
+        return []
+    rows = NUM_BINS // bands
+    return [band << 32 | zlib.crc32(dense[band * rows:(band + 1) * rows].tobytes())
+            for band in range(bands)]
+
+
+def _signature(blob: bytes) -> array:
+    signature = array('I')
+    signature.frombytes(blob)
+    return signature
+
+
+class SimilarityIndex:
+    def __init__(self, conn: sqlite3.Connection):
+        """
+        MinHash signatures and LSH buckets in the search index database.
+
+        Creates the tables if needed and, when it does, signs the messages
+        indexed before they existed. From then on every message is signed
+        as it is indexed, so opening an index never scans its messages.
+        """
+        self.conn = conn
+        with self.conn:
+            created = self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'message_minhash'").fetchone() is None
+            for statement in _SCHEMA:
+                self.conn.execute(statement)
+            if created:
+                self.catch_up()
+
+    # Maintenance, called by SearchIndex inside its transactions
+
+    def remove_messages(self, message_ids: List[int]):
+        """Drop the signatures and buckets of messages that are being replaced."""
+        for message_id in message_ids:
+            row = self.conn.execute("SELECT signature FROM message_minhash WHERE id = ?",
+                                    (message_id,)).fetchone()
+            if row is None:
+                continue
+            self.conn.executemany("DELETE FROM message_lsh WHERE bucket = ? AND id = ?",
+                                  [(key, message_id) for key in band_keys(_signature(row[0]), MESSAGE_BANDS)])
+            self.conn.execute("DELETE FROM message_minhash WHERE id = ?", (message_id,))
+
+    def add_messages(self, session_id: str, bodies: Iterable[Tuple[int, str]]):
+        """Sign messages (id, content) of a session and re-sign the session."""
+        signatures = []
+        buckets = []
+        for message_id, content in bodies:
+            signature, shingles = minhash(content or '')
+            signatures.append((message_id, signature.tobytes()))
+            if shingles >= MIN_MESSAGE_SHINGLES:
+                buckets.extend((key, message_id) for key in band_keys(signature, MESSAGE_BANDS))
+        self.conn.executemany("INSERT OR REPLACE INTO message_minhash VALUES (?, ?)", signatures)
+        self.conn.executemany("INSERT OR IGNORE INTO message_lsh VALUES (?, ?)", buckets)
+        self.update_session(session_id)
+
+    def update_session(self, session_id: str):
+        """Recompute a session's signature from its messages' and rebucket it."""
+        old = self.conn.execute("SELECT signature FROM session_minhash WHERE session_id = ?",
+                                (session_id,)).fetchone()
+        if old is not None:
+            self.conn.executemany(
+                "DELETE FROM session_lsh WHERE bucket = ? AND session_id = ?",
+                [(key, session_id) for key in band_keys(_signature(old[0]))])
+        signature = merge(_signature(blob) for blob, in self.conn.execute(
+            "SELECT h.signature FROM messages m JOIN message_minhash h ON h.id = m.id "
+            "WHERE m.session_id = ?", (session_id,)))
+        self.conn.execute("INSERT OR REPLACE INTO session_minhash VALUES (?, ?)",
+                          (session_id, signature.tobytes()))
+        self.conn.executemany("INSERT OR IGNORE INTO session_lsh VALUES (?, ?)",
+                              [(key, session_id) for key in band_keys(signature)])
+
+    def catch_up(self) -> int:
+        """
+        Sign every indexed message that has no signature yet; returns how many.
+
+        Scans all messages: runs when the tables are created, and on demand
+        (`python similarity_index.py catch-up`).
+        """
+        missing = self.conn.execute(
+            "SELECT m.id, m.session_id, f.content FROM messages m "
+            "JOIN message_fts f ON f.rowid = m.id "
+            "WHERE m.id NOT IN (SELECT id FROM message_minhash) ORDER BY m.session_id"
+        ).fetchall()
+        by_session: Dict[str, List[Tuple[int, str]]] = {}
+        for message_id, session_id, content in missing:
+            by_session.setdefault(session_id, []).append((message_id, content))
+        for session_id, bodies in by_session.items():
+            self.add_messages(session_id, bodies)
+        return len(missing)
+
+    # Queries
+
+    def session_signature(self, session_id: str) -> Optional[array]:
+        row = self.conn.execute("SELECT signature FROM session_minhash WHERE session_id = ?",
+                                (session_id,)).fetchone()
+        return _signature(row[0]) if row else None
+
+    def similar_sessions(self, session_id: str, threshold: float = 0.5,
+                         limit: Optional[int] = 20) -> List[Dict]:
+        """
+        Sessions whose content is similar to that of session_id.
+
+        Only sessions sharing an LSH bucket with it are compared, so the
+        cost depends on the number of near matches, not the corpus size.
+        Pairs well below a similarity of 0.5 rarely share a bucket and are
+        missed even with a lower threshold.
+
+        Returns:
+            [{'session_id', 'filename', 'started', 'similarity'}], most
+            similar first
+        """
+        signature = self.session_signature(session_id)
+        if signature is None:
+            raise KeyError(f"Session not in the similarity index: {session_id}")
+        keys = band_keys(signature)
+        if not keys:
+            return []
+        rows = self.conn.execute(
+            f"""
+            SELECT h.session_id, h.signature, s.filename, s.started
+            FROM session_minhash h LEFT JOIN sessions s ON s.session_id = h.session_id
+            WHERE h.session_id IN (SELECT session_id FROM session_lsh
+                                   WHERE bucket IN ({', '.join('?' * len(keys))}))
+              AND h.session_id != ?
+            """, keys + [session_id]).fetchall()
+        results = []
+        for other, blob, filename, started in rows:
+            score = similarity(signature, _signature(blob))
+            if score >= threshold:
+                results.append({'session_id': other, 'filename': filename, 'started': started,
+                                'similarity': round(score, 3)})
+        results.sort(key=lambda result: (-result['similarity'], result['session_id']))
+        return results[:limit] if limit is not None else results
+
+    def similar_messages(self, session_id: str, order: int, threshold: float = 0.9,
+                         limit: Optional[int] = 20) -> List[Dict]:
+        """
+        Messages of any session near-identical to message `order` of session_id.
+
+        Message buckets are shared from a similarity of about 0.9 on (see
+        MESSAGE_BANDS), so lower thresholds find little more.
+
+        Returns:
+            [{'session_id', 'order', 'speaker', 'similarity'}], most similar
+            first; nothing for messages too short to be bucketed
+        """
+        row = self.conn.execute(
+            "SELECT m.id, h.signature FROM messages m JOIN message_minhash h ON h.id = m.id "
+            "WHERE m.session_id = ? AND m.message_order = ?", (session_id, order)).fetchone()
+        if row is None:
+            raise KeyError(f"Message not in the similarity index: {session_id} #{order}")
+        message_id, signature = row[0], _signature(row[1])
+        keys = band_keys(signature, MESSAGE_BANDS)
+        if not keys or self.conn.execute("SELECT 1 FROM message_lsh WHERE bucket = ? AND id = ?",
+                                         (keys[0], message_id)).fetchone() is None:
+            return []
+        results = []
+        for other_session, other_order, speaker, blob in self.conn.execute(
+                f"""
+                SELECT m.session_id, m.message_order, m.speaker, h.signature
+                FROM message_minhash h JOIN messages m ON m.id = h.id
+                WHERE h.id IN (SELECT id FROM message_lsh
+                               WHERE bucket IN ({', '.join('?' * len(keys))}))
+                  AND h.id != ?
+                """, keys + [message_id]):
+            score = similarity(signature, _signature(blob))
+            if score >= threshold:
+                results.append({'session_id': other_session, 'order': other_order,
+                                'speaker': speaker, 'similarity': round(score, 3)})
+        results.sort(key=lambda result: (-result['similarity'], result['session_id'], result['order']))
+        return results[:limit] if limit is not None else results
+
+    def compare_sessions(self, session_a: str, session_b: str, threshold: float = 0.5) -> Dict:
+        """
+        Compare two sessions message by message.
+
+        Returns:
+            {'similarity' (whole sessions), 'messages': [{'order', 'speaker_a',
+            'speaker_b', 'similarity'}] for the orders both sessions have,
+            'diverged_at': first order below threshold, or None}
+        """
+        signatures = []
+        for session_id in (session_a, session_b):
+            signature = self.session_signature(session_id)
+            if signature is None:
+                raise KeyError(f"Session not in the similarity index: {session_id}")
+            signatures.append(signature)
+        rows = self.conn.execute(
+            """
+            SELECT a.message_order, a.speaker, b.speaker, ha.signature, hb.signature
+            FROM messages a
+            JOIN messages b ON b.session_id = ? AND b.message_order = a.message_order
+            JOIN message_minhash ha ON ha.id = a.id
+            JOIN message_minhash hb ON hb.id = b.id
+            WHERE a.session_id = ?
+            ORDER BY a.message_order
+            """, (session_b, session_a)).fetchall()
+        messages = []
+        diverged_at = None
+        for order, speaker_a, speaker_b, blob_a, blob_b in rows:
+            score = similarity(_signature(blob_a), _signature(blob_b))
+            messages.append({'order': order, 'speaker_a': speaker_a, 'speaker_b': speaker_b,
+                             'similarity': round(score, 3)})
+            if diverged_at is None and score < threshold:
+                diverged_at = order
+        return {
+            'similarity': round(similarity(*signatures), 3),
+            'messages': messages,
+            'diverged_at': diverged_at,
+        }
+
+    def near_duplicate_groups(self, threshold: float = 0.8) -> List[List[str]]:
+        """
+        Groups of sessions that are near-identical to one another.
+
+        Sessions sharing a bucket and estimated at least `threshold` similar
+        are joined into one group (transitively).
+
+        Returns:
+            Groups of two or more session IDs, largest first
+        """
+        parent: Dict[str, str] = {}
+
+        def find(session_id):
+            while parent.setdefault(session_id, session_id) != session_id:
+                parent[session_id] = parent[parent[session_id]]
+                session_id = parent[session_id]
+            return session_id
+
+        signatures: Dict[str, array] = {}
+
+        def signature_of(session_id):
+            if session_id not in signatures:
+                signatures[session_id] = self.session_signature(session_id)
+            return signatures[session_id]
+
+        buckets = self.conn.execute(
+            "SELECT group_concat(session_id, char(31)) FROM session_lsh "
+            "GROUP BY bucket HAVING count(*) > 1")
+        for members, in buckets:
+            members = members.split('\x1f')
+            first = members[0]
+            for other in members[1:]:
+                if find(first) != find(other) and \
+                        similarity(signature_of(first), signature_of(other)) >= threshold:
+                    parent[find(other)] = find(first)
+
+        groups: Dict[str, List[str]] = {}
+        for session_id in parent:
+            groups.setdefault(find(session_id), []).append(session_id)
+        return sorted((sorted(group) for group in groups.values() if len(group) > 1),
+                      key=lambda group: (-len(group), group[0]))
+
+
+# Usage example
+if __name__ == "__main__":
+    import argparse
+    import json
+    from pathlib import Path
+
+    from search_index import SEARCH_INDEX_FILENAME, SearchIndex
+
+    parser = argparse.ArgumentParser(description='Find similar and near-duplicate Chat Bridge sessions.')
+    parser.add_argument('command', choices=('similar', 'compare', 'groups', 'catch-up'))
+    parser.add_argument('sessions', nargs='*', help='similar: a session ID; compare: two session IDs')
+    parser.add_argument('--directory', default='.',
+                        help='Folder containing the transcripts (default: current directory)')
+    parser.add_argument('--threshold', type=float,
+                        help='Minimum similarity (default: 0.5; 0.8 for groups)')
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    expected = {'similar': 1, 'compare': 2, 'groups': 0, 'catch-up': 0}[args.command]
+    if len(args.sessions) != expected:
+        parser.error(f"{args.command} takes {expected} session ID(s)")
+
+    index = SearchIndex(Path(args.directory) / SEARCH_INDEX_FILENAME)
+    try:
+        if args.command == 'similar':
+            results = index.similarity.similar_sessions(args.sessions[0], args.threshold or 0.5,
+                                                        args.limit)
+            for result in results:
+                print(f"{result['similarity']:.2f}  {result['session_id']}  {result['filename']}")
+        elif args.command == 'compare':
+            print(json.dumps(index.similarity.compare_sessions(*args.sessions, threshold=args.threshold or 0.5),
+                             indent=2))
+        elif args.command == 'groups':
+            for group in index.similarity.near_duplicate_groups(args.threshold or 0.8):
+                print(f"{len(group)} sessions: {', '.join(group)}")
+        else:
+            with index.conn:
+                signed = index.similarity.catch_up()
+            print(f"Signed {signed} messages")
+    except KeyError as e:
+        print(f"Error: {e.args[0]}")
+    finally:
+        index.close()
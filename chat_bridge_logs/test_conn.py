@@ -50,7 +50,7 @@ def test_database_connection():
             for table in tables:
                 print(f"  - {table[0]}")
         else:
-            print("\n⚠️  No tables found. You may need to run the CREATE TABLE statements.")
+            print("\n⚠️  No tables found. Create them with: python schema.py")
         
         cursor.close()
         conn.close()
@@ -0,0 +1,5 @@
+"""The modules under test sit in the log folder itself, not in a package."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
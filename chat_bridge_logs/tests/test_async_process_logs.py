@@ -0,0 +1,120 @@
+"""
+AsyncChatBridgeProcessor runs the same first-connect steps and writes the
+same statements as the sync processor, driven here through a fake pool.
+
+Usage:
+    python -m pytest tests
+"""
+import asyncio
+from contextlib import asynccontextmanager
+
+from async_process_logs import AsyncChatBridgeProcessor
+from benchmarks.transcripts import generate_transcript
+from process_logs import ChatBridgeProcessor
+from schema import MIGRATIONS, MIGRATIONS_TABLE_SQL
+from session_stats import SESSION_STATS_TABLE_SQL
+
+
+class FakeCursor:
+    def __init__(self, log):
+        self.log = log
+
+    async def execute(self, statement, params=None):
+        self.log.append((' '.join(statement.split()), params))
+
+    async def fetchall(self):
+        # Empty database: no migrations applied, no tables, no stored messages
+        return []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeConnection:
+    def __init__(self, log):
+        self.log = log
+
+    def cursor(self):
+        return FakeCursor(self.log)
+
+    async def commit(self):
+        self.log.append(('commit', None))
+
+    async def rollback(self):
+        self.log.append(('rollback', None))
+
+    def close(self):
+        pass
+
+
+class FakePool:
+    def __init__(self):
+        self.log = []
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield FakeConnection(self.log)
+
+
+def ingest(tmp_path, **options):
+    path = tmp_path / 'transcript.md'
+    path.write_text(generate_transcript(0, 20, 200), encoding='utf-8')
+    pool = FakePool()
+    processor = AsyncChatBridgeProcessor({}, pool=pool, **options)
+
+    async def run():
+        await processor.connect()
+        return await processor.ingest_file(str(path))
+
+    data = asyncio.run(run())
+    assert data is not None
+    expected = ChatBridgeProcessor({}).parse_markdown_file(str(path))
+    assert list(data['messages']) == list(expected['messages'])
+    return data, pool.log
+
+
+def starting(log, prefix):
+    return [(statement, params) for statement, params in log if statement.startswith(prefix)]
+
+
+def test_first_connect_and_insert(tmp_path):
+    data, log = ingest(tmp_path)
+    session_id = data['session']['session_id']
+    statements = [statement for statement, _ in log]
+
+    # Migrations, then the stats table, then the hash column check
+    assert ' '.join(MIGRATIONS_TABLE_SQL.split()) in statements
+    recorded = starting(log, 'INSERT INTO schema_migrations')
+    assert [params[0] for _, params in recorded] == [version for version, _, _ in MIGRATIONS]
+    assert ' '.join(SESSION_STATS_TABLE_SQL.split()) in statements
+    assert 'SELECT content_hash FROM messages LIMIT 0' in statements
+
+    [(_, session)] = starting(log, 'INSERT INTO sessions')
+    assert session[0] == session_id
+    [(_, agents)] = starting(log, 'INSERT INTO agents')
+    assert len(agents) == 7 * len(data['agents'])
+    assert starting(log, 'SELECT message_order, content_hash FROM messages')
+    messages = starting(log, 'INSERT INTO messages (session_id, speaker, timestamp, content, '
+                             'message_order, content_hash)')
+    assert sum(len(params) for _, params in messages) == 6 * len(data['messages'])
+    assert starting(log, 'INSERT INTO session_stats')
+
+    # Everything of the file is committed once, after its last statement
+    assert statements.count('commit') == 1
+    assert statements[-1] == 'commit'
+    assert 'rollback' not in statements
+
+
+def test_without_schema_stats_or_hashes(tmp_path):
+    data, log = ingest(tmp_path, manage_schema=False, session_stats=False, message_hashes=False)
+    statements = [statement for statement, _ in log]
+    assert [statement.split()[0] for statement in statements] == [
+        'INSERT', 'INSERT', 'DELETE', 'INSERT', 'commit']
+    assert statements[0].startswith('INSERT INTO sessions')
+    assert statements[1].startswith('INSERT INTO agents')
+    messages = starting(log, 'INSERT INTO messages (session_id, speaker, timestamp, content, '
+                             'message_order)')
+    assert sum(len(params) for _, params in messages) == 5 * len(data['messages'])
@@ -0,0 +1,113 @@
+"""
+parse_markdown_file (the streaming parser) must give the same result as
+parse_markdown_file_regex, the whole-document reference parser, for the
+benchmark transcripts, the transcripts in the log folder, the real-format
+transcripts in tests/transcripts and transcripts built from the line shapes
+the two parsers are most likely to disagree on.
+
+Usage:
+    python -m pytest tests
+"""
+import random
+from pathlib import Path
+
+import pytest
+
+from benchmarks.transcripts import generate_transcript
+from process_logs import _SKIPPED_FILENAMES, ChatBridgeProcessor
+
+LOG_FOLDER = Path(__file__).resolve().parent.parent
+# Shaped like the archive's transcripts: empty personas, multi-line prompts and
+# starters, markdown headings, tables and code inside replies, no trailing newline
+FIXTURES = Path(__file__).resolve().parent / 'transcripts'
+
+HEADER = ("# Chat Bridge Session\n\n"
+          "**Session ID:** conv_20250101_000001\n"
+          "**Started:** 2025-01-01 12:00:00\n"
+          "**Conversation Starter:** Hello\n\n"
+          "## Conversation\n\n")
+
+# Conversation lines the fuzzed transcripts are built from
+LINES = [
+    "### Human (2025-01-01 12:00:00)",
+    "### Agent A (2025-01-01 12:00:01)",
+    "### Agent B (2025-01-01 12:00:02)",
+    "### Notes",
+    "### ",
+    "###",
+    '<sub a="1">z</sub> tail',
+    "<sub>openai - gpt-4o</sub>",
+    "<sub>unclosed",
+    "</sub>",
+    "<sub",
+    "",
+    "",
+    "text",
+    "more text",
+    "**bold** line",
+]
+
+EDGE_CASES = {
+    'sub closes at eof': ('### Human (2025-01-01 12:00:00)\n<sub a="1">z</sub> tail\n'
+                          '### Notes\n<sub>x</sub>\n'),
+    'unclosed sub': '### Human (2025-01-01 12:00:00)\n<sub>openai\nbody\n',
+    'unclosed sub before next message': ('### Agent A (2025-01-01 12:00:00)\n<sub>openai\nbody\n\n'
+                                         '### Agent B (2025-01-01 12:00:01)\nreply\n'),
+    'non-header ### lines': ('### Human (2025-01-01 12:00:00)\nhello\n### Notes\n'
+                             '### Agent A (2025-01-01 12:00:01)\n### \nanswer\n'),
+    'empty body at eof': '### Human (2025-01-01 12:00:00)\n',
+    'empty body at eof without newline': '### Human (2025-01-01 12:00:00)',
+    'blank body at eof': '### Agent A (2025-01-01 12:00:00)\n\n',
+    'sub then blank at eof': '### Agent B (2025-01-01 12:00:00)\n<sub>x</sub>\n\n',
+    'sub without newline at eof': '### Agent B (2025-01-01 12:00:00)\n<sub>x</sub>',
+}
+
+
+def fuzzed_conversation(rng: random.Random) -> str:
+    text = '\n'.join(rng.choice(LINES) for _ in range(rng.randint(1, 12)))
+    return text + rng.choice(['', '\n', '\n\n'])
+
+
+def assert_same_parse(path: Path, mmap_threshold=None):
+    processor = ChatBridgeProcessor({}, mmap_threshold=mmap_threshold)
+    expected = processor.parse_markdown_file_regex(str(path))
+    actual = processor.parse_markdown_file(str(path))
+    assert actual['session'] == expected['session']
+    assert actual['agents'] == expected['agents']
+    assert list(actual['messages']) == list(expected['messages'])
+
+
+@pytest.mark.parametrize('index, messages', [(0, 1), (1, 20), (2, 200)])
+def test_benchmark_transcripts(tmp_path, index, messages):
+    path = tmp_path / 'transcript.md'
+    path.write_text(generate_transcript(index, messages, 500), encoding='utf-8')
+    assert_same_parse(path)
+    assert_same_parse(path, mmap_threshold=0)
+
+
+@pytest.mark.parametrize('path', [path for path in sorted(LOG_FOLDER.glob('*.md'))
+                                  if path.name not in _SKIPPED_FILENAMES])
+def test_log_folder_transcripts(path):
+    assert_same_parse(path)
+
+
+@pytest.mark.parametrize('path', sorted(FIXTURES.glob('*.md')), ids=lambda path: path.name[:19])
+def test_fixture_transcripts(path):
+    assert_same_parse(path)
+    assert_same_parse(path, mmap_threshold=0)
+
+
+@pytest.mark.parametrize('name', sorted(EDGE_CASES))
+def test_edge_cases(tmp_path, name):
+    path = tmp_path / 'transcript.md'
+    path.write_text(HEADER + EDGE_CASES[name], encoding='utf-8')
+    assert_same_parse(path)
+    assert_same_parse(path, mmap_threshold=0)
+
+
+def test_fuzzed_transcripts(tmp_path):
+    rng = random.Random(0)
+    path = tmp_path / 'transcript.md'
+    for _ in range(2000):
+        path.write_text(HEADER + fuzzed_conversation(rng), encoding='utf-8')
+        assert_same_parse(path)
@@ -0,0 +1,65 @@
+"""
+Exported markdown parses back into the rows it was written from.
+
+Usage:
+    python -m pytest tests
+"""
+from datetime import datetime
+
+from process_logs import ChatBridgeProcessor
+from session_export import _session, export_rows, write_markdown
+
+SESSIONS = [
+    ('conv_20250101_000001', datetime(2025, 1, 1, 12, 0), 'What is emergence?', 10, 8, 1,
+     'goodbye, stop',
+     'openai', 'gpt-4o', 0.7, 'scientist', 'You are a scientist.',
+     'anthropic', 'claude-3-5-sonnet', 1.0, 'poet', 'You are a poet.\nWrite in verse.'),
+    ('conv_20250101_000002', datetime(2025, 1, 1, 13, 30, 5), 'Short one', 2, 2, 0, None,
+     'ollama', 'llama3.1:8b', 0.6, 'skeptic', 'Doubt everything.',
+     'gemini', 'gemini-1.5-pro', 0.7, 'historian', 'Cite dates.'),
+]
+
+MESSAGES = [
+    ('conv_20250101_000001', 0, 'Human', datetime(2025, 1, 1, 12, 0, 1), 'What is emergence?'),
+    ('conv_20250101_000001', 1, 'Agent A', datetime(2025, 1, 1, 12, 0, 9),
+     'Two paragraphs.\n\nThe second one has a list:\n- one\n- two'),
+    # Bodies that start with a <sub> tag of their own, after the provider tag and without one
+    ('conv_20250101_000001', 2, 'Agent B', datetime(2025, 1, 1, 12, 0, 15),
+     '<sub>not the provider tag</sub> but part of the message'),
+    ('conv_20250101_000001', 3, 'Human', datetime(2025, 1, 1, 12, 0, 20),
+     '<sub a="1">z</sub> tail\nand a second line'),
+    ('conv_20250101_000001', 4, 'Agent A', datetime(2025, 1, 1, 12, 0, 31),
+     '```python\ndef f():\n    return 1\n```\n\n**Bold** closing line'),
+    ('conv_20250101_000002', 0, 'Human', datetime(2025, 1, 1, 13, 30, 6), 'Short one'),
+    ('conv_20250101_000002', 1, 'Agent A', datetime(2025, 1, 1, 13, 30, 7), 'ok'),
+]
+
+
+def expected_messages(session_id: str) -> list:
+    return [{'speaker': speaker, 'timestamp': f"{timestamp:%Y-%m-%d %H:%M:%S}", 'content': content,
+             'order': order}
+            for sid, order, speaker, timestamp, content in MESSAGES if sid == session_id]
+
+
+def assert_round_trip(path, row):
+    session, agents = _session(row)
+    data = ChatBridgeProcessor({}).parse_markdown_file(str(path))
+    assert data['session'] == session
+    assert data['agents'] == agents
+    assert list(data['messages']) == expected_messages(session['session_id'])
+
+
+def test_export_rows_to_folder(tmp_path):
+    assert export_rows(SESSIONS, MESSAGES, f"{tmp_path}/out/", 'markdown') == (2, len(MESSAGES))
+    for row in SESSIONS:
+        assert_round_trip(tmp_path / 'out' / f"{row[0]}.md", row)
+
+
+def test_write_markdown(tmp_path):
+    row = SESSIONS[0]
+    session, agents = _session(row)
+    path = tmp_path / 'transcript.md'
+    with open(path, 'w', encoding='utf-8') as out:
+        count = write_markdown(out, session, agents, [m for m in MESSAGES if m[0] == row[0]])
+    assert count == 5
+    assert_round_trip(path, row)